@@ -9,6 +9,9 @@ import '../../core/utils/app_logger.dart';
 class AppDatabase {
   static const _dbName = "breeze_jp.sqlite";
 
+  /// scripts/optimize_release.py 生成的发布版数据库
+  static const _assetPath = "assets/database/release/$_dbName";
+
   static Database? _database;
 
   /// 外部调用入口： `final db = await AppDatabase.instance.database`
@@ -50,13 +53,13 @@ class AppDatabase {
     return db;
   }
 
-  /// 将 assets/database/breeze_jp.sqlite 复制到应用目录
+  /// 将 assets/database/release/breeze_jp.sqlite 复制到应用目录
   Future<void> _copyDatabaseFromAssets(String targetPath) async {
     try {
-      logger.info('[DB] copy_start: copying from assets/database/$_dbName');
+      logger.info('[DB] copy_start: copying from $_assetPath');
 
       // 读取 assets 中的数据库文件
-      final data = await rootBundle.load("assets/database/$_dbName");
+      final data = await rootBundle.load(_assetPath);
       final bytes = data.buffer.asUint8List();
 
       // 写入本地
@@ -0,0 +1,279 @@
+import os
+import json
+import stat
+import socket
+import hashlib
+import argparse
+import tempfile
+import socketserver
+
+# Resident analysis worker for calibrate_pos.
+#
+# Loading the MeCab dictionary and opening Jamdict dominate short calibration
+# runs. This process loads them once and keeps them warm (along with the
+# MorphAnalyzer cache), answering batched analysis requests over a Unix
+# socket. calibrate_pos connects to it automatically when it is running and
+# falls back to analysing in-process when it is not.
+#
+# Protocol: one JSON object per line in each direction.
+#   {"op": "hello"}                  -> {"protocol", "analyzer_version", "source_hash", "pos_index", "pid"}
+#   {"op": "analyze", "rows": [...]} -> {"updates": [[new_pos, id, word, old_pos], ...]}
+#   {"op": "shutdown"}               -> {"ok": true}
+# Errors come back as {"error": "..."}.
+#
+# The socket lives in $XDG_RUNTIME_DIR, or else in a 0700 directory of our
+# own under the temp dir, and clients only trust a socket owned by the
+# current user, so another local user cannot stand in for the worker.
+#
+# The worker is an optional accelerator and needs Unix sockets and uids.
+# Where those are missing (Windows), the module still imports, and
+# connect_worker() always returns None, so calibrate_pos analyses in-process.
+
+PROTOCOL_VERSION = 2
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The analysis code: a worker loaded from other versions of these files
+# would give other answers, so the handshake compares their hash
+SOURCE_FILES = ('calibrate_pos.py', 'mecab_analysis.py', 'pos_index.py')
+
+SUPPORTED = hasattr(socket, 'AF_UNIX') and hasattr(os, 'getuid')
+
+SOCKET_NAME = 'breeze_jp_analysis.sock'
+
+# Seconds to wait for the handshake before analysing in-process instead
+CONNECT_TIMEOUT = 2.0
+
+class WorkerError(Exception):
+    pass
+
+def private_dir():
+    """Socket directory when there is no $XDG_RUNTIME_DIR; serve() creates it 0700."""
+    return os.path.join(tempfile.gettempdir(), f'breeze_jp_{os.getuid()}')
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, SOCKET_NAME)
+    return os.path.join(private_dir(), SOCKET_NAME)
+
+def source_hash(files=SOURCE_FILES):
+    digest = hashlib.sha1()
+    for name in files:
+        with open(os.path.join(SCRIPTS_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def ensure_private_dir(path):
+    """Create path as a 0700 directory, or check that an existing one is ours and private."""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise WorkerError(f"{path} is not a private directory owned by this user")
+
+def owned_socket(path):
+    """True when path is a Unix socket owned by the current user."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+class WorkerClient:
+    """Connection to a running worker. Use connect_worker() to create one."""
+
+    def __init__(self, sock, info):
+        self.sock = sock
+        self.info = info
+        self._file = sock.makefile('rwb')
+
+    def request(self, message):
+        self._file.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise WorkerError('analysis worker closed the connection')
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise WorkerError(reply['error'])
+        return reply
+
+    def analyze(self, rows):
+        """Proposed (new_pos, id, word, old_pos) updates for (id, word, part_of_speech) rows."""
+        reply = self.request({'op': 'analyze', 'rows': [list(row) for row in rows]})
+        return [tuple(update) for update in reply['updates']]
+
+    def shutdown(self):
+        self.request({'op': 'shutdown'})
+
+    def close(self):
+        self._file.close()
+        self.sock.close()
+
+def open_worker(socket_path=None):
+    """Connect and handshake with the worker listening on socket_path (default: default_socket_path()), or return None."""
+    if not SUPPORTED:
+        return None
+    socket_path = socket_path or default_socket_path()
+    if not owned_socket(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+        client = WorkerClient(sock, None)
+        client.info = client.request({'op': 'hello'})
+    except (OSError, ValueError, WorkerError):
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return client
+
+def connect_worker(socket_path=None, analyzer_version=None, pos_index_path=None):
+    """
+    Connect to a running worker, or return None when there is none or it
+    would not give the answers this process would: a different rule version,
+    analysis code edited since it started, or a different senses source
+    (live Jamdict vs a POS index file). Always None where workers are not
+    supported.
+    """
+    client = open_worker(socket_path)
+    if client is None:
+        return None
+
+    info = client.info
+    wanted_index = os.path.abspath(pos_index_path) if pos_index_path else None
+    if (info.get('protocol') != PROTOCOL_VERSION
+            or (analyzer_version is not None and info.get('analyzer_version') != analyzer_version)
+            or info.get('pos_index') != wanted_index):
+        client.close()
+        return None
+    if info.get('source_hash') != source_hash():
+        print(f"Analysis worker {info.get('pid')} runs older analysis code; restart it. Analysing in-process.")
+        client.close()
+        return None
+    return client
+
+class AnalysisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                reply = {'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if reply.get('stopping'):
+                break
+
+# socketserver only defines UnixStreamServer where AF_UNIX exists
+class AnalysisServer(getattr(socketserver, 'UnixStreamServer', object)):
+    """
+    Serves one connection at a time: MeCab taggers are not thread-safe, and
+    requests are batched, so concurrency would not buy much.
+    """
+
+    def __init__(self, socket_path, pos_index_path=None):
+        # Imported here so clients never pay for the analyzers
+        import calibrate_pos
+        from mecab_analysis import MorphAnalyzer
+
+        self.calibrate_pos = calibrate_pos
+        self.source_hash = source_hash()
+        self.pos_index_path = os.path.abspath(pos_index_path) if pos_index_path else None
+        print("Loading MeCab and " + (f"POS index {self.pos_index_path}" if pos_index_path else "Jamdict") + "...")
+        self.analyzer = MorphAnalyzer()
+        self.senses_for = calibrate_pos.make_senses_lookup(self.pos_index_path)
+        self.requests = 0
+        self.stopping = False
+        super().__init__(socket_path, AnalysisHandler)
+
+    def dispatch(self, message):
+        op = message.get('op')
+        if op == 'hello':
+            return {
+                'protocol': PROTOCOL_VERSION,
+                'analyzer_version': self.calibrate_pos.ANALYZER_VERSION,
+                'source_hash': self.source_hash,
+                'pos_index': self.pos_index_path,
+                'pid': os.getpid(),
+                'requests': self.requests,
+            }
+        if op == 'analyze':
+            self.requests += 1
+            rows = [tuple(row) for row in message['rows']]
+            return {'updates': self.calibrate_pos.analyze_rows(self.analyzer, self.senses_for, rows)}
+        if op == 'shutdown':
+            self.stopping = True
+            return {'ok': True, 'stopping': True}
+        raise WorkerError(f"unknown op: {op}")
+
+def serve(socket_path=None, pos_index_path=None):
+    if not SUPPORTED:
+        print("The analysis worker needs Unix sockets, which this platform lacks.")
+        return
+    socket_path = socket_path or default_socket_path()
+    if pos_index_path and not os.path.exists(pos_index_path):
+        print(f"POS index not found at {pos_index_path}. Build it with scripts/pos_index.py")
+        return
+    if os.path.dirname(os.path.abspath(socket_path)) == private_dir():
+        try:
+            ensure_private_dir(private_dir())
+        except WorkerError as e:
+            print(f"Refusing to listen: {e}")
+            return
+    existing = open_worker(socket_path)
+    if existing:
+        print(f"A worker is already running on {socket_path} (pid {existing.info['pid']}).")
+        existing.close()
+        return
+    if os.path.lexists(socket_path):
+        if not owned_socket(socket_path):
+            print(f"Refusing to listen: {socket_path} exists and is not a socket owned by this user")
+            return
+        # Left behind by a worker that did not exit cleanly
+        os.unlink(socket_path)
+
+    server = AnalysisServer(socket_path, pos_index_path)
+    print(f"Analysis worker {os.getpid()} listening on {socket_path}")
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print(f"Analysis worker stopped after {server.requests} requests.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Keep MeCab and Jamdict warm for calibrate_pos')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='Unix socket path (default: breeze_jp_analysis.sock in $XDG_RUNTIME_DIR, or in a private per-user directory under the temp dir)')
+    parser.add_argument('--pos-index', metavar='PATH', help='Serve senses from the precompiled JMdict POS index instead of live Jamdict')
+    parser.add_argument('--status', action='store_true', help='Report whether a worker is running')
+    parser.add_argument('--stop', action='store_true', help='Stop the running worker')
+    args = parser.parse_args()
+    if not SUPPORTED:
+        parser.error('the analysis worker needs Unix sockets, which this platform lacks')
+    args.socket = args.socket or default_socket_path()
+
+    if args.status or args.stop:
+        client = open_worker(args.socket)
+        if client is None:
+            print(f"No worker running on {args.socket}")
+        elif args.stop:
+            client.shutdown()
+            client.close()
+            print(f"Stopped worker {client.info['pid']}")
+        else:
+            info = client.info
+            client.close()
+            print(f"Worker {info['pid']} on {args.socket}: analyzer v{info['analyzer_version']}, "
+                  f"senses from {info['pos_index'] or 'Jamdict'}, {info['requests']} requests served")
+    else:
+        serve(args.socket, args.pos_index)
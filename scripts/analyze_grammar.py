@@ -1,101 +1,170 @@
 import sqlite3
 import os
+import sys
+import json
+import time
+import argparse
 import collections
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from pos_classifier import is_grammar, category_matcher, register_pos_functions, OTHER_CATEGORY
 
 # Path to the database
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
 
-def is_grammar(part_of_speech):
-    if part_of_speech is None:
-        return False
-    grammar_types = [
-        '成句',
-        '連語',
-        '接',
-        '助詞', '副助', '接助', '終助',
-        '助動詞', '補動',
-        '接頭', '接尾', '造',
-        '形動トタル'
-    ]
-    # Check if any grammar type is in part_of_speech
-    return any(g in part_of_speech for g in grammar_types)
-
-def analyze_grammar():
+DEFAULT_TOP = 20
+
+# Rows per fetch in the streaming fallback
+DEFAULT_CHUNK_SIZE = 5000
+
+def collect_stats_sql(conn, top=DEFAULT_TOP):
+    """
+    Aggregate inside SQLite with the registered pos_category()/pos_has()
+    functions; only one row per category and top POS reaches Python.
+    Ties are ordered by first occurrence, as in the streaming pass.
+    """
+    register_pos_functions(conn)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT pos_category(part_of_speech) AS category, COUNT(*) AS n, MIN(id) AS first_id
+        FROM words
+        GROUP BY category
+        ORDER BY n DESC, first_id
+    """)
+    total_count = grammar_count = 0
+    category_counts = {}
+    for category, count, _ in cursor.fetchall():
+        total_count += count
+        if category is not None:
+            grammar_count += count
+            category_counts[category] = count
+
+    cursor.execute("""
+        SELECT part_of_speech, COUNT(*) AS n, MIN(id) AS first_id
+        FROM words
+        WHERE pos_has(part_of_speech, 'grammar')
+        GROUP BY part_of_speech
+        ORDER BY n DESC, first_id
+        LIMIT ?
+    """, (top,))
+    top_pos = [(pos, count) for pos, count, _ in cursor.fetchall()]
+
+    return make_stats('sql', total_count, grammar_count, category_counts, top_pos)
+
+def collect_stats_streaming(conn, top=DEFAULT_TOP, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Fallback for connections without the registered functions: stream rows in
+    fetchmany() chunks so memory is bounded by the number of distinct POS values.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT part_of_speech FROM words ORDER BY id")
+
+    total_count = grammar_count = 0
+    category_counts = collections.defaultdict(int)
+    # Breakdown by specific grammar type found
+    grammar_breakdown = collections.Counter()
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        total_count += len(rows)
+        for (pos,) in rows:
+            if pos and is_grammar(pos):
+                grammar_count += 1
+                category_counts[category_matcher.first_label(pos, OTHER_CATEGORY)] += 1
+                grammar_breakdown[pos] += 1
+
+    categories = dict(sorted(category_counts.items(), key=lambda x: x[1], reverse=True))
+    return make_stats('streaming', total_count, grammar_count, categories, grammar_breakdown.most_common(top))
+
+def make_stats(mode, total_count, grammar_count, category_counts, top_pos):
+    return {
+        'mode': mode,
+        'total': total_count,
+        'grammar': grammar_count,
+        'words': total_count - grammar_count,
+        'categories': category_counts,
+        'top_pos': [list(item) for item in top_pos],
+    }
+
+def print_report(stats, top):
+    total_count = stats['total']
+    grammar_count = stats['grammar']
+    word_count = stats['words']
+    share = (lambda n: n / total_count * 100) if total_count else (lambda n: 0.0)
+
+    print("-" * 40)
+    print(f"Total Entries: {total_count}")
+    print(f"Grammar Entries: {grammar_count} ({share(grammar_count):.2f}%)")
+    print(f"Word Entries: {word_count} ({share(word_count):.2f}%)")
+    print("-" * 40)
+
+    print("\nGrammar Frequency by Category:")
+    for cat, count in stats['categories'].items():
+         print(f" - {cat}: {count}")
+
+    print(f"\nDetailed POS Breakdown (Top {top}):")
+    for pos, count in stats['top_pos']:
+        print(f" - {pos}: {count}")
+
+    print(f"\nElapsed: {stats['elapsed_seconds']:.3f}s ({stats['mode']})")
+
+def analyze_grammar(top=DEFAULT_TOP, json_path=None, streaming=False, chunk_size=DEFAULT_CHUNK_SIZE, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('analyze_grammar')
     if not os.path.exists(DB_PATH):
         print(f"Error: Database not found at {DB_PATH}")
         return
 
     try:
         conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, word, part_of_speech, jlpt_level FROM words")
-        rows = cursor.fetchall()
-        
-        total_count = len(rows)
-        grammar_count = 0
-        word_count = 0
-        
-        grammar_examples = []
-        word_examples = []
-        
-        # Define categories
-        categories = {
-            'Prefix/Suffix': ['接頭', '接尾', '造'],
-            'Conjunction': ['接', '接助', '順接'],
-            'Particle': ['助詞', '副助', '終助'],
-            'Compound/Phrase': ['連語', '成句'],
-            'Auxiliary Verb': ['助動詞', '補動'],
-            'Adjectival Verb': ['形動トタル'],
-        }
-        
-        category_counts = collections.defaultdict(int)
-        
-        # Breakdown by specific grammar type found
-        grammar_breakdown = collections.Counter()
-
-        for row in rows:
-            word_id, word, pos, level = row
-            
-            if pos and is_grammar(pos):
-                grammar_count += 1
-                if len(grammar_examples) < 10:
-                    grammar_examples.append(f"{word} ({pos})")
-                
-                # Categorize
-                matched_category = 'Other'
-                for cat_name, keywords in categories.items():
-                    if any(k in pos for k in keywords):
-                        matched_category = cat_name
-                        break
-                category_counts[matched_category] += 1
-                
-                grammar_breakdown[pos] += 1
-            else:
-                word_count += 1
-                if len(word_examples) < 10:
-                    word_examples.append(f"{word} ({pos})")
-
-        print("-" * 40)
-        print(f"Total Entries: {total_count}")
-        print(f"Grammar Entries: {grammar_count} ({grammar_count/total_count*100:.2f}%)")
-        print(f"Word Entries: {word_count} ({word_count/total_count*100:.2f}%)")
-        print("-" * 40)
-        
-        print("\nGrammar Frequency by Category:")
-        for cat, count in sorted(category_counts.items(), key=lambda x: x[1], reverse=True):
-             print(f" - {cat}: {count}")
-
-        print("\nDetailed POS Breakdown (Top 20):")
-        for pos, count in grammar_breakdown.most_common(20):
-            print(f" - {pos}: {count}")
+        start = time.perf_counter()
+
+        stats = None
+        if not streaming:
+            try:
+                with metrics.phase('sql aggregate'):
+                    stats = collect_stats_sql(conn, top)
+            except (sqlite3.NotSupportedError, sqlite3.OperationalError) as e:
+                print(f"SQL aggregation unavailable ({e}); streaming instead.", file=sys.stderr)
+        if stats is None:
+            with metrics.phase('stream'):
+                stats = collect_stats_streaming(conn, top, chunk_size)
+        metrics.count('rows_read', stats['total'])
+        metrics.count('grammar_rows', stats['grammar'])
 
+        stats['elapsed_seconds'] = round(time.perf_counter() - start, 6)
         conn.close()
-        
+
+        if json_path == '-':
+            print(json.dumps(stats, ensure_ascii=False, indent=2))
+        else:
+            print_report(stats, top)
+            if json_path:
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(stats, f, ensure_ascii=False, indent=2)
+                print(f"Wrote {json_path}")
+
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    analyze_grammar()
+    parser = argparse.ArgumentParser(description='Report grammar vs vocabulary entries in the words table')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help=f'POS values in the breakdown (default: {DEFAULT_TOP})')
+    parser.add_argument('--json', metavar='PATH', help="Also write the stats as JSON to PATH ('-' prints only JSON)")
+    parser.add_argument('--streaming', action='store_true', help='Skip SQL aggregation and stream rows in chunks')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows per fetch when streaming')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.top < 0 or args.chunk_size < 1:
+        parser.error('--top must be >= 0 and --chunk-size positive')
+
+    metrics = metrics_from_args('analyze_grammar', args)
+    analyze_grammar(top=args.top, json_path=args.json, streaming=args.streaming, chunk_size=args.chunk_size, metrics=metrics)
+    if args.json != '-':
+        emit(metrics, args)
+    elif args.metrics_json:
+        metrics.write_json(args.metrics_json)
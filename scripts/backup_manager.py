@@ -0,0 +1,191 @@
+import sqlite3
+import os
+import gzip
+import json
+import time
+import shutil
+import tempfile
+
+# Shared database backups for the scripts that edit breeze_jp.sqlite.
+#
+# Snapshots are taken with SQLite's online backup API, a few pages at a time,
+# so they are consistent and readers are never blocked for the whole copy.
+# A manifest.json in the backup directory lists every snapshot and names the
+# latest one, so finding it never scans the directory.
+
+MANIFEST_NAME = 'manifest.json'
+
+# Pages copied per backup step; the source lock is released between steps
+DEFAULT_PAGES_PER_STEP = 1024
+
+# Pruning is opt-in: by default every snapshot is kept
+DEFAULT_KEEP = None
+
+class BackupManager:
+    def __init__(self, db_path, backup_dir, prefix='breeze_jp_backup'):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.prefix = prefix
+        self.manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+
+    def _ensure_dir(self):
+        if not os.path.exists(self.backup_dir):
+            os.makedirs(self.backup_dir)
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        # First run with a manifest: adopt snapshots made by the old copy2 backups
+        return self._scan_legacy_backups()
+
+    def save_manifest(self, manifest):
+        self._ensure_dir()
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _scan_legacy_backups(self):
+        backups = []
+        if os.path.exists(self.backup_dir):
+            for name in os.listdir(self.backup_dir):
+                if not (name.endswith('.sqlite') or name.endswith('.sqlite.gz')):
+                    continue
+                path = os.path.join(self.backup_dir, name)
+                backups.append({
+                    'file': name,
+                    'created_at': int(os.path.getctime(path)),
+                    'compressed': name.endswith('.gz'),
+                    'size': os.path.getsize(path),
+                })
+        backups.sort(key=lambda b: b['created_at'])
+        return {'latest': backups[-1] if backups else None, 'backups': backups}
+
+    def path_of(self, entry):
+        return os.path.join(self.backup_dir, entry['file'])
+
+    def create(self, compress=False, pages_per_step=DEFAULT_PAGES_PER_STEP):
+        """Snapshot the database and record it in the manifest. Returns the backup path."""
+        self._ensure_dir()
+        manifest = self.load_manifest()
+        timestamp = int(time.time())
+        name = f'{self.prefix}_{timestamp}.sqlite'
+        if compress:
+            name += '.gz'
+        path = os.path.join(self.backup_dir, name)
+
+        # Snapshot into a temp file first so a failed run never leaves a partial backup
+        fd, snapshot_path = tempfile.mkstemp(suffix='.tmp', dir=self.backup_dir)
+        os.close(fd)
+        try:
+            src = sqlite3.connect(self.db_path)
+            dst = sqlite3.connect(snapshot_path)
+            try:
+                src.backup(dst, pages=pages_per_step)
+            finally:
+                dst.close()
+                src.close()
+
+            if compress:
+                with open(snapshot_path, 'rb') as f_in, gzip.open(path, 'wb', compresslevel=6) as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                os.remove(snapshot_path)
+            else:
+                os.replace(snapshot_path, path)
+        except BaseException:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            raise
+
+        entry = {
+            'file': name,
+            'created_at': timestamp,
+            'compressed': compress,
+            'size': os.path.getsize(path),
+        }
+        manifest['backups'].append(entry)
+        manifest['latest'] = entry
+        self.save_manifest(manifest)
+        print(f"Database backed up to: {path}")
+        return path
+
+    def latest(self):
+        """Return the manifest entry of the most recent backup, or None."""
+        return self.load_manifest().get('latest')
+
+    def restore(self, entry, pages_per_step=DEFAULT_PAGES_PER_STEP):
+        """Restore the live database from a backup entry with the online backup API."""
+        path = self.path_of(entry)
+        if not os.path.exists(path):
+            print(f"Backup file not found: {path}")
+            return False
+
+        snapshot_path = path
+        if entry.get('compressed'):
+            fd, snapshot_path = tempfile.mkstemp(suffix='.tmp', dir=self.backup_dir)
+            os.close(fd)
+            with gzip.open(path, 'rb') as f_in, open(snapshot_path, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+        try:
+            src = sqlite3.connect(snapshot_path)
+            dst = sqlite3.connect(self.db_path)
+            try:
+                src.backup(dst, pages=pages_per_step)
+            finally:
+                dst.close()
+                src.close()
+        finally:
+            if snapshot_path != path:
+                os.remove(snapshot_path)
+
+        print(f"Database restored from: {path}")
+        return True
+
+    def owns(self, entry):
+        return entry['file'].startswith(f'{self.prefix}_')
+
+    def prune(self, keep=DEFAULT_KEEP, max_age_days=None):
+        """
+        Delete this manager's backups beyond the newest `keep` and/or older
+        than max_age_days. Backups made under other prefixes (other scripts,
+        adopted legacy files) are never touched, and the latest backup is
+        always kept. Returns the removed file names.
+        """
+        manifest = self.load_manifest()
+        backups = sorted((b for b in manifest['backups'] if self.owns(b)), key=lambda b: b['created_at'])
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        latest = manifest.get('latest') or {}
+
+        removed = []
+        for i, entry in enumerate(backups):
+            newest_rank = len(backups) - i  # 1 = newest
+            too_many = keep is not None and newest_rank > keep
+            too_old = cutoff is not None and entry['created_at'] < cutoff
+            if (too_many or too_old) and entry['file'] != latest.get('file'):
+                path = self.path_of(entry)
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append(entry['file'])
+
+        if removed:
+            manifest['backups'] = [b for b in manifest['backups'] if b['file'] not in removed]
+            self.save_manifest(manifest)
+            print(f"Pruned {len(removed)} old backup(s).")
+        return removed
+
+def add_backup_arguments(parser):
+    """Register the shared backup flags on a script's argument parser."""
+    parser.add_argument('--compress-backup', action='store_true', help='Gzip the pre-run backup')
+    parser.add_argument('--keep-backups', type=int, default=DEFAULT_KEEP, metavar='N',
+                        help="Keep only this script's newest N backups (default: keep all)")
+    parser.add_argument('--max-backup-age', type=float, default=None, metavar='DAYS',
+                        help="Delete this script's backups older than DAYS (default: keep all)")
+
+def backup_and_prune(manager, compress=False, keep=DEFAULT_KEEP, max_age_days=None):
+    """Take a pre-run backup, then apply the retention policy if one was given (keep=0 or None keeps all)."""
+    path = manager.create(compress=compress)
+    if keep or max_age_days is not None:
+        manager.prune(keep=keep or None, max_age_days=max_age_days)
+    return path
@@ -0,0 +1,327 @@
+import sqlite3
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+# Benchmarks for the scripts/ data pipeline on synthetic dictionaries.
+#
+# A synthetic breeze_jp.sqlite is generated per size (words with realistic POS
+# strings plus meanings, examples and study rows) and every case runs in a
+# fresh child process on its own copy, so timings and peak RSS don't leak
+# between cases. Results can be saved as a JSON baseline and later runs are
+# compared against it.
+#
+#   python scripts/benchmark.py --sizes 10k,100k --save-baseline
+#   python scripts/benchmark.py --sizes 10k,100k          # exits 1 on regression
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SCRIPTS_DIR, 'benchmark_baseline.json')
+
+# Allowed slowdown / memory growth against the baseline before a case is flagged
+DEFAULT_THRESHOLD = 0.20
+
+SCHEMA = """
+CREATE TABLE words (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    word           TEXT NOT NULL,
+    furigana       TEXT,
+    romaji         TEXT,
+    jlpt_level     TEXT,
+    part_of_speech TEXT,
+    pitch_accent   TEXT
+);
+CREATE TABLE word_meanings (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    word_id          INTEGER NOT NULL REFERENCES words(id) ON DELETE CASCADE,
+    meaning_cn       TEXT NOT NULL,
+    definition_order INTEGER DEFAULT 1,
+    notes            TEXT
+);
+CREATE INDEX idx_meanings_word_id ON word_meanings (word_id);
+CREATE TABLE example_sentences (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    word_id           INTEGER NOT NULL REFERENCES words(id) ON DELETE CASCADE,
+    sentence_jp       TEXT NOT NULL,
+    sentence_furigana TEXT,
+    translation_cn    TEXT,
+    notes             TEXT
+);
+CREATE INDEX idx_examples_word_id ON example_sentences (word_id);
+CREATE TABLE study_words (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id        INTEGER NOT NULL,
+    word_id        INTEGER NOT NULL REFERENCES words(id) ON DELETE CASCADE,
+    user_state     INTEGER DEFAULT 0 NOT NULL,
+    next_review_at INTEGER,
+    UNIQUE(user_id, word_id)
+);
+CREATE TABLE conjugation_types (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    code        TEXT UNIQUE,
+    name_ja     TEXT,
+    name_cn     TEXT,
+    sort_order  INTEGER,
+    description TEXT
+);
+CREATE TABLE word_conjugations (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    word_id         INTEGER NOT NULL,
+    type_id         INTEGER NOT NULL,
+    conjugated_word TEXT NOT NULL,
+    furigana        TEXT,
+    accent_pattern  TEXT,
+    UNIQUE(word_id, type_id)
+);
+"""
+
+# (dictionary-form ending, POS) templates, weighted roughly like the real dictionary
+POS_TEMPLATES = [
+    ('く', '动1'), ('ぐ', '动1'), ('す', '动1・他'), ('つ', '动1'), ('ぬ', '动1'), ('ぶ', '动1'),
+    ('む', '动1・自'), ('る', '动1'), ('う', '五段'), ('行く', '动1'),
+    ('べる', '动2'), ('きる', '动2・自'), ('える', '一段'),
+    ('する', '动3'), ('来る', '动3'), ('', '名・动3'), ('', 'サ変'),
+    ('い', 'イ形'), ('しい', 'イ形'), ('', 'ナ形'), ('', '形動'),
+    ('', '名'), ('', '名'), ('', '名'), ('', '名'), ('', '名'), ('', '副'), ('', '代'),
+    ('は', '助詞'), ('について', '連語'), ('', '接'), ('お', '接頭'), ('的', '接尾'),
+    ('', '接続詞'), ('らしい', '助動詞'), ('ている', '補動'), ('', '形動トタル'),
+    ('', '動1・自'), ('', '連体詞'),
+]
+
+STEM_CHARS = '日本語書読話食見来行学生先年時間人大小高安新古山川田中上下'
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+def size_label(n):
+    if n >= 1000000 and n % 1000000 == 0:
+        return f'{n // 1000000}m'
+    if n >= 1000 and n % 1000 == 0:
+        return f'{n // 1000}k'
+    return str(n)
+
+def iter_synthetic_words(n_words, rng):
+    for i in range(n_words):
+        ending, pos = rng.choice(POS_TEMPLATES)
+        stem = ''.join(rng.choice(STEM_CHARS) for _ in range(rng.randint(1, 3)))
+        if pos in ('接頭',):
+            word = ending + stem + '〜'
+        elif pos in ('接尾', '連語'):
+            word = '〜' + stem + ending
+        else:
+            word = stem + ending
+        yield (word, word, f'romaji{i}', f'N{rng.randint(1, 5)}', pos)
+
+def build_synthetic_db(path, n_words, seed=0, batch_size=10000):
+    """Create a synthetic dictionary with n_words words at path."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA)
+
+    words = iter_synthetic_words(n_words, rng)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), words)]
+        if not batch:
+            break
+        cursor.executemany("INSERT INTO words (word, furigana, romaji, jlpt_level, part_of_speech) VALUES (?, ?, ?, ?, ?)", batch)
+
+    cursor.execute("INSERT INTO word_meanings (word_id, meaning_cn, definition_order) SELECT id, '释义' || id, 1 FROM words")
+    cursor.execute("INSERT INTO word_meanings (word_id, meaning_cn, definition_order) SELECT id, '释义二' || id, 2 FROM words WHERE id % 3 = 0")
+    cursor.execute("INSERT INTO example_sentences (word_id, sentence_jp, translation_cn) SELECT id, word || 'を使った例文です。', '例句' || id FROM words")
+    cursor.execute("INSERT INTO study_words (user_id, word_id, user_state) SELECT 1, id, id % 3 FROM words WHERE id % 7 = 0")
+    conn.commit()
+    conn.close()
+
+class StubTagger:
+    """
+    Deterministic stand-in for MeCab.Tagger: every sentinel-separated segment
+    becomes one token whose POS is chosen from a hash of the text, so the
+    calibration benchmark measures our code rather than the dictionary.
+    """
+    FEATURES = ['名詞,一般', '名詞,一般', '名詞,サ変接続', '動詞,自立', '形容詞,自立',
+                '助詞,格助詞', '助動詞,*', '接続詞,*', '接頭詞,名詞接続', '副詞,一般']
+
+    def parse(self, text):
+        lines = []
+        for i, segment in enumerate(text.split('。')):
+            if i:
+                lines.append('。\t記号,句点,*')
+            if segment:
+                feature = self.FEATURES[sum(map(ord, segment)) % len(self.FEATURES)]
+                lines.append(f'{segment}\t{feature},*')
+        lines.append('EOS')
+        return '\n'.join(lines) + '\n'
+
+def stub_senses(word):
+    # Roughly one word in ten gets a particle sense, like a sparse JMdict hit rate
+    return [{'prt'}] if sum(map(ord, word)) % 10 == 0 else []
+
+def count_words(conn):
+    return conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+def case_generate_conjugations(conn):
+    from generate_conjugations import CANDIDATE_WHERE, generate
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, word, part_of_speech, furigana FROM words WHERE {CANDIDATE_WHERE}")
+    generate(conn, iter(lambda: cursor.fetchmany(5000), []))
+    conn.commit()
+
+def case_analyze_grammar(conn):
+    from analyze_grammar import collect_stats_sql
+    collect_stats_sql(conn)
+
+def case_migrate_grammar(conn):
+    from migrate_grammar import migrate_grammar
+    migrate_grammar(conn.cursor())
+    conn.commit()
+
+def case_normalize_pos(conn):
+    from pos_normalizer import normalize_words
+    normalize_words(conn.cursor(), 'ja')
+    conn.commit()
+
+def case_normalize_pos_sc(conn):
+    from pos_normalizer import normalize_words
+    normalize_words(conn.cursor(), 'sc')
+    conn.commit()
+
+def case_calibrate_pos(conn):
+    from calibrate_pos import analyze_rows, apply_updates
+    from mecab_analysis import MorphAnalyzer
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, word, part_of_speech FROM words ORDER BY id")
+    rows = cursor.fetchall()
+    updates = analyze_rows(MorphAnalyzer(tagger=StubTagger()), stub_senses, rows)
+    apply_updates(cursor, rows, updates)
+    conn.commit()
+
+CASES = {
+    'generate_conjugations': case_generate_conjugations,
+    'analyze_grammar': case_analyze_grammar,
+    'migrate_grammar': case_migrate_grammar,
+    'normalize_pos': case_normalize_pos,
+    'normalize_pos_sc': case_normalize_pos_sc,
+    'calibrate_pos': case_calibrate_pos,
+}
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_case(name, db_path):
+    """Child-process entry point: run one case and print its result as JSON."""
+    conn = sqlite3.connect(db_path)
+    rows = count_words(conn)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        CASES[name](conn)
+        seconds = time.perf_counter() - start
+    conn.close()
+    print(json.dumps({'rows': rows, 'seconds': seconds, 'peak_rss_kb': peak_rss_kb()}))
+
+def spawn_case(name, db_path):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', name, '--db', db_path],
+        capture_output=True, text=True, cwd=SCRIPTS_DIR,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_benchmarks(sizes, cases, work_dir, repeat=1, seed=0):
+    results = {}
+    for n in sizes:
+        label = size_label(n)
+        source = os.path.join(work_dir, f'synthetic_{label}.sqlite')
+        print(f"Generating {label} words...")
+        build_synthetic_db(source, n, seed=seed)
+
+        for name in cases:
+            best = None
+            for _ in range(repeat):
+                db_path = os.path.join(work_dir, f'run_{label}_{name}.sqlite')
+                shutil.copyfile(source, db_path)
+                result = spawn_case(name, db_path)
+                os.remove(db_path)
+                if best is None or result['seconds'] < best['seconds']:
+                    best = result
+            best['rows_per_sec'] = best['rows'] / best['seconds'] if best['seconds'] > 0 else 0.0
+            results[f'{name}@{label}'] = best
+            print(f" {name:<22} {label:>5}  {best['seconds']:8.3f}s  {best['rows_per_sec']:12.0f} rows/s  {best['peak_rss_kb'] / 1024:8.1f} MB")
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return a list of regression messages for cases present in both runs."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result['rows_per_sec'] < base['rows_per_sec'] * (1 - threshold):
+            regressions.append(f"{key}: {result['rows_per_sec']:.0f} rows/s vs baseline {base['rows_per_sec']:.0f}")
+        if result['peak_rss_kb'] > base['peak_rss_kb'] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {result['peak_rss_kb']} KB vs baseline {base['peak_rss_kb']} KB")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the scripts/ pipeline on synthetic dictionaries')
+    parser.add_argument('--sizes', default='10k', help='Comma-separated words counts, e.g. 10k,100k,1m (default: 10k)')
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, metavar='PATH', help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Regression tolerance as a fraction (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--work-dir', help='Where synthetic databases are written (default: a temp dir)')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(args.run_case, args.db)
+        sys.exit(0)
+
+    cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='breeze_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        results = run_benchmarks(sizes, cases, work_dir, repeat=args.repeat, seed=args.seed)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for message in regressions:
+                print(f" - {message}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
@@ -1,229 +1,580 @@
 import sqlite3
-import MeCab
 import os
-import shutil
-import time
 import argparse
-from jamdict import Jamdict
+import json
+import hashlib
+import multiprocessing
+from backup_manager import BackupManager, DEFAULT_KEEP, add_backup_arguments, backup_and_prune
+from analysis_worker import connect_worker, WorkerError
+from undo_journal import new_run_id, record_changes, latest_run_id, rollback_run
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from pos_index import PosIndex, DEFAULT_INDEX_PATH, MAX_ENTRIES
 
 # Path to the database
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
 BACKUP_DIR = os.path.join(os.path.dirname(DB_PATH), 'backups')
+backups = BackupManager(DB_PATH, BACKUP_DIR, prefix='breeze_jp_backup')
 
-def ensure_backup_dir():
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
-
-def create_backup():
-    ensure_backup_dir()
-    timestamp = int(time.time())
-    backup_path = os.path.join(BACKUP_DIR, f'breeze_jp_backup_{timestamp}.sqlite')
-    shutil.copy2(DB_PATH, backup_path)
-    print(f"Database backed up to: {backup_path}")
-    return backup_path
-
-def rollback(backup_path):
-    if not os.path.exists(backup_path):
-        print(f"Backup file not found: {backup_path}")
-        return
+# Rows handed to a worker process at a time in --workers mode
+DEFAULT_SHARD_SIZE = 500
+
+# Rows whose surfaces are sent to MeCab together
+ANALYSIS_CHUNK_SIZE = 1000
+
+# Bump whenever the heuristics in analyze_row() change, so the next
+# incremental run re-analyses every word
+ANALYZER_VERSION = 1
+
+def analyzer_version(pos_index_path=None):
+    """
+    The version stored with the calibration state: ANALYZER_VERSION plus the
+    senses source, so state from live Jamdict is not reused by --pos-index
+    runs and vice versa.
+    """
+    return f"{ANALYZER_VERSION}/{'pos-index' if pos_index_path else 'jamdict'}"
+
+# Plan changes applied per transaction by --apply-plan
+DEFAULT_PLAN_BATCH_SIZE = 1000
+
+# Ids per IN (...) lookup, below SQLite's lowest host-parameter limit (999)
+# whatever --plan-batch-size is
+MAX_IN_PARAMS = 900
+
+def jamdict_senses(jam, word):
+    """POS strings of each sense in the first two jam.lookup() entries."""
+    j_result = jam.lookup(word)
+    return [
+        {str(x) for x in sense.pos}
+        for entry in j_result.entries[:MAX_ENTRIES]
+        for sense in entry.senses
+    ]
+
+def make_senses_lookup(pos_index_path=None):
+    """
+    Return a word -> [POS codes per sense] callable, backed by the precompiled
+    index when pos_index_path is given and by a live Jamdict otherwise.
+    """
+    if pos_index_path:
+        return PosIndex(pos_index_path).senses
+    # Imported here so runs that never analyse (--rollback, --apply-plan) don't load Jamdict
+    from jamdict import Jamdict
+    jam = Jamdict() # Initialize Jamdict
+    return lambda word: jamdict_senses(jam, word)
+
+def clean_surface(word):
+    # Remove leading/trailing tilde for analysis if present, but keep original for context
+    return word.replace('〜', '').replace('~', '')
+
+def analyze_row(tokens, senses_for, word_id, word, current_pos):
+    """
+    Analyse one vocabulary row, given the MeCab tokens of its clean surface.
+    Returns (proposed_pos, word_id, word, current_pos) if the row should be updated, else None.
+    """
+    clean_word = clean_surface(word)
+    if not clean_word: return None
+
+    # NOTE: MeCab is good for tokenizing sentences. For single vocabulary words, 
+    # sometimes the dictionary definition is better.
+    # However, if we want to detect "Grammar", we look for:
+    # 1. Words containing '〜' -> Label as 'Phrase/Grammar' or specific parts
+    # 2. Existing '連語', '成句' tags are good.
+    # 3. Use MeCab to identify 'Particle' (助詞) or 'Auxiliary Verb' (助動詞) if not tagged.
+
+    # Heuristic application:
+    detected_type = None
+    
+    # 1. Explicit symbols
+    if '〜' in word:
+        if word.startswith('〜') and word.endswith('〜'): detected_type = 'Middle Phrase' # Rare
+        elif word.startswith('〜'): detected_type = '接尾/Suffix' # or Grammar
+        elif word.endswith('〜'): detected_type = '接頭/Prefix'
+        else: detected_type = '文法/Grammar' # Middle like ...〜...
+
+    # 2. Jamdict Analysis (Secondary Check)
+    # Only if MeCab didn't give a strong signal or to confirm
+    try:
+        # Check the first few entries/senses
+        for parts in senses_for(word):
+            # POS codes of one sense
+            # e.g. 'exp' (Expressions), 'prt' (Particle), 'aux' (Auxiliary)
+            # 'conj' (Conjunction), 'pref' (Prefix), 'suf' (Suffix)
+            if 'exp' in parts or 'int' in parts: # Expressions often grammar
+                if not detected_type: detected_type = '文法/Grammar'
+            if 'prt' in parts:
+                detected_type = '助詞/Particle'
+            if 'aux' in parts or 'aux-v' in parts or 'aux-adj' in parts:
+                detected_type = '助動詞/Aux'
+            if 'conj' in parts:
+                detected_type = '接続詞/Conjunction'
+            if 'pref' in parts:
+                detected_type = '接頭/Prefix'
+            if 'suf' in parts:
+                detected_type = '接尾/Suffix'
+            
+            if detected_type: break
+    except Exception as e:
+        # print(f"Jamdict error for {word}: {e}")
+        pass
+
+    # 3. MeCab Analysis (Fallback or Refinement)
+    if not detected_type:
+        # Analyze the first token (MeCab POS format in unidic: pos1,pos2,pos3,pos4)
+        pos1 = tokens[0][0] if tokens else ''
+
+        if pos1 == '助詞': 
+            detected_type = '助詞/Particle'
+        elif pos1 == '助動詞': 
+            detected_type = '助動詞/Aux'
+        elif pos1 == '接続詞': 
+            detected_type = '接続詞/Conjunction'
+        elif pos1 == '連体詞': 
+            detected_type = '連体詞/Determiner'
+        
+        # Careful with Prefixes/Suffixes
+        elif pos1 == '接頭辞' and ('〜' in word or len(clean_word) == 1):
+            detected_type = '接頭/Prefix'
+        elif pos1 == '接尾辞' and ('〜' in word): 
+            detected_type = '接尾/Suffix'
+
+    # Determine if we should update
+    should_update = False
+    proposed_pos = current_pos
+
+    if detected_type:
+        grammar_type_label = detected_type.split('/')[-1] # e.g. 'Particle'
+        grammar_kanji = detected_type.split('/')[0]      # e.g. '助詞'
+
+        # Case 1: Current POS is empty
+        if not current_pos:
+            proposed_pos = grammar_kanji
+            should_update = True
+        
+        # Case 2: Replace abbreviations or Append if missing
+        elif grammar_kanji not in current_pos:
+             
+             # Define abbreviation mappings (Full -> [Abbreviations])
+             abbreviations = {
+                 '接続詞': ['接'],
+                 '連体詞': ['連体'],
+                 '副詞': ['副'],
+                 '接頭辞': ['接頭'], # Standardize if needed
+                 '接尾辞': ['接尾'],
+                 '助詞': ['助'],
+             }
+             
+             target_abbrs = abbreviations.get(grammar_kanji, [])
+             
+             parts = current_pos.split('・')
+             new_parts = []
+             replaced = False
+             
+             for p in parts:
+                 if p in target_abbrs:
+                     new_parts.append(grammar_kanji)
+                     replaced = True
+                 else:
+                     new_parts.append(p)
+             
+             # If we didn't find an abbreviation to replace, we append the new term
+             # UNLESS it's already there (checked by elif above)
+             if not replaced:
+                 new_parts.append(grammar_kanji)
+             
+             proposed_pos = '・'.join(new_parts)
+             should_update = True
     
-    # Close any connections if possible (not needed here as we open/close in functions)
-    shutil.copy2(backup_path, DB_PATH)
-    print(f"Database restored from: {backup_path}")
-
-def get_latest_backup():
-    ensure_backup_dir()
-    files = [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR) if f.endswith('.sqlite')]
-    if not files:
-        return None
-    return max(files, key=os.path.getctime)
-
-def analyze_and_update(dry_run=False):
+    # Special Case: '〜' implies grammar/affix usually. 
+    if '〜' in word and not should_update:
+         if '接' not in (current_pos or '') and '造' not in (current_pos or ''):
+             proposed_pos = (current_pos + '・' if current_pos else '') + '接辞/Affix'
+             should_update = True
+
+    if should_update:
+        return (proposed_pos, word_id, word, current_pos)
+    return None
+
+def iter_updates(analyzer, senses_for, rows, metrics=None):
+    """
+    Analyse (id, word, part_of_speech) rows and yield the proposed updates in row order.
+    Time goes to the mecab, rules and rules/jamdict phases of metrics.
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    senses_for = metrics.timed('jamdict', senses_for)
+    for i in range(0, len(rows), ANALYSIS_CHUNK_SIZE):
+        chunk = rows[i:i + ANALYSIS_CHUNK_SIZE]
+        # One MeCab pass per distinct surface in the chunk
+        surfaces = [clean_surface(word) for _, word, _ in chunk]
+        with metrics.phase('mecab'):
+            all_tokens = analyzer.analyze_many([s for s in surfaces if s])
+        tokens_by_surface = dict(zip((s for s in surfaces if s), all_tokens))
+
+        with metrics.phase('rules'):
+            updates = []
+            for (word_id, word, current_pos), surface in zip(chunk, surfaces):
+                update = analyze_row(tokens_by_surface.get(surface, ()), senses_for, word_id, word, current_pos)
+                if update:
+                    updates.append(update)
+        yield from updates
+
+def analyze_rows(analyzer, senses_for, rows, metrics=None):
+    """Analyse (id, word, part_of_speech) rows and return the proposed updates in row order."""
+    return list(iter_updates(analyzer, senses_for, rows, metrics))
+
+# Per-process analyzers for --workers mode, built once by init_worker()
+_worker_analyzer = None
+_worker_senses = None
+
+def init_worker(pos_index_path=None):
+    global _worker_analyzer, _worker_senses
+    from mecab_analysis import MorphAnalyzer
+    _worker_analyzer = MorphAnalyzer()
+    _worker_senses = make_senses_lookup(pos_index_path)
+
+def analyze_shard(rows):
+    return analyze_rows(_worker_analyzer, _worker_senses, rows)
+
+def iter_parallel(rows, workers, shard_size=DEFAULT_SHARD_SIZE, pos_index_path=None):
+    """
+    Analyse rows on a process pool. Each worker builds its own MeCab analyzer and
+    Jamdict (or maps the POS index) once and handles contiguous shards of the id-ordered rows; the
+    caller stays the single writer. imap() yields shards in submission order,
+    so the updates come back in id order.
+    """
+    shards = [rows[i:i + shard_size] for i in range(0, len(rows), shard_size)]
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(pos_index_path,)) as pool:
+        for shard_updates in pool.imap(analyze_shard, shards):
+            yield from shard_updates
+
+def analyze_parallel(rows, workers, shard_size=DEFAULT_SHARD_SIZE, pos_index_path=None):
+    return list(iter_parallel(rows, workers, shard_size, pos_index_path))
+
+def content_hash(word, pos):
+    # None and '' analyse the same way, so they hash the same
+    return hashlib.blake2b(f"{word}\x1f{pos or ''}".encode('utf-8'), digest_size=8).hexdigest()
+
+def ensure_state_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pos_calibration_state (
+            word_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            analyzer_version TEXT NOT NULL
+        )
+    ''')
+
+def state_table_exists(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pos_calibration_state'")
+    return cursor.fetchone() is not None
+
+def filter_changed_rows(cursor, rows, version):
+    """
+    Keep the rows whose word/POS changed (or that were never analysed at
+    version) since the last run. Read-only: without a state table every row
+    counts as changed.
+    """
+    if not state_table_exists(cursor):
+        return list(rows)
+    cursor.execute("SELECT word_id, content_hash FROM pos_calibration_state WHERE analyzer_version = ?", (version,))
+    known = dict(cursor.fetchall())
+    return [row for row in rows if known.get(row[0]) != content_hash(row[1], row[2])]
+
+def store_hashes(cursor, items, version):
+    """Insert or replace (word_id, word, part_of_speech) rows as analysed at version."""
+    ensure_state_table(cursor)
+    cursor.executemany(
+        "INSERT OR REPLACE INTO pos_calibration_state (word_id, content_hash, analyzer_version) VALUES (?, ?, ?)",
+        ((wid, content_hash(word, pos), version) for wid, word, pos in items),
+    )
+
+def record_state(cursor, rows, updates, version):
+    """Store the post-calibration content hash of every analysed row."""
+    new_pos = {wid: pos for pos, wid, w, old in updates}
+    store_hashes(cursor, ((wid, word, new_pos.get(wid, pos)) for wid, word, pos in rows), version)
+    cursor.execute("DELETE FROM pos_calibration_state WHERE word_id NOT IN (SELECT id FROM words)")
+
+def restore_state(cursor, restored):
+    """
+    Record the POS values a rollback restored as analysed. Otherwise the
+    state would still hold the hash of the rolled-back value, and the next
+    incremental run would re-analyse those words and redo the change.
+    """
+    if not state_table_exists(cursor):
+        return
+    ids = [row_id for table, row_id, column in restored if (table, column) == ('words', 'part_of_speech')]
+    rows = [cursor.execute("SELECT id, word, part_of_speech FROM words WHERE id = ?", (wid,)).fetchone() for wid in ids]
+    # Rows keep the analyzer version they were recorded at
+    cursor.executemany(
+        "UPDATE pos_calibration_state SET content_hash = ? WHERE word_id = ?",
+        ((content_hash(word, pos), wid) for wid, word, pos in rows if wid is not None),
+    )
+
+def rollback(run_id=None):
+    """Undo one calibration run (the latest by default) from the undo journal."""
     if not os.path.exists(DB_PATH):
         print(f"Database not found at {DB_PATH}")
         return
 
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        run_id = run_id or latest_run_id(conn.cursor())
+        if not run_id:
+            print("No journaled run found.")
+            return
+        restored, conflicts = rollback_run(conn, run_id, on_restored=restore_state)
+        print(f"Rolled back run {run_id}: restored {restored} values.")
+        if conflicts:
+            print(f"Skipped {conflicts} values edited after the run.")
+    finally:
+        conn.close()
+
+def read_rows(cursor, full=False, rows=None, pos_index_path=None, metrics=None):
+    """
+    The (id, word, part_of_speech) rows to analyse, in id order: only new or
+    changed ones (for the senses source pos_index_path selects) unless full.
+    rows is an optional pre-read list of every word; otherwise they are read
+    from the words table. Never writes.
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    if rows is None:
+        with metrics.phase('fetch'):
+            cursor.execute("SELECT id, word, part_of_speech FROM words ORDER BY id")
+            rows = cursor.fetchall()
+    metrics.count('words_read', len(rows))
+
+    if not full:
+        total = len(rows)
+        with metrics.phase('filter changed'):
+            rows = filter_changed_rows(cursor, rows, analyzer_version(pos_index_path))
+        print(f"Incremental run: {len(rows)} of {total} words are new or changed (use --full to re-analyse all).")
+    return rows
+
+def iter_local_proposals(rows, workers=1, pos_index_path=None, metrics=None):
+    """Analyse rows in this process (or a pool of them), loading MeCab and Jamdict here."""
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    if workers > 1:
+        print(f"Using {workers} worker processes.")
+        yield from iter_parallel(rows, workers, pos_index_path=pos_index_path)
+    else:
+        from mecab_analysis import MorphAnalyzer
+        with metrics.phase('load'):
+            analyzer = MorphAnalyzer()
+            senses_for = make_senses_lookup(pos_index_path)
+        yield from iter_updates(analyzer, senses_for, rows, metrics)
+
+def iter_worker_proposals(client, rows, pos_index_path=None, metrics=None):
+    """Analyse rows on the resident worker, chunk by chunk; finish in-process if it goes away."""
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    for i in range(0, len(rows), ANALYSIS_CHUNK_SIZE):
+        try:
+            with metrics.phase('worker'):
+                updates = client.analyze(rows[i:i + ANALYSIS_CHUNK_SIZE])
+        except (OSError, ValueError, WorkerError) as e:
+            print(f"Analysis worker failed ({e}); analysing the rest in-process.")
+            client.close()
+            yield from iter_local_proposals(rows[i:], pos_index_path=pos_index_path, metrics=metrics)
+            return
+        yield from updates
+    client.close()
+
+def iter_proposals(rows, workers=1, pos_index_path=None, use_worker=True, metrics=None):
+    """
+    Yield the proposed (new_pos, id, word, old_pos) updates for rows, in id
+    order, as they are computed. Serial runs go to the resident analysis
+    worker when one is running (see analysis_worker.py).
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    print("Analyzing vocab...")
+    client = None
+    if use_worker and workers == 1 and rows:
+        client = connect_worker(analyzer_version=ANALYZER_VERSION, pos_index_path=pos_index_path)
+    if client:
+        print(f"Using analysis worker {client.info['pid']}.")
+        metrics.count('worker_runs')
+        yield from iter_worker_proposals(client, rows, pos_index_path, metrics)
+    else:
+        yield from iter_local_proposals(rows, workers, pos_index_path, metrics)
+    metrics.count('words_analysed', len(rows))
+
+def propose_updates(cursor, workers=1, pos_index_path=None, full=False, rows=None, use_worker=True, metrics=None):
+    """
+    Analyse words (only new or changed ones unless full). rows is an optional
+    pre-read list of (id, word, part_of_speech) in id order; otherwise they
+    are read from the words table. Returns (analysed rows, proposed updates).
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    rows = read_rows(cursor, full, rows, pos_index_path, metrics)
+    with metrics.phase('analyse'):
+        updates = list(iter_proposals(rows, workers, pos_index_path, use_worker, metrics))
+    metrics.count('updates_proposed', len(updates))
+    return rows, updates
+
+def apply_updates(cursor, rows, updates, run_id=None, pos_index_path=None, metrics=None):
+    """
+    Write the proposed updates, journal them and record the analysed state
+    (pos_index_path is the senses source the updates were proposed with).
+    Does not commit. Returns the run id.
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    run_id = run_id or new_run_id()
+    with metrics.phase('write'):
+        cursor.executemany("UPDATE words SET part_of_speech = ? WHERE id = ?", ((new_pos, wid) for new_pos, wid, w, old in updates))
+    with metrics.phase('journal'):
+        record_changes(cursor, run_id, 'words', 'part_of_speech', ((wid, old, new_pos) for new_pos, wid, w, old in updates))
+    with metrics.phase('record state'):
+        record_state(cursor, rows, updates, analyzer_version(pos_index_path))
+    metrics.count('updates_applied', len(updates))
+    return run_id
+
+def write_plan(path, proposals, version, sample=20):
+    """
+    Stream (new_pos, id, word, old_pos) proposals to a JSONL plan file, one
+    change per line, as they arrive, tagged with the analyzer version that
+    proposed them. The file is written under a temporary name and moved into
+    place when complete; a failed run removes it. Returns the change count.
+    """
+    tmp_path = path + '.tmp'
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for new_pos, wid, word, old_pos in proposals:
+                change = {'id': wid, 'word': word, 'old_pos': old_pos, 'new_pos': new_pos, 'analyzer': version}
+                f.write(json.dumps(change, ensure_ascii=False) + '\n')
+                if count < sample:
+                    print(f"[{wid}] {word}: '{old_pos}' -> '{new_pos}'")
+                count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+def iter_plan(path, batch_size=DEFAULT_PLAN_BATCH_SIZE):
+    """
+    Read a plan file in batches of (id, word, old_pos, new_pos, analyzer
+    version) tuples; the version is None in plans written before it was recorded.
+    """
+    batch = []
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                change = json.loads(line)
+                batch.append((change['id'], change['word'], change['old_pos'], change['new_pos'], change.get('analyzer')))
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{line_no}: not a plan entry ({e})")
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def apply_plan_batch(cursor, run_id, batch):
+    """
+    Apply one batch of plan entries whose word and POS still match what the
+    plan saw, journaled under run_id. Returns (applied, stale).
+    """
+    ids = [change[0] for change in batch]
+    current = {}
+    for i in range(0, len(ids), MAX_IN_PARAMS):
+        chunk = ids[i:i + MAX_IN_PARAMS]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"SELECT id, word, part_of_speech FROM words WHERE id IN ({placeholders})", chunk)
+        current.update((wid, (word, pos)) for wid, word, pos in cursor.fetchall())
+    fresh = [change for change in batch if current.get(change[0]) == (change[1], change[2])]
+
+    cursor.executemany("UPDATE words SET part_of_speech = ? WHERE id = ?", ((new_pos, wid) for wid, w, old, new_pos, _ in fresh))
+    record_changes(cursor, run_id, 'words', 'part_of_speech', ((wid, old, new_pos) for wid, w, old, new_pos, _ in fresh))
+    # The applied rows now hold their calibrated POS, so incremental runs with
+    # the same analyzer can skip them
+    for version in {change[4] for change in fresh if change[4]}:
+        store_hashes(cursor, ((wid, w, new_pos) for wid, w, old, new_pos, v in fresh if v == version), version)
+    return len(fresh), len(batch) - len(fresh)
+
+def apply_plan(path, batch_size=DEFAULT_PLAN_BATCH_SIZE, compress_backup=False, keep_backups=DEFAULT_KEEP,
+               max_backup_age=None, metrics=None):
+    """
+    Apply a reviewed plan file without running any analysis. Each batch is
+    its own transaction; all batches share one run id, so --rollback undoes
+    the whole plan. Entries whose row changed since the plan was written are
+    skipped as stale.
+    """
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+    if not os.path.exists(path):
+        print(f"Plan not found at {path}")
+        return
+
+    with metrics.phase('backup'):
+        backup_and_prune(backups, compress=compress_backup, keep=keep_backups, max_age_days=max_backup_age)
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    run_id = new_run_id()
+    applied = stale = 0
+    try:
+        for batch in iter_plan(path, batch_size):
+            with metrics.phase('apply batch'):
+                batch_applied, batch_stale = apply_plan_batch(cursor, run_id, batch)
+                conn.commit()
+            applied += batch_applied
+            stale += batch_stale
+            print(f"Applied {applied} changes...")
+    except (ValueError, sqlite3.Error) as e:
+        conn.rollback()
+        print(f"Error: {e}")
+        print(f"Stopped after {applied} committed changes (undo with --rollback {run_id}).")
+        return
+    finally:
+        conn.close()
+        metrics.count('plan_applied', applied)
+        metrics.count('plan_stale', stale)
+
+    print(f"Updated {applied} records from {path}. Run id: {run_id} (undo with --rollback {run_id})")
+    if stale:
+        print(f"Skipped {stale} stale entries whose word or POS changed since the plan was written.")
+
+def analyze_and_update(dry_run=False, workers=1, pos_index_path=None, full=False, plan_out=None, use_worker=True,
+                       compress_backup=False, keep_backups=DEFAULT_KEEP, max_backup_age=None, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('calibrate_pos')
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    if pos_index_path and not os.path.exists(pos_index_path):
+        print(f"POS index not found at {pos_index_path}. Build it with scripts/pos_index.py")
+        return
+
+    # A plan is a reviewable dry run: the database is not modified
+    dry_run = dry_run or bool(plan_out)
+
     # Create backup before modifying
     if not dry_run:
-        create_backup()
+        with metrics.phase('backup'):
+            backup_and_prune(backups, compress=compress_backup, keep=keep_backups, max_age_days=max_backup_age)
 
     try:
-        tagger = MeCab.Tagger()
-        jam = Jamdict() # Initialize Jamdict
-        
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT id, word, part_of_speech FROM words")
-        rows = cursor.fetchall()
-        
-        updates = []
-        
-        print("Analyzing vocab...")
-        
-        for row in rows:
-            word_id, word, current_pos = row
-            
-            # Remove leading/trailing tilde for analysis if present, but keep original for context
-            clean_word = word.replace('〜', '').replace('~', '')
-            if not clean_word: continue
+        if pos_index_path:
+            print(f"Using POS index: {pos_index_path}")
 
-            node = tagger.parseToNode(clean_word)
-            
-            # Simple heuristic: Check the POS of the first meaningful node or the whole structure
-            # MeCab POS format in unidic: pos1,pos2,pos3,pos4
-            
-            new_pos = current_pos
-            is_grammar = False
-            
-            # Heuristics based on keyword presence (stronger than generic MeCab sometimes for JLPT grammar)
-            if '〜' in word:
-                 # Likely a suffix, prefix, or grammar point
-                 pass
-            
-            while node:
-                features = node.feature.split(',')
-                pos1 = features[0]
-                pos2 = features[1] if len(features) > 1 else ''
-                
-                # Check for particles, auxiliary verbs, etc.
-                if pos1 in ['助詞', '助動詞', '接頭辞', '接尾辞', '連体詞']:
-                     # If the word is *essentially* just this, or a compound of these
-                     # We might want to tag it. 
-                     # For now, let's just log what MeCab thinks vs what we have.
-                     pass
-                
-                node = node.next
-
-            # NOTE: MeCab is good for tokenizing sentences. For single vocabulary words, 
-            # sometimes the dictionary definition is better.
-            # However, if we want to detect "Grammar", we look for:
-            # 1. Words containing '〜' -> Label as 'Phrase/Grammar' or specific parts
-            # 2. Existing '連語', '成句' tags are good.
-            # 3. Use MeCab to identify 'Particle' (助詞) or 'Auxiliary Verb' (助動詞) if not tagged.
-
-            # Heuristic application:
-            detected_type = None
-            
-            # 1. Explicit symbols
-            if '〜' in word:
-                if word.startswith('〜') and word.endswith('〜'): detected_type = 'Middle Phrase' # Rare
-                elif word.startswith('〜'): detected_type = '接尾/Suffix' # or Grammar
-                elif word.endswith('〜'): detected_type = '接頭/Prefix'
-                else: detected_type = '文法/Grammar' # Middle like ...〜...
-
-            # 2. Jamdict Analysis (Secondary Check)
-            # Only if MeCab didn't give a strong signal or to confirm
-            try:
-                # Jamdict might be slow if initialized every time, moved outside loop
-                j_result = jam.lookup(word)
-                if j_result.entries:
-                    # Check the first few entries/senses
-                    for entry in j_result.entries[:2]:
-                        for sense in entry.senses:
-                            # suble is a list of POS strings in Jamdict
-                            # e.g. 'exp' (Expressions), 'prt' (Particle), 'aux' (Auxiliary)
-                            # 'conj' (Conjunction), 'pref' (Prefix), 'suf' (Suffix)
-                            parts = [str(x) for x in sense.pos] 
-                            
-                            if 'exp' in parts or 'int' in parts: # Expressions often grammar
-                                if not detected_type: detected_type = '文法/Grammar'
-                            if 'prt' in parts:
-                                detected_type = '助詞/Particle'
-                            if 'aux' in parts or 'aux-v' in parts or 'aux-adj' in parts:
-                                detected_type = '助動詞/Aux'
-                            if 'conj' in parts:
-                                detected_type = '接続詞/Conjunction'
-                            if 'pref' in parts:
-                                detected_type = '接頭/Prefix'
-                            if 'suf' in parts:
-                                detected_type = '接尾/Suffix'
-                            
-                            if detected_type: break
-                        if detected_type: break
-            except Exception as e:
-                # print(f"Jamdict error for {word}: {e}")
-                pass
-
-            # 3. MeCab Analysis (Fallback or Refinement)
-            if not detected_type:
-                # Re-parse
-                node = tagger.parseToNode(clean_word)
-                
-                # Analyze the first node
-                first_node_feature = node.next.feature.split(',') if node.next else []
-                pos1 = first_node_feature[0] if first_node_feature else ''
-
-                if pos1 == '助詞': 
-                    detected_type = '助詞/Particle'
-                elif pos1 == '助動詞': 
-                    detected_type = '助動詞/Aux'
-                elif pos1 == '接続詞': 
-                    detected_type = '接続詞/Conjunction'
-                elif pos1 == '連体詞': 
-                    detected_type = '連体詞/Determiner'
-                
-                # Careful with Prefixes/Suffixes
-                elif pos1 == '接頭辞' and ('〜' in word or len(clean_word) == 1):
-                    detected_type = '接頭/Prefix'
-                elif pos1 == '接尾辞' and ('〜' in word): 
-                    detected_type = '接尾/Suffix'
-
-            # Determine if we should update
-            should_update = False
-            proposed_pos = current_pos
-
-            if detected_type:
-                grammar_type_label = detected_type.split('/')[-1] # e.g. 'Particle'
-                grammar_kanji = detected_type.split('/')[0]      # e.g. '助詞'
-
-                # Case 1: Current POS is empty
-                if not current_pos:
-                    proposed_pos = grammar_kanji
-                    should_update = True
-                
-                # Case 2: Replace abbreviations or Append if missing
-                elif grammar_kanji not in current_pos:
-                     
-                     # Define abbreviation mappings (Full -> [Abbreviations])
-                     abbreviations = {
-                         '接続詞': ['接'],
-                         '連体詞': ['連体'],
-                         '副詞': ['副'],
-                         '接頭辞': ['接頭'], # Standardize if needed
-                         '接尾辞': ['接尾'],
-                         '助詞': ['助'],
-                     }
-                     
-                     target_abbrs = abbreviations.get(grammar_kanji, [])
-                     
-                     parts = current_pos.split('・')
-                     new_parts = []
-                     replaced = False
-                     
-                     for p in parts:
-                         if p in target_abbrs:
-                             new_parts.append(grammar_kanji)
-                             replaced = True
-                         else:
-                             new_parts.append(p)
-                     
-                     # If we didn't find an abbreviation to replace, we append the new term
-                     # UNLESS it's already there (checked by elif above)
-                     if not replaced:
-                         new_parts.append(grammar_kanji)
-                     
-                     proposed_pos = '・'.join(new_parts)
-                     should_update = True
-            
-            # Special Case: '〜' implies grammar/affix usually. 
-            if '〜' in word and not should_update:
-                 if '接' not in (current_pos or '') and '造' not in (current_pos or ''):
-                     proposed_pos = (current_pos + '・' if current_pos else '') + '接辞/Affix'
-                     should_update = True
+        if plan_out:
+            rows = read_rows(cursor, full, pos_index_path=pos_index_path, metrics=metrics)
+            print(f"Writing plan to {plan_out}. Sample proposed changes:")
+            with metrics.phase('analyse'):
+                proposals = iter_proposals(rows, workers, pos_index_path, use_worker, metrics)
+                count = write_plan(plan_out, proposals, analyzer_version(pos_index_path))
+            metrics.count('updates_proposed', count)
+            conn.close()
+            print(f"Wrote {count} proposed changes to {plan_out}. Review it, then apply with --apply-plan {plan_out}")
+            return
 
-            if should_update:
-                updates.append((proposed_pos, word_id, word, current_pos))
+        rows, updates = propose_updates(cursor, workers=workers, pos_index_path=pos_index_path, full=full,
+                                        use_worker=use_worker, metrics=metrics)
 
         print(f"Found {len(updates)} candidates for update.")
         
@@ -233,12 +584,10 @@ def analyze_and_update(dry_run=False):
                 print(f"[{wid}] {w}: '{old}' -> '{new}'")
         else:
             print("Applying updates...")
-            count = 0
-            for new_pos, wid, w, old in updates:
-                cursor.execute("UPDATE words SET part_of_speech = ? WHERE id = ?", (new_pos, wid))
-                count += 1
-            conn.commit()
-            print(f"Updated {count} records.")
+            run_id = apply_updates(cursor, rows, updates, pos_index_path=pos_index_path, metrics=metrics)
+            with metrics.phase('commit'):
+                conn.commit()
+            print(f"Updated {len(updates)} records. Run id: {run_id} (undo with --rollback {run_id})")
 
         conn.close()
 
@@ -247,16 +596,46 @@ def analyze_and_update(dry_run=False):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Calibrate database POS using MeCab')
-    parser.add_argument('--rollback', action='store_true', help='Rollback to the latest backup')
+    parser.add_argument('--rollback', nargs='?', const='', metavar='RUN_ID',
+                        help='Undo the changes of a calibration run (default: the latest) from the undo journal')
+    parser.add_argument('--restore-backup', action='store_true', help='Restore the whole database from the latest backup')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying DB')
+    parser.add_argument('--workers', type=int, default=1, help='Analyse with N worker processes (default: 1, serial)')
+    parser.add_argument('--pos-index', nargs='?', const=DEFAULT_INDEX_PATH, metavar='PATH',
+                        help='Use the precompiled JMdict POS index (see pos_index.py) instead of live Jamdict')
+    parser.add_argument('--full', action='store_true', help='Re-analyse every word, not only new or changed ones')
+    parser.add_argument('--no-worker', action='store_true', help='Analyse in-process even if analysis_worker.py is running')
+    parser.add_argument('--plan-out', metavar='FILE', help='Stream every proposed change to a JSONL plan file (implies --dry-run)')
+    parser.add_argument('--apply-plan', metavar='FILE', help='Apply a reviewed plan file without re-running the analysis')
+    parser.add_argument('--plan-batch-size', type=int, default=DEFAULT_PLAN_BATCH_SIZE, help='Plan changes per transaction')
+    add_backup_arguments(parser)
+    add_metrics_arguments(parser)
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.plan_batch_size < 1:
+        parser.error('--plan-batch-size must be positive')
+    if args.plan_out and args.apply_plan:
+        parser.error('--plan-out and --apply-plan are separate steps')
     
-    if args.rollback:
-        latest = get_latest_backup()
+    if args.rollback is not None:
+        rollback(args.rollback or None)
+    elif args.restore_backup:
+        latest = backups.latest()
         if latest:
-            rollback(latest)
+            backups.restore(latest)
         else:
             print("No backup found.")
+    elif args.apply_plan:
+        metrics = metrics_from_args('calibrate_pos', args)
+        apply_plan(args.apply_plan, batch_size=args.plan_batch_size, compress_backup=args.compress_backup,
+                   keep_backups=args.keep_backups, max_backup_age=args.max_backup_age, metrics=metrics)
+        emit(metrics, args)
     else:
-        analyze_and_update(dry_run=args.dry_run)
+        metrics = metrics_from_args('calibrate_pos', args)
+        analyze_and_update(dry_run=args.dry_run, workers=args.workers, pos_index_path=args.pos_index, full=args.full,
+                           plan_out=args.plan_out, use_worker=not args.no_worker,
+                           compress_backup=args.compress_backup, keep_backups=args.keep_backups,
+                           max_backup_age=args.max_backup_age, metrics=metrics)
+        emit(metrics, args)
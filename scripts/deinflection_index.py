@@ -0,0 +1,117 @@
+import sqlite3
+import os
+import argparse
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+# Reverse index from conjugated surface forms to their dictionary entries.
+#
+# word_conjugations is keyed by (word_id, type_id), so finding the entry for
+# a pasted form like 行った or 食べられる means scanning it. This stage copies
+# it into a WITHOUT ROWID table whose primary key starts with
+# conjugated_word: the rows are stored sorted by form, so an exact lookup is
+# one B-tree seek and a prefix search is one bounded range scan.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+INDEX_TABLE = 'conjugation_lookup'
+
+DEFAULT_PREFIX_LIMIT = 20
+
+def build_index(cursor, metrics=None):
+    """(Re)build the lookup table from word_conjugations without committing. Returns the row count."""
+    metrics = metrics if metrics is not None else Metrics('deinflection_index')
+    with metrics.phase('rebuild'):
+        cursor.execute(f"DROP TABLE IF EXISTS {INDEX_TABLE}")
+        cursor.execute(f'''
+            CREATE TABLE {INDEX_TABLE} (
+                conjugated_word TEXT NOT NULL,
+                word_id INTEGER NOT NULL,
+                type_id INTEGER NOT NULL,
+                PRIMARY KEY (conjugated_word, word_id, type_id)
+            ) WITHOUT ROWID
+        ''')
+        # Inserting in key order appends to the B-tree instead of splitting pages
+        cursor.execute(f'''
+            INSERT INTO {INDEX_TABLE} (conjugated_word, word_id, type_id)
+            SELECT conjugated_word, word_id, type_id
+            FROM word_conjugations
+            ORDER BY conjugated_word, word_id, type_id
+        ''')
+    metrics.count('forms_indexed', cursor.rowcount)
+    return cursor.rowcount
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix (codepoint order = BINARY collation)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class DeinflectionIndex:
+    """
+    Read API over the lookup table. Results are
+    (conjugated_word, word_id, word, type_code, type_name_ja) tuples.
+    """
+
+    SELECT = f'''
+        SELECT l.conjugated_word, l.word_id, w.word, t.code, t.name_ja
+        FROM {INDEX_TABLE} l
+        JOIN words w ON w.id = l.word_id
+        JOIN conjugation_types t ON t.id = l.type_id
+    '''
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def lookup(self, form):
+        """Every (entry, conjugation type) that produces exactly this form."""
+        return self.conn.execute(
+            self.SELECT + " WHERE l.conjugated_word = ? ORDER BY t.sort_order, l.word_id",
+            (form,),
+        ).fetchall()
+
+    def prefix(self, prefix, limit=DEFAULT_PREFIX_LIMIT):
+        """Forms starting with prefix, in form order (a range scan, not LIKE)."""
+        if not prefix:
+            return []
+        return self.conn.execute(
+            self.SELECT + " WHERE l.conjugated_word >= ? AND l.conjugated_word < ? ORDER BY l.conjugated_word, l.word_id LIMIT ?",
+            (prefix, prefix_upper_bound(prefix), limit),
+        ).fetchall()
+
+    def word_ids(self, form):
+        """Distinct dictionary entries for a form, without the joins."""
+        rows = self.conn.execute(
+            f"SELECT DISTINCT word_id FROM {INDEX_TABLE} WHERE conjugated_word = ?", (form,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+def print_results(title, results):
+    print(f"{title}: {len(results)} match(es)")
+    for form, word_id, word, code, name_ja in results:
+        print(f" - {form} <- [{word_id}] {word} ({name_ja}, {code})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or query the conjugated-form lookup index')
+    parser.add_argument('--lookup', nargs='+', metavar='FORM', help='Look up exact conjugated forms instead of building')
+    parser.add_argument('--prefix', metavar='PREFIX', help='List forms starting with PREFIX instead of building')
+    parser.add_argument('--limit', type=int, default=DEFAULT_PREFIX_LIMIT, help='Maximum prefix matches')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+    elif args.lookup or args.prefix:
+        conn = sqlite3.connect(DB_PATH)
+        index = DeinflectionIndex(conn)
+        for form in args.lookup or []:
+            print_results(form, index.lookup(form))
+        if args.prefix:
+            print_results(f"{args.prefix}*", index.prefix(args.prefix, args.limit))
+        conn.close()
+    else:
+        metrics = metrics_from_args('deinflection_index', args)
+        conn = sqlite3.connect(DB_PATH)
+        count = build_index(conn.cursor(), metrics)
+        with metrics.phase('commit'):
+            conn.commit()
+        conn.close()
+        print(f"Indexed {count} conjugated forms into {INDEX_TABLE}.")
+        emit(metrics, args)
@@ -1,7 +1,48 @@
 import sqlite3
+import os
 import re
+import time
+import argparse
+import functools
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
 
-DB_PATH = 'assets/database/breeze_jp.sqlite'
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+# Rows per fetchmany() chunk and per executemany() batch
+DEFAULT_BATCH_SIZE = 5000
+
+# Session PRAGMAs for the bulk write. The whole run is one transaction, so
+# durability only matters at the final commit. All of them last only for the
+# connection; journal_mode is left alone because WAL would be written into
+# the database file itself.
+SESSION_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB when negative, i.e. ~64 MB
+    'temp_store': 'MEMORY',
+}
+
+# Words that may conjugate: verbs (动, or 動 after normalize_pos.py --to ja) and adjectives (形)
+CANDIDATE_WHERE = "part_of_speech LIKE '%动%' OR part_of_speech LIKE '%動%' OR part_of_speech LIKE '%形%'"
+
+INSERT_CONJUGATION_SQL = '''
+    INSERT OR REPLACE INTO word_conjugations (word_id, type_id, conjugated_word)
+    VALUES (?, ?, ?)
+'''
+
+# Incremental mode: existing rows are read one id range at a time through the
+# UNIQUE(word_id, type_id) index and only the differences are written.
+SELECT_EXISTING_SQL = '''
+    SELECT word_id, type_id, conjugated_word FROM word_conjugations
+    WHERE word_id BETWEEN ? AND ?
+'''
+DIFF_INSERT_SQL = 'INSERT INTO word_conjugations (word_id, type_id, conjugated_word) VALUES (?, ?, ?)'
+DIFF_UPDATE_SQL = 'UPDATE word_conjugations SET conjugated_word = ? WHERE word_id = ? AND type_id = ?'
+DIFF_DELETE_SQL = 'DELETE FROM word_conjugations WHERE word_id = ? AND type_id = ?'
+
+# Bounds of the first and last id range, so rows of deleted words outside the
+# current id span are found too
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
 
 # Conjugation rules
 # V1: Godan (u-verbs)
@@ -11,316 +52,349 @@ DB_PATH = 'assets/database/breeze_jp.sqlite'
 # ADJ_I: I-adjective
 # ADJ_NA: Na-adjective
 
-def get_verb_type(word, pos):
+# Form codes in conjugation_types sort order. Compiled rules are arrays indexed
+# by position in this tuple.
+FORM_CODES = (
+    'polite_present',
+    'polite_past',
+    'polite_negative',
+    'polite_past_negative',
+    'plain_present',
+    'plain_past',
+    'plain_negative',
+    'plain_past_negative',
+    'te_form',
+    'potential',
+    'passive',
+    'causative',
+    'causative_passive',
+    'imperative',
+    'volitional',
+    'conditional_ba',
+    'conditional_tara',
+)
+
+# Godan rows: dictionary ending, i/a/e/o-row kana, te-form and ta-form endings
+GODAN_ROWS = [
+    ('う', 'い', 'わ', 'え', 'お', 'って', 'った'),
+    ('く', 'き', 'か', 'け', 'こ', 'いて', 'いた'),
+    ('ぐ', 'ぎ', 'が', 'げ', 'ご', 'いで', 'いだ'),
+    ('す', 'し', 'さ', 'せ', 'そ', 'して', 'した'),
+    ('つ', 'ち', 'た', 'て', 'と', 'って', 'った'),
+    ('ぬ', 'に', 'な', 'ね', 'の', 'んで', 'んだ'),
+    ('ぶ', 'び', 'ば', 'べ', 'ぼ', 'んで', 'んだ'),
+    ('む', 'み', 'ま', 'め', 'も', 'んで', 'んだ'),
+    ('る', 'り', 'ら', 'れ', 'ろ', 'って', 'った'),
+]
+
+# 行く is the one godan verb with an irregular te/ta-form. Only the exact words
+# are covered; the row spells out the whole word because the stem is empty.
+GODAN_EXCEPTION_ROWS = [
+    ('行く', '行き', '行か', '行け', '行こ', '行って', '行った'),
+    ('いく', 'いき', 'いか', 'いけ', 'いこ', 'いって', 'いった'),
+]
+
+GODAN_TEMPLATE = {
+    'polite_present': '{i}ます',
+    'polite_past': '{i}ました',
+    'polite_negative': '{i}ません',
+    'polite_past_negative': '{i}ませんでした',
+    'plain_present': '{u}',
+    'plain_past': '{ta}',
+    'plain_negative': '{a}ない',
+    'plain_past_negative': '{a}なかった',
+    'te_form': '{te}',
+    'potential': '{e}る',
+    'passive': '{a}れる',
+    'causative': '{a}せる',
+    'causative_passive': '{a}せられる', # or sareru
+    'imperative': '{e}',
+    'volitional': '{o}う',
+    'conditional_ba': '{e}ば',
+    'conditional_tara': '{ta}ら',
+}
+
+def godan_forms(row):
+    u, i, a, e, o, te, ta = row
+    return {code: template.format(u=u, i=i, a=a, e=e, o=o, te=te, ta=ta)
+            for code, template in GODAN_TEMPLATE.items()}
+
+ICHIDAN_FORMS = {
+    'polite_present': 'ます',
+    'polite_past': 'ました',
+    'polite_negative': 'ません',
+    'polite_past_negative': 'ませんでした',
+    'plain_present': '=',
+    'plain_past': 'た',
+    'plain_negative': 'ない',
+    'plain_past_negative': 'なかった',
+    'te_form': 'て',
+    'potential': 'られる',
+    'passive': 'られる',
+    'causative': 'させる',
+    'causative_passive': 'させられる',
+    'imperative': 'ろ',
+    'volitional': 'よう',
+    'conditional_ba': 'れば',
+    'conditional_tara': 'たら',
+}
+
+SURU_FORMS = {
+    'polite_present': 'します',
+    'polite_past': 'しました',
+    'polite_negative': 'しません',
+    'polite_past_negative': 'しませんでした',
+    'plain_present': 'する',
+    'plain_past': 'した',
+    'plain_negative': 'しない',
+    'plain_past_negative': 'しなかった',
+    'te_form': 'して',
+    'potential': 'できる', # proper potential is dekiru
+    'passive': 'される',
+    'causative': 'させる',
+    'causative_passive': 'させられる',
+    'imperative': 'しろ',
+    'volitional': 'しよう',
+    'conditional_ba': 'すれば',
+    'conditional_tara': 'したら',
+}
+
+# Kuru forms are spelled out whole. Handling irregular kanji readings is tricky
+# without furigana context, so any word containing 来 gets the kanji spelling.
+KURU_KANJI_FORMS = {
+    'polite_present': '来ます',
+    'polite_past': '来ました',
+    'polite_negative': '来ません',
+    'polite_past_negative': '来ませんでした',
+    'plain_present': '来る',
+    'plain_past': '来た',
+    'plain_negative': '来ない', # konai
+    'plain_past_negative': '来なかった',
+    'te_form': '来て',
+    'potential': '来られる', # korareru
+    'passive': '来られる',
+    'causative': '来させる', # kosaseru
+    'causative_passive': '来させられる',
+    'imperative': '来い', # koi
+    'volitional': '来よう', # koyou
+    'conditional_ba': '来れば', # kureba
+    'conditional_tara': '来たら',
+}
+
+KURU_KANA_FORMS = {
+    'polite_present': 'きます',
+    'polite_past': 'きました',
+    'polite_negative': 'きません',
+    'polite_past_negative': 'きませんでした',
+    'plain_present': 'くる',
+    'plain_past': 'きた',
+    'plain_negative': 'こない',
+    'plain_past_negative': 'こなかった',
+    'te_form': 'きて',
+    'potential': 'こられる',
+    'passive': 'こられる',
+    'causative': 'こさせる',
+    'causative_passive': 'こさせられる',
+    'imperative': 'こい',
+    'volitional': 'こよう',
+    'conditional_ba': 'くれば',
+    'conditional_tara': 'きたら',
+}
+
+# Adjectives don't have potential/passive etc usually.
+ADJ_I_FORMS = {
+    'polite_present': '=です',
+    'polite_past': 'かったです',
+    'polite_negative': 'くないです',
+    'polite_past_negative': 'くなかったです',
+    'plain_present': '=',
+    'plain_past': 'かった',
+    'plain_negative': 'くない',
+    'plain_past_negative': 'くなかった',
+    'te_form': 'くて',
+    'conditional_ba': 'ければ',
+    'conditional_tara': 'かったら',
+}
+
+ADJ_II_FORMS = {
+    'polite_present': 'いいです',
+    'polite_past': 'よかったです',
+    'polite_negative': 'よくないです', # or yoku-arimasen
+    'polite_past_negative': 'よくなかったです',
+    'plain_present': 'いい',
+    'plain_past': 'よかった',
+    'plain_negative': 'よくない',
+    'plain_past_negative': 'よくなかった',
+    'te_form': 'よくて',
+    'conditional_ba': 'よければ',
+    'conditional_tara': 'よかったら',
+}
+
+# Na-adjectives are stored as the stem only (e.g. 綺麗 without na)
+ADJ_NA_FORMS = {
+    'polite_present': 'です',
+    'polite_past': 'でした',
+    'polite_negative': 'じゃないです', # or dewa-arimasen
+    'polite_past_negative': 'じゃなかったです',
+    'plain_present': 'だ',
+    'plain_past': 'だった',
+    'plain_negative': 'じゃない', # or dewa-nai
+    'plain_past_negative': 'じゃなかった',
+    'te_form': 'で',
+    'conditional_ba': 'ならば', # or nara
+    'conditional_tara': 'だったら',
+}
+
+# Declarative rule table: (verb type, ending, {form code: suffix}).
+#
+# Endings:
+#   'xx'  the word ends with xx; the stem is the word without it
+#   '^xx' the word is exactly xx; the stem is empty
+#   '*'   any single trailing character is dropped
+#   ''    always matches; the stem is the whole word
+# The longest matching ending wins, exact words first. A suffix starting with
+# '=' is appended to the dictionary form instead of the stem.
+# Types in WHOLE_WORD_TYPES spell out complete forms: their ending only has to
+# occur somewhere in the word and the stem is always empty.
+CONJUGATION_RULES = (
+    [('V1', row[0], godan_forms(row)) for row in GODAN_ROWS]
+    + [('V1', '^' + row[0], godan_forms(row)) for row in GODAN_EXCEPTION_ROWS]
+    + [
+        ('V2', '*', ICHIDAN_FORMS),
+        ('VS', 'する', SURU_FORMS),
+        ('VS', '', SURU_FORMS), # noun acting as VS, append suru
+        ('VK', '来', KURU_KANJI_FORMS),
+        ('VK', '', KURU_KANA_FORMS),
+        ('ADJ_I', '^いい', ADJ_II_FORMS),
+        ('ADJ_I', '*', ADJ_I_FORMS),
+        ('ADJ_NA', '', ADJ_NA_FORMS),
+    ]
+)
+
+WHOLE_WORD_TYPES = {'VK'}
+
+_FORM_INDEX = {code: i for i, code in enumerate(FORM_CODES)}
+
+def compile_forms(forms):
+    """Compile {form code: suffix} into a FORM_CODES-ordered tuple of (form index, from_word, suffix)."""
+    compiled = []
+    for code, suffix in forms.items():
+        if suffix.startswith('='):
+            compiled.append((_FORM_INDEX[code], True, suffix[1:]))
+        else:
+            compiled.append((_FORM_INDEX[code], False, suffix))
+    compiled.sort()
+    return tuple(compiled)
+
+def compile_rules(rules):
     """
-    Determine verb type from POS string and word ending.
+    Compile the rule table once into per-type lookup structures:
+    {vtype: (exact, lengths, endings, wildcard)} where exact maps whole words
+    to forms, endings maps each ending to its forms, lengths lists the ending
+    lengths longest first and wildcard is the forms for '*', if any. Endings
+    are kept longest first for the whole-word types.
     """
-    if any(x in pos for x in ['动1', '五段']):
+    compiled = {}
+    for vtype, ending, forms in rules:
+        exact, endings, wildcard = compiled.setdefault(vtype, ({}, {}, [None]))
+        forms = compile_forms(forms)
+        if ending.startswith('^'):
+            exact[ending[1:]] = forms
+        elif ending == '*':
+            wildcard[0] = forms
+        else:
+            endings[ending] = forms
+
+    result = {}
+    for vtype, (exact, endings, wildcard) in compiled.items():
+        endings = dict(sorted(endings.items(), key=lambda e: len(e[0]), reverse=True))
+        lengths = sorted({len(e) for e in endings}, reverse=True)
+        result[vtype] = (exact, lengths, endings, wildcard[0])
+    return result
+
+COMPILED_RULES = compile_rules(CONJUGATION_RULES)
+
+@functools.lru_cache(maxsize=None)
+def get_pos_class(pos):
+    """Map a POS string to a conjugation class. Suru/kuru are told apart later by the word."""
+    if any(x in pos for x in ['动1', '動1', '五段']):
         return 'V1'
-    elif any(x in pos for x in ['动2', '一段']):
+    elif any(x in pos for x in ['动2', '動2', '一段']):
         return 'V2'
-    elif any(x in pos for x in ['动3', 'カ変', 'サ変']):
-        if word.endswith('する'):
-            return 'VS'
-        if word.endswith('くる') or word.endswith('来る'):
-            return 'VK'
-        # Some nouns might be marked as suru-verbs but just noun part
-        return 'VS' 
+    elif any(x in pos for x in ['动3', '動3', 'カ変', 'サ変']):
+        return 'V3'
     elif 'イ形' in pos:
         return 'ADJ_I'
     elif 'ナ形' in pos:
         return 'ADJ_NA'
     return None
 
-def conjugate_v1(word):
-    """Conjugate Godan verbs."""
-    # Last char mapping
-    # u -> i (polite), a (negative), e (potential/imperative), o (volitional), tte/ta (te/ta form)
-    
-    stem = word[:-1]
-    last = word[-1]
-    
-    # Te-form / Ta-form rules
-    te_suffix = ''
-    ta_suffix = ''
-    
-    if last in ['う', 'つ', 'る']:
-        te_suffix = 'って'
-        ta_suffix = 'った'
-    elif last in ['ぬ', 'ぶ', 'む']:
-        te_suffix = 'んで'
-        ta_suffix = 'んだ'
-    elif last == 'く':
-        if word == '行く' or word == 'いく': # Exception
-            te_suffix = 'って'
-            ta_suffix = 'った'
-        else:
-            te_suffix = 'いて'
-            ta_suffix = 'いた'
-    elif last == 'ぐ':
-        te_suffix = 'いで'
-        ta_suffix = 'いだ'
-    elif last == 'す':
-        te_suffix = 'して'
-        ta_suffix = 'した'
-        
-    # Dict to storage mappings
-    forms = {}
-    
-    # Helper to change u-sound to i-sound
-    u_to_i = {'う':'い', 'く':'き', 'ぐ':'ぎ', 'す':'し', 'つ':'ち', 'ぬ':'に', 'ぶ':'び', 'む':'み', 'る':'り'}
-    u_to_a = {'う':'わ', 'く':'か', 'ぐ':'が', 'す':'さ', 'つ':'た', 'ぬ':'な', 'ぶ':'ば', 'む':'ま', 'る':'ら'}
-    u_to_e = {'う':'え', 'く':'け', 'ぐ':'げ', 'す':'せ', 'つ':'て', 'ぬ':'ね', 'ぶ':'べ', 'む':'め', 'る':'れ'}
-    u_to_o = {'う':'お', 'く':'こ', 'ぐ':'ご', 'す':'そ', 'つ':'と', 'ぬ':'の', 'ぶ':'ぼ', 'む':'も', 'る':'ろ'}
-
-    i_stem = stem + u_to_i[last]
-    a_stem = stem + u_to_a[last]
-    e_stem = stem + u_to_e[last]
-    o_stem = stem + u_to_o[last]
-
-    forms['polite_present'] = i_stem + 'ます'
-    forms['polite_past'] = i_stem + 'ました'
-    forms['polite_negative'] = i_stem + 'ません'
-    forms['polite_past_negative'] = i_stem + 'ませんでした'
-    
-    forms['plain_present'] = word
-    forms['plain_past'] = stem + ta_suffix
-    forms['plain_negative'] = a_stem + 'ない'
-    forms['plain_past_negative'] = a_stem + 'なかった'
-    
-    forms['te_form'] = stem + te_suffix
-    
-    forms['potential'] = e_stem + 'る'
-    forms['passive'] = a_stem + 'れる'
-    forms['causative'] = a_stem + 'せる'
-    forms['causative_passive'] = a_stem + 'せられる' # or sareru
-    
-    forms['imperative'] = e_stem
-    forms['volitional'] = o_stem + 'う'
-    
-    forms['conditional_ba'] = e_stem + 'ば'
-    forms['conditional_tara'] = stem + ta_suffix + 'ら'
-    
-    return forms
+def get_verb_type(word, pos):
+    """
+    Determine verb type from POS string and word ending.
+    """
+    vtype = get_pos_class(pos)
+    if vtype == 'V3':
+        if word.endswith('する'):
+            return 'VS'
+        if word.endswith('くる') or word.endswith('来る'):
+            return 'VK'
+        # Some nouns might be marked as suru-verbs but just noun part
+        return 'VS'
+    return vtype
 
-def conjugate_v2(word):
-    """Conjugate Ichidan verbs (ru-verbs)."""
-    stem = word[:-1] # Remove る
-    
-    forms = {}
-    forms['polite_present'] = stem + 'ます'
-    forms['polite_past'] = stem + 'ました'
-    forms['polite_negative'] = stem + 'ません'
-    forms['polite_past_negative'] = stem + 'ませんでした'
-    
-    forms['plain_present'] = word
-    forms['plain_past'] = stem + 'た'
-    forms['plain_negative'] = stem + 'ない'
-    forms['plain_past_negative'] = stem + 'なかった'
-    
-    forms['te_form'] = stem + 'て'
-    
-    forms['potential'] = stem + 'られる'
-    forms['passive'] = stem + 'られる'
-    forms['causative'] = stem + 'させる'
-    forms['causative_passive'] = stem + 'させられる'
-    
-    forms['imperative'] = stem + 'ろ'
-    forms['volitional'] = stem + 'よう'
-    
-    forms['conditional_ba'] = stem + 'れば'
-    forms['conditional_tara'] = stem + 'たら'
-    
-    return forms
-
-def conjugate_vs(word):
-    """Conjugate Suru verbs."""
-    # Often noun + suru
-    if word == 'する':
-        prefix = ''
-    elif word.endswith('する'):
-        prefix = word[:-2]
-    else:
-        # Assuming it's a noun that acts as VS, append suru
-        prefix = word
-    
-    forms = {}
-    forms['polite_present'] = prefix + 'します'
-    forms['polite_past'] = prefix + 'しました'
-    forms['polite_negative'] = prefix + 'しません'
-    forms['polite_past_negative'] = prefix + 'しませんでした'
-    
-    forms['plain_present'] = prefix + 'する'
-    forms['plain_past'] = prefix + 'した'
-    forms['plain_negative'] = prefix + 'しない'
-    forms['plain_past_negative'] = prefix + 'しなかった'
-    
-    forms['te_form'] = prefix + 'して'
-    
-    forms['potential'] = prefix + 'できる' # proper potential is dekiru
-    forms['passive'] = prefix + 'される'
-    forms['causative'] = prefix + 'させる'
-    forms['causative_passive'] = prefix + 'させられる'
-    
-    forms['imperative'] = prefix + 'しろ'
-    forms['volitional'] = prefix + 'しよう'
-    
-    forms['conditional_ba'] = prefix + 'すれば'
-    forms['conditional_tara'] = prefix + 'したら'
-    
-    return forms
+def match_rule(vtype, word):
+    """Return (stem, compiled forms) for the first matching rule, or None."""
+    exact, lengths, endings, wildcard = COMPILED_RULES[vtype]
 
-def conjugate_vk(word):
-    """Conjugate Kuru verbs."""
-    # Comes as 来る or くる usually
-    # Handling irregular kanji readings is tricky without furigana context
-    # But usually output is standard
-    
-    # If word is kanji '来る', we output kanji forms? 
-    # Or just kana? Usually kana is safer for conjugation rules unless we have furigana.
-    # Let's support '来る' specifically.
-    
-    is_kanji = '来' in word
-    
-    forms = {}
-    
-    if is_kanji:
-        # Standard readings: 
-        # kimasu (来ます), kita (来た), konai (来ない), kuru (来る)
-        forms['polite_present'] = '来ます'
-        forms['polite_past'] = '来ました'
-        forms['polite_negative'] = '来ません'
-        forms['polite_past_negative'] = '来ませんでした'
-        
-        forms['plain_present'] = '来る'
-        forms['plain_past'] = '来た'
-        forms['plain_negative'] = '来ない' # konai
-        forms['plain_past_negative'] = '来なかった'
-        
-        forms['te_form'] = '来て'
-        
-        forms['potential'] = '来られる' # korareru
-        forms['passive'] = '来られる'
-        forms['causative'] = '来させる' # kosaseru
-        forms['causative_passive'] = '来させられる'
-        
-        forms['imperative'] = '来い' # koi
-        forms['volitional'] = '来よう' # koyou
-        
-        forms['conditional_ba'] = '来れば' # kureba
-        forms['conditional_tara'] = '来たら'
-    else:
-        forms['polite_present'] = 'きます'
-        forms['polite_past'] = 'きました'
-        forms['polite_negative'] = 'きません'
-        forms['polite_past_negative'] = 'きませんでした'
-        
-        forms['plain_present'] = 'くる'
-        forms['plain_past'] = 'きた'
-        forms['plain_negative'] = 'こない'
-        forms['plain_past_negative'] = 'こなかった'
-        
-        forms['te_form'] = 'きて'
-        
-        forms['potential'] = 'こられる'
-        forms['passive'] = 'こられる'
-        forms['causative'] = 'こさせる'
-        forms['causative_passive'] = 'こさせられる'
-        
-        forms['imperative'] = 'こい'
-        forms['volitional'] = 'こよう'
-        
-        forms['conditional_ba'] = 'くれば'
-        forms['conditional_tara'] = 'きたら'
-
-    return forms
-
-def conjugate_adj_i(word):
-    """Conjugate I-adjectives."""
-    if word == 'いい': # Exception
-        stem = 'よ'
-        base = 'い' # kind of
-        # Special handling for 'ii'
-        forms = {}
-        forms['polite_present'] = 'いいです'
-        forms['polite_past'] = 'よかったです'
-        forms['polite_negative'] = 'よくないです' # or yoku-arimasen
-        forms['polite_past_negative'] = 'よくなかったです'
-        
-        forms['plain_present'] = 'いい'
-        forms['plain_past'] = 'よかった'
-        forms['plain_negative'] = 'よくない'
-        forms['plain_past_negative'] = 'よくなかった'
-        forms['te_form'] = 'よくて'
-        forms['conditional_ba'] = 'よければ'
-        forms['conditional_tara'] = 'よかったら'
-        return forms
-        
-    stem = word[:-1]
-    
-    forms = {}
-    forms['polite_present'] = word + 'です'
-    forms['polite_past'] = stem + 'かったです'
-    forms['polite_negative'] = stem + 'くないです'
-    forms['polite_past_negative'] = stem + 'くなかったです'
-    
-    forms['plain_present'] = word
-    forms['plain_past'] = stem + 'かった'
-    forms['plain_negative'] = stem + 'くない'
-    forms['plain_past_negative'] = stem + 'くなかった'
-    
-    forms['te_form'] = stem + 'くて'
-    
-    forms['conditional_ba'] = stem + 'ければ'
-    forms['conditional_tara'] = stem + 'かったら'
-    
-    # Adjectives don't have potential/passive etc usually.
-    return forms
-
-def conjugate_adj_na(word):
-    """Conjugate Na-adjectives."""
-    # Word usually comes as stem only in many DBs, or stem+na?
-    # Checking existing DB might be needed. Usually stored as stem (e.g. 綺麗 without na)
-    # But checking POS 'ナ形'.
-    
-    stem = word # Assuming stored as stem
-    
-    forms = {}
-    forms['polite_present'] = stem + 'です'
-    forms['polite_past'] = stem + 'でした'
-    forms['polite_negative'] = stem + 'じゃないです' # or dewa-arimasen
-    forms['polite_past_negative'] = stem + 'じゃなかったです'
-    
-    forms['plain_present'] = stem + 'だ'
-    forms['plain_past'] = stem + 'だった'
-    forms['plain_negative'] = stem + 'じゃない' # or dewa-nai
-    forms['plain_past_negative'] = stem + 'じゃなかった'
-    
-    forms['te_form'] = stem + 'で'
-    
-    forms['conditional_ba'] = stem + 'ならば' # or nara
-    forms['conditional_tara'] = stem + 'だったら'
-    
-    return forms
+    forms = exact.get(word)
+    if forms is not None:
+        return '', forms
 
-def get_conjugations(word, pos):
+    if vtype in WHOLE_WORD_TYPES:
+        for ending, forms in endings.items():
+            if ending in word:
+                return '', forms
+        return None
+
+    for length in lengths:
+        if length == 0:
+            return word, endings['']
+        forms = endings.get(word[-length:])
+        if forms is not None:
+            return word[:-length], forms
+
+    if wildcard is not None and word:
+        return word[:-1], wildcard
+    return None
+
+def conjugate_forms(word, pos):
+    """
+    Conjugate one word into a list of (form index, conjugated word), with the
+    index into FORM_CODES. Returns None if the word does not conjugate.
+    """
+    if not word or not pos:
+        return None
     vtype = get_verb_type(word, pos)
     if not vtype:
         return None
-        
-    if vtype == 'V1':
-        return conjugate_v1(word)
-    elif vtype == 'V2':
-        return conjugate_v2(word)
-    elif vtype == 'VS':
-        return conjugate_vs(word)
-    elif vtype == 'VK':
-        return conjugate_vk(word)
-    elif vtype == 'ADJ_I':
-        return conjugate_adj_i(word)
-    elif vtype == 'ADJ_NA':
-        return conjugate_adj_na(word)
-    return None
+
+    matched = match_rule(vtype, word)
+    if matched is None:
+        return None
+
+    stem, forms = matched
+    return [(index, (word if from_word else stem) + suffix) for index, from_word, suffix in forms]
+
+def get_conjugations(word, pos):
+    forms = conjugate_forms(word, pos)
+    if forms is None:
+        return None
+    return {FORM_CODES[index]: conjugated for index, conjugated in forms}
+
+def conjugate_many(pairs):
+    """Conjugate a list of (word, pos) pairs. Returns one dict (or None) per pair."""
+    return [get_conjugations(word, pos) for word, pos in pairs]
 
 def init_types(cursor):
     """Initialize conjugation types in the database."""
@@ -355,53 +429,217 @@ def get_type_map(cursor):
     cursor.execute("SELECT code, id FROM conjugation_types")
     return {row[0]: row[1] for row in cursor.fetchall()}
 
-def main():
+def apply_session_pragmas(cursor, pragmas):
+    """Apply per-connection PRAGMAs for the bulk write."""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+def is_candidate(pos):
+    """Python twin of CANDIDATE_WHERE, for callers that already hold the words."""
+    return bool(pos) and ('动' in pos or '動' in pos or '形' in pos)
+
+def conjugation_rows(words, type_ids, counters):
+    """(word_id, type_id, conjugated_word) rows for one batch of (id, word, part_of_speech, furigana) words."""
+    rows = []
+    for word_id, word, pos, furigana in words:
+        forms = conjugate_forms(word, pos)
+        if not forms:
+            counters['conjugation_skipped'] += 1
+            continue
+
+        for index, conjugated_word in forms:
+            type_id = type_ids[index]
+            if type_id is None:
+                continue
+            rows.append((word_id, type_id, conjugated_word))
+
+        counters['conjugated_words'] += 1
+    return rows
+
+def iter_conjugation_rows(batches, type_map, metrics):
+    """
+    Stream (word_id, type_id, conjugated_word) rows for every candidate word.
+    Source words arrive in (id, word, part_of_speech, furigana) batches, e.g.
+    fetchmany() chunks, so memory stays bounded.
+    """
+    type_ids = tuple(type_map.get(code) for code in FORM_CODES)
+    counters = metrics.counters
+    batches = iter(batches)
+    while True:
+        with metrics.phase('fetch'):
+            words = next(batches, None)
+        if words is None:
+            break
+        counters['conjugation_candidates'] += len(words)
+
+        with metrics.phase('conjugate'):
+            rows = conjugation_rows(words, type_ids, counters)
+        yield from rows
+
+def write_conjugations(conn, rows, batch_size, metrics):
+    """Write rows with batched executemany calls. Returns the row count."""
+    cursor = conn.cursor()
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with metrics.phase('write'):
+                cursor.executemany(INSERT_CONJUGATION_SQL, batch)
+            written += len(batch)
+            batch = []
+            print(f"Written {written} rows...")
+    if batch:
+        with metrics.phase('write'):
+            cursor.executemany(INSERT_CONJUGATION_SQL, batch)
+        written += len(batch)
+    metrics.count('conjugations_written', written)
+    return written
+
+def generate(conn, batches, batch_size=DEFAULT_BATCH_SIZE, metrics=None):
+    """
+    Ensure the conjugation types and write conjugations for the given word
+    batches on conn without committing. Returns the number of rows written;
+    per-word counts are left in metrics.counters.
+    """
+    metrics = metrics if metrics is not None else Metrics('generate_conjugations')
+    cursor = conn.cursor()
+    with metrics.phase('init types'):
+        init_types(cursor)
+        type_map = get_type_map(cursor)
+    rows = iter_conjugation_rows(batches, type_map, metrics)
+    return write_conjugations(conn, rows, batch_size, metrics)
+
+def diff_batch(cursor, words, lo, hi, type_ids, counters):
+    """
+    Compare the expected forms of words (every word with lo <= id <= hi, in
+    id order) against the stored rows in that id range. Returns the
+    (inserts, updates, deletes) parameter lists.
+
+    Rows of a word whose POS stopped being a verb or adjective are deleted
+    like any other stale row. Only candidates the rules cannot classify keep
+    their rows, as the rules have no forms to compare them with.
+    """
+    candidates = [w for w in words if is_candidate(w[2])]
+    counters['conjugation_candidates'] += len(candidates)
+    expected = {(word_id, type_id): form for word_id, type_id, form in conjugation_rows(candidates, type_ids, counters)}
+    unclassified = {w[0] for w in candidates if get_pos_class(w[2]) is None}
+
+    inserts, updates, deletes = [], [], []
+    cursor.execute(SELECT_EXISTING_SQL, (lo, hi))
+    for word_id, type_id, form in cursor.fetchall():
+        key = (word_id, type_id)
+        wanted = expected.pop(key, None)
+        if wanted is None and word_id in unclassified:
+            counters['conjugations_kept'] += 1
+        elif wanted is None:
+            # Stale: the word was deleted, is no longer a verb or adjective, or no longer has this form
+            deletes.append(key)
+        elif wanted != form:
+            updates.append((wanted, word_id, type_id))
+        else:
+            counters['conjugations_unchanged'] += 1
+    inserts = [(word_id, type_id, form) for (word_id, type_id), form in expected.items()]
+    return inserts, updates, deletes
+
+def generate_incremental(conn, batches, metrics=None):
+    """
+    Bring word_conjugations in line with the words table, writing only the
+    rows that differ, without committing. batches must cover every word (not
+    just candidates) in ascending id order so stale rows are found. Returns
+    (inserted, updated, deleted).
+    """
+    metrics = metrics if metrics is not None else Metrics('generate_conjugations')
+    cursor = conn.cursor()
+    with metrics.phase('init types'):
+        init_types(cursor)
+        type_ids = tuple(get_type_map(cursor).get(code) for code in FORM_CODES)
+
+    counters = metrics.counters
+    batches = iter(batches)
+    lo = MIN_ID
+    while True:
+        with metrics.phase('fetch'):
+            words = next(batches, None)
+        # Each batch owns the id range up to its last word; the final read runs to MAX_ID
+        hi = words[-1][0] if words else MAX_ID
+        with metrics.phase('diff'):
+            inserts, updates, deletes = diff_batch(cursor, words or [], lo, hi, type_ids, counters)
+        with metrics.phase('write'):
+            cursor.executemany(DIFF_DELETE_SQL, deletes)
+            cursor.executemany(DIFF_UPDATE_SQL, updates)
+            cursor.executemany(DIFF_INSERT_SQL, inserts)
+        counters['conjugations_inserted'] += len(inserts)
+        counters['conjugations_updated'] += len(updates)
+        counters['conjugations_deleted'] += len(deletes)
+        if not words:
+            break
+        lo = hi + 1
+    return counters['conjugations_inserted'], counters['conjugations_updated'], counters['conjugations_deleted']
+
+def main(batch_size=DEFAULT_BATCH_SIZE, pragmas=SESSION_PRAGMAS, incremental=False, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('generate_conjugations')
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Enable FK support just in case
     cursor.execute("PRAGMA foreign_keys = ON;")
-    
-    init_types(cursor)
-    conn.commit()
-    
-    type_map = get_type_map(cursor)
+    apply_session_pragmas(cursor, pragmas)
     
     print("Fetching words...")
-    cursor.execute("SELECT id, word, part_of_speech, furigana FROM words WHERE part_of_speech LIKE '%动%' OR part_of_speech LIKE '%形%'")
-    words = cursor.fetchall()
-    print(f"Found {len(words)} candidates.")
-    
-    count = 0
-    skipped = 0
+    start = time.perf_counter()
+    if incremental:
+        # Every word, in id order: non-candidates may still have stale rows
+        cursor.execute("SELECT id, word, part_of_speech, furigana FROM words ORDER BY id")
+    else:
+        cursor.execute(f"SELECT id, word, part_of_speech, furigana FROM words WHERE {CANDIDATE_WHERE}")
     
-    for word_id, word, pos, furigana in words:
-        conjugations = get_conjugations(word, pos)
-        if not conjugations:
-            skipped += 1
-            continue
-            
-        for type_code, conjugated_word in conjugations.items():
-            if type_code not in type_map:
-                continue
-                
-            type_id = type_map[type_code]
-            
-            try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO word_conjugations (word_id, type_id, conjugated_word)
-                    VALUES (?, ?, ?)
-                ''', (word_id, type_id, conjugated_word))
-            except sqlite3.Error as e:
-                print(f"Error inserting {word} ({type_code}): {e}")
-        
-        count += 1
-        if count % 100 == 0:
-            print(f"Processed {count} words...")
-
-    conn.commit()
+    try:
+        batches = iter(lambda: cursor.fetchmany(batch_size), [])
+        if incremental:
+            written = sum(generate_incremental(conn, batches, metrics))
+        else:
+            written = generate(conn, batches, batch_size, metrics)
+        with metrics.phase('commit'):
+            conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error writing conjugations: {e}")
+        conn.close()
+        return
     conn.close()
-    print(f"Done. Processed {count} words. Skipped {skipped}.")
+
+    counters = metrics.counters
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"Done. Processed {counters['conjugated_words']} words. Skipped {counters['conjugation_skipped']}.")
+    print(f"Wrote {written} rows from {counters['conjugation_candidates']} candidates in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    if incremental:
+        print(f"Incremental: {counters['conjugations_inserted']} inserted, {counters['conjugations_updated']} updated, "
+              f"{counters['conjugations_deleted']} deleted, {counters['conjugations_unchanged']} unchanged, "
+              f"{counters['conjugations_kept']} kept for unclassified words.")
+
+def parse_pragma(text):
+    name, sep, value = text.partition('=')
+    if not sep or not name.strip() or not value.strip():
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got '{text}'")
+    return name.strip(), value.strip()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Generate word conjugations')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per fetch/insert batch')
+    parser.add_argument('--pragma', type=parse_pragma, action='append', default=[], metavar='NAME=VALUE',
+                        help='Override a session PRAGMA (repeatable), e.g. --pragma synchronous=OFF')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Write only the rows that differ from word_conjugations, deleting stale forms')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error('--batch-size must be positive')
+
+    pragmas = dict(SESSION_PRAGMAS)
+    pragmas.update(args.pragma)
+    metrics = metrics_from_args('generate_conjugations', args)
+    main(batch_size=args.batch_size, pragmas=pragmas, incremental=args.incremental, metrics=metrics)
+    emit(metrics, args)
@@ -0,0 +1,623 @@
+import sqlite3
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from migrate import MIGRATIONS_DIR, discover_migrations
+
+# Index advisor for the app's hot queries.
+#
+# CATALOGUE holds the SQL the Dart query layer runs most, copied from
+# lib/data/queries (and the repositories getWordDetail fans out to), with
+# representative parameters. Every query is run with EXPLAIN QUERY PLAN and
+# timed on a scratch copy of the database; full scans and temp B-trees are
+# flagged. Candidate indexes come from the columns the flagged queries filter,
+# join and sort on. Each candidate is created on the copy and measured, and the
+# ones that make some query clearly faster without slowing others are written
+# out as a migration for scripts/migrate.py.
+#
+# The shipped database has no user data, so empty study tables are filled with
+# a representative user (on the copy only) before anything is timed.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+DEFAULT_REPEAT = 7
+
+# Minimum length of one timing sample
+SAMPLE_SECONDS = 0.002
+
+# A candidate must speed some query up by this factor, and slow none down
+# by as much, to be recommended. Every index costs space in the shipped file
+# and time on every write, so marginal wins don't count.
+MIN_SPEEDUP = 1.5
+
+# Queries faster than this (ms per call) are too quick to judge an index by
+MIN_MEASURABLE_MS = 0.02
+
+# Size of the synthetic user written into empty study tables
+STUDY_WORDS_PER_USER = 3000
+DAILY_STATS_DAYS = 365
+
+USER_ID = 1
+
+# (name, Dart source, sql). Parameters are named; {example_ids} is expanded
+# to a literal list, as getExampleAudioByExampleIds builds its IN (...).
+CATALOGUE = [
+    ('getWordListItems', 'word_read_queries.dart', '''
+        SELECT w.*, wm.meaning_cn as primary_meaning
+        FROM words w
+        LEFT JOIN word_meanings wm ON w.id = wm.word_id AND wm.definition_order = 1
+        WHERE w.jlpt_level = :level
+        ORDER BY w.id ASC
+        LIMIT 50
+    '''),
+    ('getWordsByLevel', 'word_read_queries.dart', '''
+        SELECT * FROM words WHERE jlpt_level = :level ORDER BY id ASC LIMIT 50
+    '''),
+    ('searchWords', 'word_read_queries.dart', '''
+        SELECT * FROM words
+        WHERE word LIKE :keyword OR furigana LIKE :keyword OR romaji LIKE :keyword
+        ORDER BY id ASC LIMIT 50
+    '''),
+    ('getWordDetail: audio', 'word_audio_repository.dart', '''
+        SELECT * FROM word_audio WHERE word_id = :word_id
+    '''),
+    ('getWordDetail: examples', 'example_repository.dart', '''
+        SELECT * FROM example_sentences WHERE word_id = :word_id
+    '''),
+    ('getWordDetail: example audio', 'example_audio_repository.dart', '''
+        SELECT * FROM example_audio WHERE example_id IN ({example_ids})
+    '''),
+    ('getConjugations', 'word_read_queries.dart', '''
+        SELECT wc.*, ct.name_ja, ct.name_cn, ct.sort_order
+        FROM word_conjugations wc
+        JOIN conjugation_types ct ON wc.type_id = ct.id
+        WHERE wc.word_id = :word_id
+        ORDER BY ct.sort_order ASC
+    '''),
+    ('getRelatedWords', 'word_read_queries.dart', '''
+        SELECT w.*, wr.score, wr.relation_type
+        FROM word_relations wr
+        JOIN words w ON wr.related_word_id = w.id
+        LEFT JOIN study_words sw ON w.id = sw.word_id AND sw.user_id = :user_id
+        WHERE wr.word_id = :word_id
+          AND (sw.user_state IS NULL OR sw.user_state IN (0, 1))
+        ORDER BY wr.score DESC
+    '''),
+    ('getRandomUnmasteredWordsWithMeaning', 'word_read_queries.dart', '''
+        SELECT w.id
+        FROM words w
+        LEFT JOIN study_words sw ON w.id = sw.word_id AND sw.user_id = :user_id
+        WHERE sw.user_state IS NULL OR sw.user_state IN (0, 1)
+        ORDER BY
+          CASE w.jlpt_level
+            WHEN 'N5' THEN 1 WHEN 'N4' THEN 2 WHEN 'N3' THEN 3
+            WHEN 'N2' THEN 4 WHEN 'N1' THEN 5 ELSE 6
+          END,
+          RANDOM()
+        LIMIT 5
+    '''),
+    ('getVocabularyBookItems', 'vocabulary_book_query.dart', '''
+        SELECT sw.id AS study_word_id, sw.word_id, w.word, w.furigana, w.jlpt_level,
+               w.part_of_speech, wm.meaning_cn AS primary_meaning,
+               wa.audio_filename, wa.audio_url, sw.user_state, sw.updated_at
+        FROM study_words sw
+        INNER JOIN words w ON sw.word_id = w.id
+        LEFT JOIN word_meanings wm ON w.id = wm.word_id AND wm.definition_order = 1
+        LEFT JOIN word_audio wa ON w.id = wa.word_id
+        WHERE sw.user_id = :user_id AND sw.user_state = :status
+        GROUP BY sw.id
+        ORDER BY sw.updated_at DESC
+        LIMIT 20 OFFSET 0
+    '''),
+    ('getVocabularyBookItems (search)', 'vocabulary_book_query.dart', '''
+        SELECT sw.id AS study_word_id, sw.word_id, w.word, w.furigana, w.jlpt_level,
+               w.part_of_speech, wm.meaning_cn AS primary_meaning,
+               wa.audio_filename, wa.audio_url, sw.user_state, sw.updated_at
+        FROM study_words sw
+        INNER JOIN words w ON sw.word_id = w.id
+        LEFT JOIN word_meanings wm ON w.id = wm.word_id AND wm.definition_order = 1
+        LEFT JOIN word_audio wa ON w.id = wa.word_id
+        WHERE sw.user_id = :user_id AND sw.user_state = :status
+          AND (w.word LIKE :keyword OR w.furigana LIKE :keyword OR wm.meaning_cn LIKE :keyword OR w.romaji LIKE :keyword)
+        GROUP BY sw.id
+        ORDER BY sw.updated_at DESC
+        LIMIT 20 OFFSET 0
+    '''),
+    ('getStatusCounts', 'vocabulary_book_query.dart', '''
+        SELECT sw.user_state, COUNT(*) AS count
+        FROM study_words sw
+        INNER JOIN words w ON sw.word_id = w.id
+        LEFT JOIN word_meanings wm ON w.id = wm.word_id AND wm.definition_order = 1
+        WHERE sw.user_id = :user_id
+          AND sw.user_state IN (1, 2)
+        GROUP BY sw.user_state
+    '''),
+    ('getTotalStudyTimeMs', 'statistics_query.dart', '''
+        SELECT COALESCE(SUM(total_time_ms), 0) as total_time_ms
+        FROM daily_stats
+        WHERE user_id = :user_id
+    '''),
+    ('getWordStatusDistribution', 'statistics_query.dart', '''
+        SELECT
+          COUNT(*) as total_words,
+          SUM(CASE WHEN user_state = 0 THEN 1 ELSE 0 END) as new_words,
+          SUM(CASE WHEN user_state = 1 THEN 1 ELSE 0 END) as learning_words,
+          SUM(CASE WHEN user_state = 2 THEN 1 ELSE 0 END) as mastered_words,
+          SUM(CASE WHEN user_state = 3 THEN 1 ELSE 0 END) as ignored_words,
+          COALESCE(SUM(total_reviews), 0) as total_reviews,
+          COALESCE(AVG(ease_factor), 2.5) as avg_ease_factor,
+          COALESCE(SUM(fail_count), 0) as total_fails
+        FROM study_words
+        WHERE user_id = :user_id
+    '''),
+    ('getAllTimeSummary', 'statistics_query.dart', '''
+        SELECT SUM(total_time_ms) as total_time, SUM(new_learned_count) as total_learned,
+               SUM(review_count) as total_reviewed, AVG(total_time_ms) as avg_time_per_day,
+               COUNT(*) as active_days
+        FROM daily_stats
+        WHERE user_id = :user_id
+          AND date >= DATE('now', '-1 year')
+          AND date <= DATE('now')
+          AND (new_learned_count > 0 OR review_count > 0 OR total_time_ms > 0)
+    '''),
+    ('getUserDailyStats', 'daily_stat_query.dart', '''
+        SELECT * FROM daily_stats WHERE user_id = :user_id ORDER BY date DESC LIMIT 30
+    '''),
+    ('getDailyStatsByDateRange', 'daily_stat_query.dart', '''
+        SELECT * FROM daily_stats
+        WHERE user_id = :user_id AND date >= :start_date AND date <= :end_date
+        ORDER BY date ASC
+    '''),
+    ('calculateStreak', 'daily_stat_query.dart', '''
+        WITH active_days AS (
+          SELECT date FROM daily_stats
+          WHERE user_id = :user_id
+            AND (new_learned_count > 0 OR review_count > 0 OR total_time_ms > 0)
+        ),
+        ranked AS (
+          SELECT date, julianday(date) - ROW_NUMBER() OVER (ORDER BY date DESC) AS grp
+          FROM active_days
+        ),
+        anchor AS (
+          SELECT grp FROM ranked
+          WHERE date = (
+            SELECT MAX(date) FROM active_days
+            WHERE date = DATE('now','localtime') OR date = DATE('now','localtime','-1 day')
+          )
+        )
+        SELECT CASE
+          WHEN EXISTS (SELECT 1 FROM anchor)
+          THEN (SELECT COUNT(*) FROM ranked WHERE grp = (SELECT grp FROM anchor))
+          ELSE 0
+        END AS count
+    '''),
+    ('getWeeklySummary', 'daily_stat_query.dart', '''
+        SELECT SUM(total_time_ms) as total_time, SUM(new_learned_count) as total_learned,
+               SUM(review_count) as total_reviewed, SUM(unique_kana_reviewed_count) as total_mastered,
+               AVG(total_time_ms) as avg_time_per_day, COUNT(*) as active_days
+        FROM daily_stats
+        WHERE user_id = :user_id
+          AND date >= DATE('now', 'weekday 0', '-7 days')
+          AND date <= DATE('now')
+    '''),
+    ('getKanaExamples', 'kana_query.dart', '''
+        SELECT * FROM kana_examples WHERE kana_id = :kana_id
+    '''),
+]
+
+FLAG_PATTERNS = {
+    'scan': re.compile(r'^SCAN (?!CONSTANT ROW)'),
+    'temp b-tree': re.compile(r'USE TEMP B-TREE'),
+}
+
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|LEFT\b|INNER\b|JOIN\b|GROUP\b|ORDER\b|LIMIT\b)(\w+))?', re.I)
+COMPARISON = r'(?:=|>=|<=|<|>|\bIN\b)'
+RANGE_OPERATOR = re.compile(r'^(?:>=|<=|<|>)$')
+
+def representative_parameters(conn):
+    """Named parameters for CATALOGUE, taken from the data so lookups hit real rows."""
+    def scalar(sql, default=None):
+        try:
+            row = conn.execute(sql).fetchone()
+        except sqlite3.OperationalError:
+            return default
+        return row[0] if row and row[0] is not None else default
+
+    # A word in the middle of the dictionary that has conjugations, if any do
+    word_id = scalar('''
+        SELECT word_id FROM word_conjugations ORDER BY word_id
+        LIMIT 1 OFFSET (SELECT count(*) / 2 FROM word_conjugations)
+    ''') or scalar("SELECT id FROM words ORDER BY id LIMIT 1 OFFSET (SELECT count(*) / 2 FROM words)", 1)
+    word = scalar(f"SELECT word FROM words WHERE id = {int(word_id)}", '') or ''
+    example_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM example_sentences WHERE word_id = ?", (word_id,))] if table_exists(conn, 'example_sentences') else []
+    today = datetime.date.today()
+    return {
+        'user_id': USER_ID,
+        'word_id': word_id,
+        'level': scalar("SELECT jlpt_level FROM words WHERE jlpt_level IS NOT NULL GROUP BY jlpt_level ORDER BY count(*) DESC LIMIT 1", 'N3'),
+        'keyword': f"%{word[:2]}%",
+        'status': 1,
+        'start_date': (today - datetime.timedelta(days=29)).isoformat(),
+        'end_date': today.isoformat(),
+        'kana_id': scalar("SELECT id FROM kana_letters ORDER BY id LIMIT 1 OFFSET (SELECT count(*) / 2 FROM kana_letters)", 1),
+        'example_ids': ', '.join(str(int(i)) for i in example_ids) or '0',
+    }
+
+def table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def insert_rows(cursor, table, rows):
+    """Insert dict rows, keeping only the columns this schema has."""
+    columns = [c for c in rows[0] if c in table_columns(cursor.connection, table)] if rows else []
+    if not columns:
+        return 0
+    cursor.executemany(
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row[c] for c in columns) for row in rows])
+    return cursor.rowcount
+
+def seed_user_data(conn, user_id=USER_ID):
+    """
+    Give the scratch copy a representative user when the study tables are
+    empty: STUDY_WORDS_PER_USER words in mixed states and a year of
+    daily_stats. Returns {table: rows written}.
+    """
+    cursor = conn.cursor()
+    now = int(time.time())
+    seeded = {}
+    if table_exists(conn, 'study_words') and not conn.execute(
+            "SELECT 1 FROM study_words WHERE user_id = ? LIMIT 1", (user_id,)).fetchone():
+        ids = [row[0] for row in conn.execute("SELECT id FROM words ORDER BY id")]
+        step = max(len(ids) // STUDY_WORDS_PER_USER, 1)
+        rows = []
+        for n, word_id in enumerate(ids[::step][:STUDY_WORDS_PER_USER]):
+            state = (0, 1, 1, 1, 2, 2, 3)[n % 7]
+            rows.append({
+                'user_id': user_id, 'word_id': word_id, 'user_state': state,
+                'next_review_at': now + (n % 30) * 86400 if state == 1 else None,
+                'last_reviewed_at': now - (n % 90) * 86400, 'total_reviews': n % 12,
+                'fail_count': n % 3, 'ease_factor': 2.5, 'created_at': now - n * 600,
+                'updated_at': now - n * 300,
+            })
+        seeded['study_words'] = insert_rows(cursor, 'study_words', rows)
+    if table_exists(conn, 'daily_stats') and not conn.execute(
+            "SELECT 1 FROM daily_stats WHERE user_id = ? LIMIT 1", (user_id,)).fetchone():
+        today = datetime.date.today()
+        rows = [{
+            'user_id': user_id, 'date': (today - datetime.timedelta(days=d)).isoformat(),
+            'review_count': (d * 7) % 40, 'new_learned_count': (d * 3) % 15,
+            'unique_kana_reviewed_count': d % 5, 'total_time_ms': ((d * 7) % 40) * 9000,
+        } for d in range(DAILY_STATS_DAYS) if d % 9]
+        seeded['daily_stats'] = insert_rows(cursor, 'daily_stats', rows)
+    conn.commit()
+    return seeded
+
+def render(sql, params):
+    return sql.replace('{example_ids}', params['example_ids'])
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN detail lines, in plan order."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {render(sql, params)}", params)]
+
+def flags(plan):
+    return sorted({name for line in plan for name, pattern in FLAG_PATTERNS.items() if pattern.search(line)})
+
+def time_query(conn, sql, params, repeat=DEFAULT_REPEAT):
+    """
+    Seconds per call: the best of repeat samples, each averaging enough
+    calls to last SAMPLE_SECONDS, so sub-millisecond queries are not at the
+    mercy of timer noise. The first call only warms the cache.
+    """
+    statement = render(sql, params)
+    start = time.perf_counter()
+    conn.execute(statement, params).fetchall()
+    calls = max(1, int(SAMPLE_SECONDS / max(time.perf_counter() - start, 1e-6)))
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            conn.execute(statement, params).fetchall()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+def profile(conn, params, queries=CATALOGUE, repeat=DEFAULT_REPEAT):
+    """{name: (seconds, plan lines, flags)} for every query this schema can run."""
+    results = {}
+    for name, _, sql in queries:
+        try:
+            plan = explain(conn, sql, params)
+            seconds = time_query(conn, sql, params, repeat)
+        except sqlite3.OperationalError as e:
+            print(f" - skipped {name}: {e}")
+            continue
+        results[name] = (seconds, plan, flags(plan))
+    return results
+
+def table_aliases(sql):
+    """{alias: table} for the tables a query reads, plus each table under its own name."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+def filtered_columns(sql, alias, unqualified):
+    """
+    (constant equality, join equality, range, order) columns the query uses
+    for alias, in order of appearance. Join equalities compare with another
+    table's column; constant ones with a parameter, literal or IN list. Bare
+    column names count when the query reads a single table.
+    """
+    column = rf'\b{re.escape(alias)}\.(\w+)' if not unqualified else r'(?<![.:\w])([a-z_]\w*)'
+    other = r'\b\w+\.\w+\b'
+    constant, join, ranges = [], [], []
+    for match in re.finditer(rf'{column}\s*({COMPARISON})\s*(\S+)', sql, re.I):
+        name, operator, operand = match.groups()
+        if RANGE_OPERATOR.match(operator):
+            ranges.append(name)
+        else:
+            (join if re.match(other, operand) and not unqualified else constant).append(name)
+    if not unqualified:
+        join += re.findall(rf'{other}\s*=\s*{column}', sql, re.I)
+    order = []
+    order_by = re.search(r'\bORDER BY\b(.*?)(?:\bLIMIT\b|$)', sql, re.I | re.S)
+    if order_by:
+        order = re.findall(rf'{column}(?:\s+(?:ASC|DESC))?\s*(?:,|$)', order_by.group(1).strip(), re.I)
+    unique = lambda names: list(dict.fromkeys(names))
+    constant = unique(constant)
+    join = unique(c for c in join if c not in constant)
+    return constant, join, unique(c for c in ranges if c not in constant + join), unique(order)
+
+def existing_index_prefixes(conn, table):
+    """Column lists of every index on table (including UNIQUE constraints)."""
+    prefixes = []
+    for row in conn.execute(f"PRAGMA index_list({table})"):
+        prefixes.append(tuple(info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")))
+    return prefixes
+
+def is_covered(equality, tail, indexes):
+    """
+    True if some index starts with the equality columns (in any order)
+    followed by the tail columns.
+    """
+    size = len(equality)
+    return any(set(index[:size]) == set(equality) and index[size:size + len(tail)] == tuple(tail)
+               for index in indexes if len(index) >= size + len(tail))
+
+def candidate_indexes(conn, profiles, queries=CATALOGUE):
+    """
+    Candidate (table, columns) pairs for the flagged queries. For each table
+    a query scans or sorts: its constant equality columns followed by one
+    range column or the ORDER BY columns (for filtering and sorting the
+    driving table), its join columns followed by the constant ones (for
+    lookups in a join), and the leading column of each alone. Candidates an
+    existing index already serves are left out. Longest first.
+    """
+    candidates = []
+    sql_by_name = {name: sql for name, _, sql in queries}
+    for name, (_, plan, query_flags) in profiles.items():
+        if not query_flags:
+            continue
+        sql = sql_by_name[name]
+        aliases = table_aliases(sql)
+        scanned = {m.group(1) for line in plan for m in [re.match(r'SCAN (\w+)', line)] if m}
+        if 'temp b-tree' in query_flags:
+            scanned.update(a for a in aliases if re.search(rf'\bORDER BY\b.*\b{re.escape(a)}\.', sql, re.I | re.S))
+        single_table = len(set(aliases.values())) == 1
+        for alias in scanned:
+            table = aliases.get(alias)
+            if table is None or not table_exists(conn, table):
+                continue
+            columns = set(table_columns(conn, table))
+            constant, join, ranges, order = (
+                [c for c in names if c in columns and c != 'id']
+                for names in filtered_columns(sql, alias, single_table and alias == table))
+            tail = ranges[:1] or [c for c in order if c not in constant]
+            options = [(constant, tail), (join + constant, []), (constant[:1], []), (join[:1], [])]
+            indexes = existing_index_prefixes(conn, table)
+            for equality, rest in options:
+                option = tuple(equality + rest)
+                if option and (table, option) not in candidates and not is_covered(equality, rest, indexes):
+                    candidates.append((table, option))
+    return sorted(candidates, key=lambda c: (-len(c[1]), c))
+
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"
+
+def index_sql(table, columns):
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+
+def uses_index(plan, name):
+    return any(f"INDEX {name} " in line or line.endswith(f"INDEX {name}") for line in plan)
+
+def create_index(conn, table, columns):
+    conn.execute(index_sql(table, columns))
+    if table_exists(conn, 'sqlite_stat1'):
+        conn.execute(f"ANALYZE {index_name(table, columns)}")
+
+def measure_index(conn, params, table, columns, queries, repeat=DEFAULT_REPEAT):
+    """
+    Time the queries whose plan picks the index up, without and then with
+    it. Returns ({query: (before, after)}, whether it passes): it passes
+    when one of them gets MIN_SPEEDUP faster and none gets as much slower
+    (a query whose plan ignores the index runs exactly as before). The
+    index is left in place.
+    """
+    sql_by_name = {name: sql for name, _, sql in CATALOGUE}
+    name = index_name(table, columns)
+    create_index(conn, table, columns)
+    users = [q for q in queries if uses_index(explain(conn, sql_by_name[q], params), name)]
+    conn.execute(f"DROP INDEX {name}")
+    before = {q: time_query(conn, sql_by_name[q], params, repeat) for q in users}
+    create_index(conn, table, columns)
+    timings = {q: (before[q], time_query(conn, sql_by_name[q], params, repeat)) for q in users}
+    measurable = [t for t in timings.values() if t[0] * 1000 >= MIN_MEASURABLE_MS and t[1] > 0]
+    faster = any(before / after >= MIN_SPEEDUP for before, after in measurable)
+    slower = any(after / before >= MIN_SPEEDUP for before, after in measurable)
+    return timings, faster and not slower
+
+def evaluate(conn, params, profiles, candidates, repeat=DEFAULT_REPEAT):
+    """
+    Try each candidate on conn against the indexes kept so far. A candidate
+    is kept only if it passes measure_index twice, so one lucky run never
+    decides, and again once every other kept index exists; candidates whose
+    columns start a kept index are skipped.
+    Returns [(table, columns, {query name: (before, after)})] for the kept ones.
+    """
+    sql_by_name = {name: sql for name, _, sql in CATALOGUE}
+    kept = []
+    for table, columns in candidates:
+        if any(t == table and c[:len(columns)] == columns for t, c, _ in kept):
+            continue
+        queries = [name for name in profiles if table in table_aliases(sql_by_name[name]).values()]
+        timings, passed = measure_index(conn, params, table, columns, queries, repeat)
+        if passed:
+            conn.execute(f"DROP INDEX {index_name(table, columns)}")
+            timings, passed = measure_index(conn, params, table, columns, queries, repeat)
+        if passed:
+            kept.append((table, columns, timings))
+        else:
+            conn.execute(f"DROP INDEX {index_name(table, columns)}")
+
+    # An index kept early may only have paid off until a later one landed;
+    # check each again with all the others in place
+    for entry in list(kept):
+        table, columns, _ = entry
+        conn.execute(f"DROP INDEX {index_name(table, columns)}")
+        queries = [name for name in profiles if table in table_aliases(sql_by_name[name]).values()]
+        timings, passed = measure_index(conn, params, table, columns, queries, repeat)
+        if passed:
+            kept[kept.index(entry)] = (table, columns, timings)
+        else:
+            conn.execute(f"DROP INDEX {index_name(table, columns)}")
+            kept.remove(entry)
+    conn.commit()
+    return kept
+
+def next_migration_version(directory=MIGRATIONS_DIR):
+    migrations = discover_migrations(directory)
+    return (migrations[-1][0] if migrations else 0) + 1
+
+def migration_source(kept, db_path):
+    """Source of a migrations/NNNN_*.py step creating the kept indexes."""
+    lines = [f'"""Indexes recommended by scripts/index_advisor.py ({datetime.date.today().isoformat()}).', '',
+             f'Measured on {os.path.basename(db_path)}, ms per call without -> with each index:']
+    for table, columns, timings in kept:
+        lines.append(f"  {index_name(table, columns)}")
+        for name, (before, after) in timings.items():
+            lines.append(f"    {name:<38} {before * 1000:9.3f} -> {after * 1000:9.3f}")
+    lines += ['"""', '', 'INDEXES = [']
+    lines += [f'    "{index_sql(table, columns)}",' for table, columns, _ in kept]
+    lines += [']', '', 'def up(conn, metrics):', '    cursor = conn.cursor()', '    for sql in INDEXES:',
+              '        cursor.execute(sql)', "    metrics.count('indexes_created', len(INDEXES))",
+              '    print(f"Created {len(INDEXES)} indexes.")', '']
+    return '\n'.join(lines)
+
+def print_profiles(profiles, show_plans=False):
+    print(f"\n {'query':<38} {'ms':>9}  flags")
+    for name, (seconds, plan, query_flags) in profiles.items():
+        print(f" {name:<38} {seconds * 1000:9.3f}  {', '.join(query_flags) or '-'}")
+        for line in plan if show_plans else [l for l in plan if flags([l])]:
+            print(f"     {line}")
+
+def advise(db_path=DB_PATH, repeat=DEFAULT_REPEAT, show_plans=False, metrics=None):
+    """
+    Profile the catalogue on a scratch copy of db_path, try the candidate
+    indexes there and return the kept ones as evaluate() does.
+    """
+    metrics = metrics if metrics is not None else Metrics('index_advisor')
+    work_dir = tempfile.mkdtemp(prefix='index_advisor_')
+    try:
+        scratch = os.path.join(work_dir, 'scratch.sqlite')
+        with metrics.phase('copy'):
+            src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            conn = sqlite3.connect(scratch)
+            src.backup(conn)
+            src.close()
+        try:
+            with metrics.phase('seed'):
+                for table, count in seed_user_data(conn).items():
+                    print(f"Seeded {count} {table} rows for user {USER_ID} (scratch copy only)")
+            params = representative_parameters(conn)
+
+            with metrics.phase('profile'):
+                profiles = profile(conn, params, repeat=repeat)
+            metrics.count('queries_profiled', len(profiles))
+            metrics.count('queries_flagged', sum(1 for p in profiles.values() if p[2]))
+            print_profiles(profiles, show_plans)
+
+            candidates = candidate_indexes(conn, profiles)
+            print(f"\n{len(candidates)} candidate index(es):")
+            for table, columns in candidates:
+                print(f" - {table} ({', '.join(columns)})")
+
+            with metrics.phase('evaluate'):
+                kept = evaluate(conn, params, profiles, candidates, repeat)
+            metrics.count('indexes_recommended', len(kept))
+            with metrics.phase('remeasure'):
+                final = profile(conn, params, repeat=repeat)
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    before = {name: p[0] for name, p in profiles.items()}
+    after = {name: p[0] for name, p in final.items()}
+    print(f"\nRecommended: {len(kept)} index(es)")
+    for table, columns, timings in kept:
+        print(f" - {index_sql(table, columns)}")
+    if kept:
+        print(f"\n {'query':<38} {'before ms':>10} {'after ms':>10}  flags after")
+        for name in before:
+            if name in after:
+                print(f" {name:<38} {before[name] * 1000:10.3f} {after[name] * 1000:10.3f}  {', '.join(final[name][2]) or '-'}")
+    return kept
+
+def write_migration(kept, name, db_path=DB_PATH, directory=MIGRATIONS_DIR):
+    version = next_migration_version(directory)
+    path = os.path.join(directory, f"{version:04d}_{name}.py")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(migration_source(kept, db_path))
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN and time the app's hot queries and recommend indexes")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timing samples per query (best is kept)')
+    parser.add_argument('--plans', action='store_true', help='Print every query plan, not only the flagged lines')
+    parser.add_argument('--write-migration', metavar='NAME', nargs='?', const='advised_indexes',
+                        help='Write the recommended indexes as scripts/migrations/NNNN_NAME.py (default name: advised_indexes)')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 if any index is recommended')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        parser.error('--repeat must be positive')
+    if args.write_migration is not None and not re.match(r'^\w+$', args.write_migration):
+        parser.error('--write-migration NAME may only contain letters, digits and underscores')
+
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        sys.exit(1)
+
+    metrics = metrics_from_args('index_advisor', args)
+    kept = advise(DB_PATH, args.repeat, args.plans, metrics)
+    if kept and args.write_migration is not None:
+        path = write_migration(kept, args.write_migration)
+        print(f"\nWrote {path}; apply it with scripts/migrate.py")
+    elif kept:
+        print("\nMigration preview (write it with --write-migration):\n")
+        print(migration_source(kept, DB_PATH))
+    emit(metrics, args)
+    if args.check and kept:
+        sys.exit(1)
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+
+# Shared MeCab analysis layer for the POS scripts.
+#
+# Every surface form is parsed at most once: results are kept in a bounded LRU
+# cache, and cache misses are joined with a sentinel into one tagger call per
+# batch instead of one parseToNode() walk per word.
+
+DEFAULT_CACHE_SIZE = 100000
+DEFAULT_BATCH_SIZE = 256
+
+# Separates words in a batched parse. 。 is a dictionary word (記号,句点), so
+# it comes back as its own token and the next word starts after a sentence end,
+# close to how it would parse on its own.
+SENTINEL = '。'
+
+# Leading feature fields kept per token (pos1, pos2)
+POS_FIELDS = 2
+
+class MorphAnalyzer:
+    """
+    Parse surface forms into tuples of per-token (pos1, pos2, ...) features.
+    """
+
+    def __init__(self, tagger=None, cache_size=DEFAULT_CACHE_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+        if tagger is None:
+            # Imported here so callers that pass their own tagger never load MeCab
+            import MeCab
+            tagger = MeCab.Tagger()
+        self.tagger = tagger
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._cache = OrderedDict()
+        self.tagger_calls = 0
+
+    def analyze(self, surface):
+        return self.analyze_many([surface])[0]
+
+    def first_pos(self, surface):
+        """pos1 of the first token, or '' if the surface yields no tokens."""
+        tokens = self.analyze(surface)
+        return tokens[0][0] if tokens else ''
+
+    def analyze_many(self, surfaces):
+        """Analyse a list of surfaces, returning one token tuple per surface (in order)."""
+        cache = self._cache
+        missing = []
+        seen = set()
+        for surface in surfaces:
+            if surface in cache:
+                cache.move_to_end(surface)
+            elif surface not in seen:
+                seen.add(surface)
+                missing.append(surface)
+
+        results = {}
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            results.update(zip(batch, self._parse_batch(batch)))
+
+        out = []
+        for surface in surfaces:
+            tokens = results.get(surface)
+            if tokens is None:
+                tokens = cache[surface]
+            out.append(tokens)
+
+        for surface, tokens in results.items():
+            self._remember(surface, tokens)
+        return out
+
+    def _remember(self, surface, tokens):
+        cache = self._cache
+        cache[surface] = tokens
+        cache.move_to_end(surface)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _parse(self, text):
+        """Run MeCab once and return [(surface, features), ...] without BOS/EOS."""
+        self.tagger_calls += 1
+        tokens = []
+        for line in self.tagger.parse(text).split('\n'):
+            if not line or line == 'EOS':
+                continue
+            surface, _, feature = line.partition('\t')
+            tokens.append((surface, tuple(feature.split(',')[:POS_FIELDS])))
+        return tokens
+
+    def _parse_one(self, surface):
+        return tuple(features for _, features in self._parse(surface))
+
+    def _parse_batch(self, batch):
+        """
+        Parse a batch in one tagger call and split the result on the sentinel.
+        Words whose tokens don't line up with the input (e.g. the sentinel got
+        merged into a neighbouring token) are re-parsed on their own.
+        """
+        if len(batch) == 1 or any(SENTINEL in surface for surface in batch):
+            return [self._parse_one(surface) for surface in batch]
+
+        segments = [[]]
+        texts = ['']
+        for surface, features in self._parse(SENTINEL.join(batch)):
+            if surface == SENTINEL:
+                segments.append([])
+                texts.append('')
+            else:
+                segments[-1].append(features)
+                texts[-1] += surface
+
+        if len(segments) != len(batch):
+            return [self._parse_one(surface) for surface in batch]
+
+        results = []
+        for surface, text, features in zip(batch, texts, segments):
+            if text == ''.join(surface.split()):
+                results.append(tuple(features))
+            else:
+                results.append(self._parse_one(surface))
+        return results
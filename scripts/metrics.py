@@ -0,0 +1,157 @@
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+import collections
+import functools
+
+# Lightweight instrumentation shared by the scripts.
+#
+# A Metrics object collects wall time per named phase (phases may nest and
+# are reported as parent/child), plain counters, and optionally a cProfile
+# profile and tracemalloc peaks. add_metrics_arguments() registers the common
+# flags (--metrics-json, --profile, --trace-memory) on a script's parser.
+
+PROFILE_TOP = 20
+MEMORY_TOP = 10
+
+class Metrics:
+    def __init__(self, name, profile_path=None, trace_memory=False):
+        self.name = name
+        self.phases = collections.OrderedDict()
+        self.phase_peaks_kb = {}
+        # A Counter, so callers can use it directly as a stats dict
+        self.counters = collections.Counter()
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self._stack = []
+        self._peaks = []
+        self._profiler = None
+        self._started = time.perf_counter()
+        self._finished = None
+        self._memory = None
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block; repeated phases with the same path accumulate."""
+        self._stack.append(name)
+        key = '/'.join(self._stack)
+        # Registered on entry so the report lists parents before their children
+        self.phases.setdefault(key, 0.0)
+        if self.trace_memory:
+            # reset_peak() is global, so fold the enclosing phase's peak so far into its frame first
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            self._peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[key] += time.perf_counter() - start
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                self.phase_peaks_kb[key] = max(self.phase_peaks_kb.get(key, 0), peak // 1024)
+            self._stack.pop()
+
+    def timed(self, name, func):
+        """Wrap func so every call is timed as phase name."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def finish(self):
+        """Stop profiling/tracing and freeze the total time. Safe to call twice."""
+        if self._finished is not None:
+            return
+        self._finished = time.perf_counter()
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot()
+            self._memory = {
+                'peak_kb': peak // 1024,
+                'top': [
+                    {'site': str(stat.traceback[0]), 'size_kb': stat.size // 1024, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:MEMORY_TOP]
+                ],
+            }
+            tracemalloc.stop()
+
+    @property
+    def total_seconds(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    def to_dict(self):
+        data = {
+            'script': self.name,
+            'total_seconds': round(self.total_seconds, 6),
+            'phases': {key: round(seconds, 6) for key, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+        if self.phase_peaks_kb:
+            data['phase_peak_kb'] = dict(self.phase_peaks_kb)
+        if self._memory:
+            data['memory'] = self._memory
+        if self.profile_path:
+            data['profile'] = self.profile_path
+        return data
+
+    def report(self, out=None):
+        out = out or sys.stdout
+        self.finish()
+        print(f"\nMetrics ({self.name}): {self.total_seconds:.3f}s total", file=out)
+        for key, seconds in self.phases.items():
+            indent = '  ' * key.count('/')
+            peak = f"  peak {self.phase_peaks_kb[key] / 1024:.1f} MB" if key in self.phase_peaks_kb else ''
+            print(f" - {indent}{key.rsplit('/', 1)[-1]:<24} {seconds:9.3f}s{peak}", file=out)
+        for name, value in self.counters.items():
+            print(f" # {name:<26} {value}", file=out)
+        if self._memory:
+            print(f" Peak traced memory: {self._memory['peak_kb'] / 1024:.1f} MB", file=out)
+        if self._profiler:
+            stream = io.StringIO()
+            pstats.Stats(self.profile_path, stream=stream).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            print(stream.getvalue(), file=out)
+            print(f" Profile written to {self.profile_path}", file=out)
+
+    def write_json(self, path):
+        self.finish()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+def add_metrics_arguments(parser):
+    """Register the shared instrumentation flags on a script's argument parser."""
+    parser.add_argument('--metrics-json', metavar='PATH', help='Write phase timings and counters as JSON to PATH')
+    parser.add_argument('--profile', metavar='PATH', help='Run under cProfile and write the stats to PATH')
+    parser.add_argument('--trace-memory', action='store_true', help='Track allocation peaks with tracemalloc (slower)')
+
+def metrics_from_args(name, args):
+    return Metrics(name, profile_path=args.profile, trace_memory=args.trace_memory)
+
+def emit(metrics, args):
+    """Print the metrics summary and write --metrics-json if requested."""
+    metrics.report()
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"Metrics written to {args.metrics_json}")
@@ -0,0 +1,195 @@
+import sqlite3
+import os
+import re
+import time
+import argparse
+import importlib.util
+from backup_manager import BackupManager, DEFAULT_KEEP, add_backup_arguments, backup_and_prune
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from generate_conjugations import SESSION_PRAGMAS, apply_session_pragmas
+
+# Versioned migration runner for breeze_jp.sqlite.
+#
+# Steps live in scripts/migrations/ as NNNN_name.py modules with an
+# up(conn, metrics) function, applied in version order. The highest applied version is kept in
+# PRAGMA user_version, so "is anything pending?" is a single header read, and
+# every applied step is also recorded in schema_migrations. Order matters:
+# migrate_grammar matches Japanese POS keywords (助詞, 連語, ...), so it has to
+# run before the Simplified Chinese normalization.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+BACKUP_DIR = os.path.join(os.path.dirname(DB_PATH), 'backups')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+backups = BackupManager(DB_PATH, BACKUP_DIR, prefix='breeze_jp_migrate_backup')
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path), ...] sorted by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def load_migration(name, path):
+    spec = importlib.util.spec_from_file_location(f'migration_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def ensure_history_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at INTEGER NOT NULL,
+            duration_ms REAL
+        )
+    ''')
+
+def get_version(cursor):
+    return cursor.execute("PRAGMA user_version").fetchone()[0]
+
+def record_version(cursor, version, name, duration_ms):
+    cursor.execute(
+        "INSERT OR REPLACE INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+        (version, name, int(time.time()), duration_ms),
+    )
+    # PRAGMA arguments can't be bound; version is always an int here
+    cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+def pending_migrations(migrations, current, target=None):
+    return [m for m in migrations if m[0] > current and (target is None or m[0] <= target)]
+
+def connect(db_path=DB_PATH, pragmas=SESSION_PRAGMAS):
+    """Open the tuned connection migrations run on. Transactions are managed explicitly."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    apply_session_pragmas(conn.cursor(), pragmas)
+    return conn
+
+def apply_migrations(conn, migrations, metrics=None):
+    """
+    Apply each migration in its own transaction, together with its version
+    record, so a failing step leaves every earlier one applied and recorded.
+    Returns the number of applied steps.
+    """
+    metrics = metrics if metrics is not None else Metrics('migrate')
+    cursor = conn.cursor()
+    ensure_history_table(cursor)
+
+    applied = 0
+    for version, name, path in migrations:
+        module = load_migration(name, path)
+        print(f"Applying {version:04d}_{name}...")
+        start = time.perf_counter()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            with metrics.phase(f'{version:04d}_{name}'):
+                module.up(conn, metrics)
+            duration_ms = (time.perf_counter() - start) * 1000
+            record_version(cursor, version, name, duration_ms)
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            print(f"Migration {version:04d}_{name} failed; rolled back.")
+            raise
+        print(f"Applied {version:04d}_{name} in {duration_ms:.0f} ms.")
+        applied += 1
+    metrics.count('migrations_applied', applied)
+    return applied
+
+def show_status(conn, migrations):
+    cursor = conn.cursor()
+    ensure_history_table(cursor)
+    current = get_version(cursor)
+    history = dict(cursor.execute("SELECT version, applied_at FROM schema_migrations").fetchall())
+    print(f"Database version: {current}")
+    for version, name, _ in migrations:
+        if version in history:
+            state = time.strftime('applied %Y-%m-%d %H:%M', time.localtime(history[version]))
+        elif version <= current:
+            state = 'applied (baseline)'
+        else:
+            state = 'pending'
+        print(f" {version:04d}_{name:<28} {state}")
+
+def baseline(conn, migrations, version):
+    """Mark every migration up to version as applied without running it."""
+    cursor = conn.cursor()
+    ensure_history_table(cursor)
+    cursor.execute("BEGIN IMMEDIATE")
+    for v, name, _ in migrations:
+        if v <= version:
+            cursor.execute(
+                "INSERT OR IGNORE INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (?, ?, ?, NULL)",
+                (v, name, int(time.time())),
+            )
+    cursor.execute(f"PRAGMA user_version = {int(version)}")
+    cursor.execute("COMMIT")
+    print(f"Database version set to {version}.")
+
+def migrate(target=None, dry_run=False, compress_backup=False, keep_backups=DEFAULT_KEEP, max_backup_age=None, metrics=None):
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    migrations = discover_migrations()
+    conn = connect()
+    try:
+        current = get_version(conn.cursor())
+        pending = pending_migrations(migrations, current, target)
+        if not pending:
+            print(f"Database is up to date (version {current}).")
+            return
+
+        print(f"Database version {current}; {len(pending)} pending migration(s):")
+        for version, name, _ in pending:
+            print(f" - {version:04d}_{name}")
+        if dry_run:
+            return
+
+        metrics = metrics if metrics is not None else Metrics('migrate')
+        with metrics.phase('backup'):
+            backup_and_prune(backups, compress=compress_backup, keep=keep_backups, max_age_days=max_backup_age)
+        start = time.perf_counter()
+        applied = apply_migrations(conn, pending, metrics)
+        print(f"Applied {applied} migration(s) in {time.perf_counter() - start:.2f}s. "
+              f"Database version: {get_version(conn.cursor())}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Apply pending database migrations from scripts/migrations')
+    parser.add_argument('--to', type=int, metavar='VERSION', help='Stop after this version')
+    parser.add_argument('--dry-run', action='store_true', help='List pending migrations without applying them')
+    parser.add_argument('--status', action='store_true', help='Show applied and pending migrations')
+    parser.add_argument('--baseline', type=int, metavar='VERSION',
+                        help='Mark migrations up to VERSION as applied without running them')
+    add_backup_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.status or args.baseline is not None:
+        if not os.path.exists(DB_PATH):
+            print(f"Database not found at {DB_PATH}")
+        else:
+            conn = connect()
+            try:
+                if args.baseline is not None:
+                    baseline(conn, discover_migrations(), args.baseline)
+                else:
+                    show_status(conn, discover_migrations())
+            finally:
+                conn.close()
+    else:
+        metrics = metrics_from_args('migrate', args)
+        migrate(target=args.to, dry_run=args.dry_run, compress_backup=args.compress_backup,
+                keep_backups=args.keep_backups, max_backup_age=args.max_backup_age, metrics=metrics)
+        emit(metrics, args)
@@ -1,32 +1,150 @@
 import sqlite3
 import os
-import shutil
-import time
 import argparse
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from pos_classifier import register_pos_functions
+from backup_manager import BackupManager, DEFAULT_KEEP, add_backup_arguments, backup_and_prune
 
 # Path to the database
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
 BACKUP_DIR = os.path.join(os.path.dirname(DB_PATH), 'backups')
+backups = BackupManager(DB_PATH, BACKUP_DIR, prefix='breeze_jp_migration_backup')
+
+GRAMMAR_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS grammars (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        meaning TEXT,
+        connection TEXT,
+        jlpt_level TEXT,
+        tags TEXT,
+        created_at INTEGER,
+        updated_at INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS grammar_examples (
+        id INTEGER PRIMARY KEY,
+        grammar_id INTEGER NOT NULL,
+        sentence TEXT,
+        translation TEXT,
+        audio_url TEXT,
+        created_at INTEGER,
+        FOREIGN KEY(grammar_id) REFERENCES grammars(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS study_grammars (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        grammar_id INTEGER NOT NULL,
+        learning_status INTEGER DEFAULT 0,
+        next_review_at INTEGER,
+        last_reviewed_at INTEGER,
+        interval REAL DEFAULT 0,
+        ease_factor REAL DEFAULT 2.5,
+        stability REAL DEFAULT 0,
+        difficulty REAL DEFAULT 0,
+        streak INTEGER DEFAULT 0,
+        total_reviews INTEGER DEFAULT 0,
+        fail_count INTEGER DEFAULT 0,
+        created_at INTEGER,
+        updated_at INTEGER,
+        UNIQUE(user_id, grammar_id),
+        FOREIGN KEY(grammar_id) REFERENCES grammars(id)
+    )
+    """,
+]
+
+def create_grammar_tables(cursor):
+    # Plain execute() rather than executescript(), which would commit the caller's transaction
+    for statement in GRAMMAR_TABLES:
+        cursor.execute(statement)
+
+def select_grammar_ids(cursor, metrics):
+    """
+    Collect the ids of grammar entries in temp.migrating_grammar_ids. Every
+    later step is a single set-based statement joined against this table
+    instead of one query per row or a literal IN (...) list.
+    """
+    # pos_has() matches pos_classifier.MIGRATION_KEYWORDS in one pass per row
+    register_pos_functions(cursor.connection)
+    with metrics.phase('select grammar ids'):
+        cursor.execute("DROP TABLE IF EXISTS temp.migrating_grammar_ids")
+        cursor.execute("CREATE TEMP TABLE migrating_grammar_ids (id INTEGER PRIMARY KEY)")
+        cursor.execute("INSERT INTO temp.migrating_grammar_ids (id) SELECT id FROM words WHERE pos_has(part_of_speech, 'migrate_grammar')")
+    metrics.count('grammar_ids', cursor.rowcount)
+    return cursor.rowcount
+
+def move_grammar_entries(cursor, metrics):
+    """Copy the selected entries into grammars/grammar_examples and delete them from the words tables."""
+    # We keep the ID same as word_id to make related data migration easier, assuming no conflict in new table.
+    # The meaning is the first one by definition_order, picked with a window function.
+    with metrics.phase('insert grammars'):
+        cursor.execute("""
+            INSERT INTO grammars (id, title, meaning, connection, jlpt_level, tags, created_at, updated_at)
+            SELECT w.id, w.word, m.meaning_cn, '', w.jlpt_level, w.part_of_speech,
+                   strftime('%s', 'now'), strftime('%s', 'now')
+            FROM words w
+            JOIN temp.migrating_grammar_ids g ON g.id = w.id
+            LEFT JOIN (
+                SELECT word_id, meaning_cn,
+                       ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY definition_order, id) AS rn
+                FROM word_meanings
+                WHERE word_id IN (SELECT id FROM temp.migrating_grammar_ids)
+            ) m ON m.word_id = w.id AND m.rn = 1
+            ORDER BY w.id
+        """)
+        migrated = cursor.rowcount
+    metrics.count('grammars_inserted', migrated)
+
+    with metrics.phase('copy examples'):
+        cursor.execute("""
+            INSERT INTO grammar_examples (id, grammar_id, sentence, translation, audio_url, created_at)
+            SELECT id, word_id, sentence_jp, translation_cn, NULL, strftime('%s', 'now')
+            FROM example_sentences
+            WHERE word_id IN (SELECT id FROM temp.migrating_grammar_ids)
+        """)
+        examples = cursor.rowcount
+    metrics.count('examples_copied', examples)
 
-def ensure_backup_dir():
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
-
-def create_backup():
-    ensure_backup_dir()
-    timestamp = int(time.time())
-    backup_path = os.path.join(BACKUP_DIR, f'breeze_jp_migration_backup_{timestamp}.sqlite')
-    shutil.copy2(DB_PATH, backup_path)
-    print(f"Database backed up to: {backup_path}")
-    return backup_path
+    print(f"Migrated {migrated} entries to 'grammars' and {examples} to 'grammar_examples'.")
 
-def migrate_db(dry_run=False):
+    print("Cleaning up old data from 'words' ecosystem...")
+    
+    # Delete exactly the ids we moved, children before parents.
+    # study_words is legacy user data - ignoring as requested.
+    for table, column in [
+        ('study_words', 'word_id'),
+        ('example_sentences', 'word_id'),
+        ('word_meanings', 'word_id'),
+        ('words', 'id'),
+    ]:
+        with metrics.phase(f'delete {table}'):
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT id FROM temp.migrating_grammar_ids)")
+        metrics.count(f'{table}_deleted', cursor.rowcount)
+        print(f"Deleted {cursor.rowcount} {table} records.")
+
+    cursor.execute("DROP TABLE temp.migrating_grammar_ids")
+    return migrated
+
+def migrate_grammar(cursor, metrics=None):
+    """Run the whole restructuring on an open connection without committing. Returns the migrated count."""
+    metrics = metrics if metrics is not None else Metrics('migrate_grammar')
+    create_grammar_tables(cursor)
+    count = select_grammar_ids(cursor, metrics)
+    print(f"Identified {count} grammar entries to migrate.")
+    return move_grammar_entries(cursor, metrics)
+
+def migrate_db(dry_run=False, compress_backup=False, keep_backups=DEFAULT_KEEP, max_backup_age=None, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('migrate_grammar')
     if not os.path.exists(DB_PATH):
         print(f"Database not found at {DB_PATH}")
         return
 
     if not dry_run:
-        create_backup()
+        backup_and_prune(backups, compress=compress_backup, keep=keep_backups, max_age_days=max_backup_age)
 
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -36,131 +154,30 @@ def migrate_db(dry_run=False):
 
         # 1. Create New Tables
         print("Creating new tables...")
-        cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS grammars (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            meaning TEXT,
-            connection TEXT,
-            jlpt_level TEXT,
-            tags TEXT,
-            created_at INTEGER,
-            updated_at INTEGER
-        );
-
-        CREATE TABLE IF NOT EXISTS grammar_examples (
-            id INTEGER PRIMARY KEY,
-            grammar_id INTEGER NOT NULL,
-            sentence TEXT,
-            translation TEXT,
-            audio_url TEXT,
-            created_at INTEGER,
-            FOREIGN KEY(grammar_id) REFERENCES grammars(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS study_grammars (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            grammar_id INTEGER NOT NULL,
-            learning_status INTEGER DEFAULT 0,
-            next_review_at INTEGER,
-            last_reviewed_at INTEGER,
-            interval REAL DEFAULT 0,
-            ease_factor REAL DEFAULT 2.5,
-            stability REAL DEFAULT 0,
-            difficulty REAL DEFAULT 0,
-            streak INTEGER DEFAULT 0,
-            total_reviews INTEGER DEFAULT 0,
-            fail_count INTEGER DEFAULT 0,
-            created_at INTEGER,
-            updated_at INTEGER,
-            UNIQUE(user_id, grammar_id),
-            FOREIGN KEY(grammar_id) REFERENCES grammars(id)
-        );
-        """)
+        create_grammar_tables(cursor)
 
         # 2. Identify Grammar Entries
-        # Keywords based on calibration
-        grammar_keywords = [
-            '接続詞', '助動詞', '助詞', '連語', '成句', '文法', 
-            '接頭', '接尾', '接辞', '造'
-        ]
-        
-        # Construct the LIKE clause
-        like_clauses = " OR ".join([f"part_of_speech LIKE '%{k}%'" for k in grammar_keywords])
-        
-        select_sql = f"""
-            SELECT id, word, part_of_speech, jlpt_level 
-            FROM words 
-            WHERE {like_clauses}
-        """
-        
-        cursor.execute(select_sql)
-        grammar_rows = cursor.fetchall()
-        print(f"Identified {len(grammar_rows)} grammar entries to migrate.")
+        count = select_grammar_ids(cursor, metrics)
+        print(f"Identified {count} grammar entries to migrate.")
 
         if dry_run:
             print("[Dry Run] Would migrate the following sample entries:")
-            for row in grammar_rows[:5]:
-                print(f" - {row[1]} ({row[2]})")
+            cursor.execute("""
+                SELECT w.word, w.part_of_speech
+                FROM words w JOIN temp.migrating_grammar_ids g ON g.id = w.id
+                ORDER BY w.id
+                LIMIT 5
+            """)
+            for word, pos in cursor.fetchall():
+                print(f" - {word} ({pos})")
             conn.close()
             return
 
-        # 3. Migrate Data
-        count = 0
-        for row in grammar_rows:
-            w_id, w_word, w_pos, w_level = row
-            
-            # Get Meaning
-            cursor.execute("SELECT meaning_cn FROM word_meanings WHERE word_id = ? ORDER BY definition_order LIMIT 1", (w_id,))
-            meaning_row = cursor.fetchone()
-            meaning = meaning_row[0] if meaning_row else None
-            
-            # Insert into grammars
-            # We keep the ID same as word_id to make related data migration easier, assuming no conflict in new table
-            cursor.execute("""
-                INSERT INTO grammars (id, title, meaning, connection, jlpt_level, tags, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, strftime('%s', 'now'), strftime('%s', 'now'))
-            """, (w_id, w_word, meaning, '', w_level, w_pos))
-            
-            # Migrate Examples
-            cursor.execute("""
-                INSERT INTO grammar_examples (id, grammar_id, sentence, translation, audio_url, created_at)
-                SELECT id, word_id, sentence_jp, translation_cn, NULL, strftime('%s', 'now')
-                FROM example_sentences
-                WHERE word_id = ?
-            """, (w_id,))
-
-            count += 1
-
-        print(f"Migrated {count} entries to 'grammars' and 'grammar_examples'.")
-
-        # 4. Cleanup Old Data
-        print("Cleaning up old data from 'words' ecosystem...")
-        
-        # We need the IDs again or just use the same condition? 
-        # Safer to use the IDs we identified to ensure exactly what we moved is deleted.
-        grammar_ids = [str(r[0]) for r in grammar_rows]
-        if grammar_ids:
-            ids_str = ",".join(grammar_ids)
-            
-            # Delete from study_words (Legacy user data - Ignoring as requested)
-            cursor.execute(f"DELETE FROM study_words WHERE word_id IN ({ids_str})")
-            print(f"Deleted study_words records.")
-
-            # Delete from example_sentences
-            cursor.execute(f"DELETE FROM example_sentences WHERE word_id IN ({ids_str})")
-            print(f"Deleted example_sentences records.")
-
-            # Delete from word_meanings
-            cursor.execute(f"DELETE FROM word_meanings WHERE word_id IN ({ids_str})")
-            print(f"Deleted word_meanings records.")
-
-            # Delete from words
-            cursor.execute(f"DELETE FROM words WHERE id IN ({ids_str})")
-            print(f"Deleted words records.")
-
-        conn.commit()
+        # 3. Migrate Data, 4. Cleanup Old Data
+        move_grammar_entries(cursor, metrics)
+
+        with metrics.phase('commit'):
+            conn.commit()
         print("Restructuring Complete.")
 
     except Exception as e:
@@ -172,6 +189,11 @@ def migrate_db(dry_run=False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Restructure database: Split Grammar from Words')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying DB')
+    add_backup_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
     
-    migrate_db(dry_run=args.dry_run)
+    metrics = metrics_from_args('migrate_grammar', args)
+    migrate_db(dry_run=args.dry_run, compress_backup=args.compress_backup,
+               keep_backups=args.keep_backups, max_backup_age=args.max_backup_age, metrics=metrics)
+    emit(metrics, args)
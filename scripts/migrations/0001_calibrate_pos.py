@@ -0,0 +1,12 @@
+"""Calibrate part_of_speech with MeCab and JMdict (journaled, see calibrate_pos.py)."""
+import os
+from calibrate_pos import propose_updates, apply_updates
+from pos_index import DEFAULT_INDEX_PATH
+
+def up(conn, metrics):
+    cursor = conn.cursor()
+    # Prefer the precompiled index when it has been built
+    pos_index_path = DEFAULT_INDEX_PATH if os.path.exists(DEFAULT_INDEX_PATH) else None
+    rows, updates = propose_updates(cursor, pos_index_path=pos_index_path, metrics=metrics)
+    run_id = apply_updates(cursor, rows, updates, pos_index_path=pos_index_path, metrics=metrics)
+    print(f"Updated {len(updates)} records. Run id: {run_id}")
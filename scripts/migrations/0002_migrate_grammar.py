@@ -0,0 +1,5 @@
+"""Split grammar entries out of words into grammars/grammar_examples."""
+from migrate_grammar import migrate_grammar
+
+def up(conn, metrics):
+    migrate_grammar(conn.cursor(), metrics)
@@ -0,0 +1,7 @@
+"""Normalize part_of_speech to Simplified Chinese (動→动, 連→连, ...)."""
+from normalize_pos_sc import normalize_rows
+
+def up(conn, metrics):
+    count = normalize_rows(conn.cursor())
+    metrics.count('pos_normalized', count)
+    print(f"Normalized {count} entries.")
@@ -1,47 +1,18 @@
+import argparse
+from metrics import add_metrics_arguments, metrics_from_args, emit
+from pos_normalizer import DB_PATH, normalize_words, run
 
-import sqlite3
+def normalize_rows(cursor):
+    """Rewrite part_of_speech to Simplified Chinese on an open connection without committing. Returns the count."""
+    return normalize_words(cursor, 'sc')
 
-DB_PATH = 'assets/database/breeze_jp.sqlite'
-
-def normalize_pos():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    replacements = {
-        '動': '动',
-        '連': '连',
-        '詞': '词',
-        '補': '补',
-        '終': '终'
-    }
-    
-    print("Checking for Japanese characters in part_of_speech...")
-    # Find rows matching checking any of the keys
-    conditions = " OR ".join([f"part_of_speech LIKE '%{k}%'" for k in replacements.keys()])
-    cursor.execute(f"SELECT id, word, part_of_speech FROM words WHERE {conditions}")
-    rows = cursor.fetchall()
-    
-    if not rows:
-        print("No entries found with specified Japanese characters.")
-        conn.close()
-        return
-
-    print(f"Found {len(rows)} entries to normalize.")
-    
-    count = 0
-    for word_id, word, pos in rows:
-        new_pos = pos
-        for k, v in replacements.items():
-            new_pos = new_pos.replace(k, v)
-            
-        if new_pos != pos:
-            cursor.execute("UPDATE words SET part_of_speech = ? WHERE id = ?", (new_pos, word_id))
-            count += 1
-            # print(f"Updated {word}: {pos} -> {new_pos}")
-            
-    conn.commit()
-    conn.close()
-    print(f"Normalized {count} entries.")
+def normalize_pos(metrics=None):
+    run('sc', DB_PATH, metrics=metrics)
 
 if __name__ == "__main__":
-    normalize_pos()
+    parser = argparse.ArgumentParser(description='Normalize part_of_speech to Simplified Chinese (動 -> 动, ...)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics = metrics_from_args('normalize_pos_sc', args)
+    normalize_pos(metrics)
+    emit(metrics, args)
@@ -0,0 +1,340 @@
+import sqlite3
+import os
+import time
+import random
+import argparse
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+from search_index import TRIGGERS
+
+# Release build of breeze_jp.sqlite.
+#
+# The editing scripts leave free pages and fragmented tables behind (mass
+# deletes in migrate_grammar, REPLACE churn in generate_conjugations) and no
+# sqlite_stat1 for the planner. This writes an optimized copy for shipping:
+#   1. VACUUM INTO a staging file (the source is opened read-only)
+#   2. drop the editing scripts' bookkeeping tables and the words_fts sync
+#      triggers (see BUILD_ONLY_TABLES)
+#   3. rebuild word_conjugations WITHOUT ROWID, clustered on (word_id, type_id),
+#      so a word's forms sit together instead of being scattered by rowid
+#   4. ANALYZE
+#   5. VACUUM INTO one file per candidate page size and keep the smallest
+#      file, preferring smaller pages when sizes are close: the app's reads
+#      are point lookups, and every lookup reads whole pages
+# then times a fixed set of the app's queries against both files.
+#
+# The release file is what the app bundles (pubspec.yaml lists
+# assets/database/release/breeze_jp.sqlite), and it is an output only:
+# word_conjugations.id loses its AUTOINCREMENT there, so the editing scripts
+# keep working on assets/database/breeze_jp.sqlite. Rebuild the release file
+# after editing and before building the app.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+# The pubspec asset entry; lib/data/db/app_database.dart loads it from there
+RELEASE_PATH = os.path.join(os.path.dirname(DB_PATH), 'release', 'breeze_jp.sqlite')
+
+PAGE_SIZES = (4096, 8192, 16384)
+
+# A larger page size has to shrink the file by more than this to be chosen
+SIZE_TOLERANCE = 0.01
+
+CLUSTER_TABLE = 'word_conjugations'
+CLUSTER_KEY = ('word_id', 'type_id')
+
+# What ships: every table a stage builds for the app to read (word_relations,
+# conjugation_lookup, words_fts, word_details) stays, whether or not the app
+# queries it yet. Only the bookkeeping of the editing scripts is dropped:
+# calibrate_pos state, the undo journal and the applied-migration list.
+BUILD_ONLY_TABLES = ('pos_calibration_state', 'undo_journal', 'schema_migrations')
+
+# Keep words_fts in step with edits; the shipped file is never edited
+BUILD_ONLY_TRIGGERS = tuple(TRIGGERS)
+
+DEFAULT_SAMPLES = 200
+DEFAULT_REPEAT = 7
+
+# (name, sql, parameter kind) for the lookups the app makes on every word
+# screen; see lib/data/queries/word_read_queries.dart and the repositories
+QUERIES = [
+    ('word by id', "SELECT * FROM words WHERE id = ?", 'word_id'),
+    ('meanings', "SELECT * FROM word_meanings WHERE word_id = ? ORDER BY definition_order ASC", 'word_id'),
+    ('word audio', "SELECT * FROM word_audio WHERE word_id = ?", 'word_id'),
+    ('examples', "SELECT * FROM example_sentences WHERE word_id = ?", 'word_id'),
+    ('conjugations', '''
+        SELECT wc.*, ct.name_ja, ct.name_cn, ct.sort_order
+        FROM word_conjugations wc
+        JOIN conjugation_types ct ON wc.type_id = ct.id
+        WHERE wc.word_id = ?
+        ORDER BY ct.sort_order ASC
+    ''', 'word_id'),
+    ('related words', '''
+        SELECT w.*, wr.score, wr.relation_type
+        FROM word_relations wr
+        JOIN words w ON wr.related_word_id = w.id
+        LEFT JOIN study_words sw ON w.id = sw.word_id AND sw.user_id = 1
+        WHERE wr.word_id = ?
+          AND (sw.user_state IS NULL OR sw.user_state IN (0, 1))
+        ORDER BY wr.score DESC
+    ''', 'word_id'),
+    ('words by level', "SELECT * FROM words WHERE jlpt_level = ? ORDER BY id ASC LIMIT 50", 'jlpt_level'),
+    ('search', '''
+        SELECT * FROM words WHERE word LIKE ?1 OR furigana LIKE ?1 OR romaji LIKE ?1
+        ORDER BY id ASC LIMIT 50
+    ''', 'keyword'),
+]
+
+def drop_build_only(cursor, tables=BUILD_ONLY_TABLES, triggers=BUILD_ONLY_TRIGGERS):
+    """Drop the build-only tables and triggers present in the database. Returns the dropped names."""
+    dropped = []
+    for kind, names in (('trigger', triggers), ('table', tables)):
+        for name in names:
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)).fetchone():
+                cursor.execute(f"DROP {kind.upper()} {name}")
+                dropped.append(name)
+    return dropped
+
+def clustered_table_sql(cursor, table=CLUSTER_TABLE, key=CLUSTER_KEY):
+    """CREATE TABLE for a WITHOUT ROWID copy of table keyed on key, or None if table is missing."""
+    columns = cursor.execute(f"PRAGMA table_info({table})").fetchall()
+    if not columns:
+        return None
+    definitions = []
+    for _, name, type_, notnull, default, _ in columns:
+        definition = f"{name} {type_}".strip()
+        # The old rowid alias becomes an ordinary column that keeps its values
+        if notnull or name == 'id' or name in key:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f" DEFAULT {default}"
+        definitions.append(definition)
+    definitions.append(f"PRIMARY KEY ({', '.join(key)})")
+    body = ',\n    '.join(definitions)
+    return f"CREATE TABLE {table}_clustered (\n    {body}\n) WITHOUT ROWID"
+
+def is_without_rowid(cursor, table):
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None and 'WITHOUT ROWID' in row[0].upper()
+
+def cluster_conjugations(cursor, table=CLUSTER_TABLE, key=CLUSTER_KEY):
+    """
+    Rebuild table as WITHOUT ROWID clustered on key, keeping its other
+    indexes. Returns the row count, or None if there was nothing to do.
+    """
+    create_sql = clustered_table_sql(cursor, table, key)
+    if create_sql is None or is_without_rowid(cursor, table):
+        return None
+    indexes = [sql for (sql,) in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))]
+    columns = ', '.join(row[1] for row in cursor.execute(f"PRAGMA table_info({table})"))
+
+    cursor.execute(create_sql)
+    cursor.execute(f"INSERT INTO {table}_clustered ({columns}) SELECT {columns} FROM {table} ORDER BY {', '.join(key)}")
+    count = cursor.rowcount
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_clustered RENAME TO {table}")
+    for sql in indexes:
+        cursor.execute(sql)
+    return count
+
+def database_stats(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        stats = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                 for name in ('page_size', 'page_count', 'freelist_count', 'journal_mode')}
+    finally:
+        conn.close()
+    stats['size'] = os.path.getsize(path)
+    return stats
+
+def sample_parameters(path, samples=DEFAULT_SAMPLES, seed=0):
+    """Fixed parameters per kind, so both files answer exactly the same queries."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        ids = [row[0] for row in conn.execute("SELECT id FROM words ORDER BY id")]
+        word_ids = sorted(rng.sample(ids, min(samples, len(ids))))
+        levels = [row[0] for row in conn.execute(
+            "SELECT DISTINCT jlpt_level FROM words WHERE jlpt_level IS NOT NULL ORDER BY jlpt_level")]
+        keywords = []
+        for wid in word_ids[:samples // 4 or 1]:
+            word = conn.execute("SELECT word FROM words WHERE id = ?", (wid,)).fetchone()[0] or ''
+            if word:
+                start = rng.randint(0, max(len(word) - 2, 0))
+                keywords.append(f"%{word[start:start + 2]}%")
+    finally:
+        conn.close()
+    return {
+        'word_id': [(wid,) for wid in word_ids],
+        'jlpt_level': [(level,) for level in levels],
+        'keyword': [(keyword,) for keyword in keywords],
+    }
+
+def time_queries(paths, parameters, repeat=DEFAULT_REPEAT):
+    """
+    {path: {query name: (cold, warm)}} in seconds per call. Every pass opens
+    a fresh connection, so the cold run starts with an empty SQLite page
+    cache (the OS cache stays warm) and the warm run repeats it right after;
+    cold is the median pass, warm the best. Each pass runs in one read
+    transaction, so per-statement locking (which differs between WAL and
+    rollback-journal files) stays out of the numbers, and the files take
+    turns so drift on the machine hits them alike. Queries on tables a
+    database lacks are left out for it.
+    """
+    timings = {path: {} for path in paths}
+    for name, sql, kind in QUERIES:
+        params = parameters[kind]
+        if not params:
+            continue
+        passes = {path: ([], []) for path in paths}
+        for _ in range(repeat):
+            for path in list(passes):
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+                try:
+                    conn.execute("BEGIN")
+                    conn.execute("SELECT count(*) FROM sqlite_master").fetchone()  # load the schema untimed
+                    for runs in passes[path]:
+                        start = time.perf_counter()
+                        for args in params:
+                            conn.execute(sql, args).fetchall()
+                        runs.append((time.perf_counter() - start) / len(params))
+                except sqlite3.OperationalError:
+                    del passes[path]
+                finally:
+                    conn.close()
+        for path, (cold, warm) in passes.items():
+            timings[path][name] = (sorted(cold)[len(cold) // 2], min(warm))
+    return timings
+
+def remove_files(*paths):
+    for path in paths:
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def optimize(source=DB_PATH, output=RELEASE_PATH, page_sizes=PAGE_SIZES, metrics=None):
+    """
+    Write the optimized copy of source to output. Returns
+    {page size: database_stats} for every candidate built; the chosen one
+    ends up at output.
+    """
+    metrics = metrics if metrics is not None else Metrics('optimize_release')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    staging = output + '.staging'
+    candidates = {page_size: f"{output}.{page_size}" for page_size in page_sizes}
+    remove_files(staging, *candidates.values())
+
+    try:
+        with metrics.phase('copy'):
+            src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                src.execute("VACUUM INTO ?", (staging,))
+            finally:
+                src.close()
+
+        conn = sqlite3.connect(staging, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            with metrics.phase('strip'):
+                cursor.execute("BEGIN")
+                dropped = drop_build_only(cursor)
+                cursor.execute("COMMIT")
+            if dropped:
+                metrics.count('objects_dropped', len(dropped))
+                print(f"Dropped build-only objects: {', '.join(dropped)}")
+            with metrics.phase('cluster'):
+                cursor.execute("BEGIN")
+                clustered = cluster_conjugations(cursor)
+                cursor.execute("COMMIT")
+            if clustered is not None:
+                metrics.count('rows_clustered', clustered)
+                print(f"Rebuilt {CLUSTER_TABLE} WITHOUT ROWID on ({', '.join(CLUSTER_KEY)}): {clustered} rows")
+            with metrics.phase('analyze'):
+                cursor.execute("ANALYZE")
+
+            results = {}
+            for page_size, path in candidates.items():
+                with metrics.phase(f'vacuum {page_size}'):
+                    # A pending page_size applies to the VACUUM INTO target
+                    cursor.execute(f"PRAGMA page_size = {int(page_size)}")
+                    cursor.execute("VACUUM INTO ?", (path,))
+                results[page_size] = database_stats(path)
+        finally:
+            conn.close()
+
+        smallest = min(stats['size'] for stats in results.values())
+        best = min(page_size for page_size, stats in results.items()
+                   if stats['size'] <= smallest * (1 + SIZE_TOLERANCE))
+        remove_files(output)
+        os.replace(candidates[best], output)
+        results[best]['chosen'] = True
+        return results
+    finally:
+        remove_files(staging, *candidates.values())
+
+def print_report(source, output, candidates, before, after):
+    print("\nPage size candidates:")
+    for page_size, stats in sorted(candidates.items()):
+        marker = '  <- chosen' if stats.get('chosen') else ''
+        print(f" - {page_size:>6}: {stats['size'] / 1024 / 1024:8.2f} MB, {stats['page_count']} pages{marker}")
+
+    source_stats, output_stats = database_stats(source), database_stats(output)
+    saved = 1 - output_stats['size'] / source_stats['size'] if source_stats['size'] else 0.0
+    print(f"\nSize: {source_stats['size'] / 1024 / 1024:.2f} MB "
+          f"({source_stats['freelist_count']} free of {source_stats['page_count']} pages x {source_stats['page_size']}, "
+          f"{source_stats['journal_mode']}) -> {output_stats['size'] / 1024 / 1024:.2f} MB "
+          f"({output_stats['page_count']} pages x {output_stats['page_size']}, {output_stats['journal_mode']}), {saved:.1%} smaller")
+
+    print("\nQuery time per call, ms (SQLite cache cold / warm, OS cache warm):")
+    print(f" {'query':<16} {'before':>17} {'after':>17} {'speedup':>8}")
+    for name, _, _ in QUERIES:
+        if name not in before or name not in after:
+            continue
+        (b_cold, b_warm), (a_cold, a_warm) = before[name], after[name]
+        speedup = b_cold / a_cold if a_cold else 0.0
+        print(f" {name:<16} {b_cold * 1000:8.3f} /{b_warm * 1000:7.3f} "
+              f"{a_cold * 1000:8.3f} /{a_warm * 1000:7.3f} {speedup:7.2f}x")
+
+def main(output=RELEASE_PATH, page_sizes=PAGE_SIZES, samples=DEFAULT_SAMPLES, repeat=DEFAULT_REPEAT, seed=0, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('optimize_release')
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    try:
+        candidates = optimize(DB_PATH, output, page_sizes, metrics)
+        with metrics.phase('benchmark'):
+            parameters = sample_parameters(DB_PATH, samples, seed)
+            timings = time_queries([DB_PATH, output], parameters, repeat)
+    except sqlite3.Error as e:
+        print(f"Error: {e}")
+        return
+    print_report(DB_PATH, output, candidates, timings[DB_PATH], timings[output])
+    print(f"\nRelease database written to {output}")
+
+def parse_page_sizes(text):
+    try:
+        sizes = tuple(int(s) for s in text.split(',') if s.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a list of integers: {text}")
+    if not sizes or any(s < 512 or s > 65536 or s & (s - 1) for s in sizes):
+        raise argparse.ArgumentTypeError('page sizes must be powers of two between 512 and 65536')
+    return sizes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write an analyzed, clustered and vacuumed copy of the database for release')
+    parser.add_argument('--output', default=RELEASE_PATH, metavar='PATH', help=f'Release database path (default: {RELEASE_PATH})')
+    parser.add_argument('--page-sizes', type=parse_page_sizes, default=PAGE_SIZES, metavar='LIST',
+                        help=f"Comma-separated page sizes to try; the smallest file wins, ties to smaller pages (default: {','.join(map(str, PAGE_SIZES))})")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='Words sampled for the query timings')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed passes over the query set')
+    parser.add_argument('--seed', type=int, default=0, help='Sampling seed for the query timings')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.samples < 1 or args.repeat < 1:
+        parser.error('--samples and --repeat must be positive')
+    if os.path.abspath(args.output) == os.path.abspath(DB_PATH):
+        parser.error('--output must not be the source database')
+
+    metrics = metrics_from_args('optimize_release', args)
+    main(output=args.output, page_sizes=args.page_sizes, samples=args.samples, repeat=args.repeat, seed=args.seed, metrics=metrics)
+    emit(metrics, args)
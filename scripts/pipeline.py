@@ -0,0 +1,247 @@
+import os
+import time
+import argparse
+from backup_manager import BackupManager, DEFAULT_KEEP, add_backup_arguments, backup_and_prune
+from calibrate_pos import propose_updates, apply_updates
+from deinflection_index import build_index as build_deinflection_index
+from generate_conjugations import SESSION_PRAGMAS, DEFAULT_BATCH_SIZE, generate, generate_incremental, is_candidate
+from migrate import connect
+from migrate_grammar import migrate_grammar
+from optimize_release import RELEASE_PATH, optimize
+from pos_classifier import migration_matcher
+from pos_normalizer import normalize, normalize_words
+from search_index import build_search_index
+from word_detail import build_details
+from word_relations import DEFAULT_TOP_K, build_relations, require_numeric
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+# Content build pipeline: calibrate -> migrate -> normalize -> conjugate -> deinflect,
+# plus opt-in relations, search, detail and release stages (see OPT_IN_STAGES).
+#
+# All stages share one connection with tuned session PRAGMAs and one
+# in-memory snapshot of words, read once up front and kept in step with each
+# stage's writes, instead of every script reconnecting and re-scanning the
+# table. Each stage commits in its own transaction.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+BACKUP_DIR = os.path.join(os.path.dirname(DB_PATH), 'backups')
+backups = BackupManager(DB_PATH, BACKUP_DIR, prefix='breeze_jp_pipeline_backup')
+
+# Same order as migrations 0001-0003: migrate_grammar matches Japanese POS
+# keywords (助詞, 連語, ...), so it runs before the normalization
+STAGES = ['calibrate', 'migrate', 'normalize', 'conjugate', 'deinflect', 'relations', 'search', 'detail', 'release']
+
+# Only run when asked for:
+#   relations needs NumPy and SciPy, which the build does not otherwise require
+#   search adds an FTS5 trigram table and its triggers, which the app does not
+#     query yet and older Android SQLite builds cannot open
+#   detail adds word_details (several MB), which the app does not read yet
+#   release writes a separate copy
+OPT_IN_STAGES = {'relations', 'search', 'detail', 'release'}
+DEFAULT_STAGES = [s for s in STAGES if s not in OPT_IN_STAGES]
+
+# Stages that write elsewhere through their own connections; VACUUM INTO
+# cannot run inside the pipeline's transaction
+UNTRANSACTED_STAGES = {'release'}
+
+PIPELINE_PRAGMAS = dict(SESSION_PRAGMAS, mmap_size=256 * 1024 * 1024)
+
+class WordsSnapshot:
+    """id -> [word, part_of_speech, furigana] for every row of words, in id order."""
+
+    def __init__(self, cursor):
+        cursor.execute("SELECT id, word, part_of_speech, furigana FROM words ORDER BY id")
+        self.words = {row[0]: list(row[1:]) for row in cursor.fetchall()}
+
+    def __len__(self):
+        return len(self.words)
+
+    def rows(self):
+        """(id, word, part_of_speech) rows, as calibrate_pos reads them."""
+        return [(wid, word, pos) for wid, (word, pos, _) in self.words.items()]
+
+    def batches(self, predicate, size):
+        """(id, word, part_of_speech, furigana) batches of the rows whose POS satisfies predicate."""
+        batch = []
+        for wid, (word, pos, furigana) in self.words.items():
+            if predicate(pos):
+                batch.append((wid, word, pos, furigana))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def set_pos(self, wid, pos):
+        self.words[wid][1] = pos
+
+    def remove_where(self, predicate):
+        for wid in [wid for wid, (_, pos, _) in self.words.items() if predicate(pos)]:
+            del self.words[wid]
+
+def stage_normalize(conn, snapshot, options, metrics):
+    direction = options['normalize_to']
+    count = normalize_words(conn.cursor(), direction)
+    metrics.count('pos_normalized', count)
+    for wid, (_, pos, _) in snapshot.words.items():
+        snapshot.set_pos(wid, normalize(pos, direction))
+    return f"{count} entries normalized to {direction}"
+
+def stage_calibrate(conn, snapshot, options, metrics):
+    cursor = conn.cursor()
+    rows, updates = propose_updates(cursor, workers=options['workers'], pos_index_path=options['pos_index'],
+                                    full=options['full'], rows=snapshot.rows(), metrics=metrics)
+    run_id = apply_updates(cursor, rows, updates, pos_index_path=options['pos_index'], metrics=metrics)
+    for new_pos, wid, _, _ in updates:
+        snapshot.set_pos(wid, new_pos)
+    return f"{len(rows)} analysed, {len(updates)} updated (run {run_id})"
+
+def stage_migrate(conn, snapshot, options, metrics):
+    migrated = migrate_grammar(conn.cursor(), metrics)
+    # Same rule as the pos_has(part_of_speech, 'migrate_grammar') filter in SQL
+    snapshot.remove_where(migration_matcher.contains_any)
+    return f"{migrated} grammar entries moved"
+
+def stage_conjugate(conn, snapshot, options, metrics):
+    batch_size = options['batch_size']
+    counters = metrics.counters
+    if options['incremental']:
+        # Every word, so stale rows of words that stopped conjugating are deleted
+        inserted, updated, deleted = generate_incremental(conn, snapshot.batches(lambda pos: True, batch_size), metrics)
+        return (f"{inserted} inserted, {updated} updated, {deleted} deleted, {counters['conjugations_unchanged']} unchanged, "
+                f"{counters['conjugations_kept']} kept")
+    written = generate(conn, snapshot.batches(is_candidate, batch_size), batch_size, metrics)
+    return f"{written} rows for {counters['conjugated_words']} words ({counters['conjugation_skipped']} skipped)"
+
+def stage_deinflect(conn, snapshot, options, metrics):
+    count = build_deinflection_index(conn.cursor(), metrics)
+    return f"{count} conjugated forms indexed"
+
+def stage_relations(conn, snapshot, options, metrics):
+    count = build_relations(conn.cursor(), top_k=options['top_k'], metrics=metrics)
+    return f"{count} semantic relations for {metrics.counters['words']} words"
+
+def stage_search(conn, snapshot, options, metrics):
+    count = build_search_index(conn.cursor(), metrics)
+    return f"{count} words in the search index"
+
+def stage_detail(conn, snapshot, options, metrics):
+    inserted, updated, deleted = build_details(conn.cursor(), metrics=metrics)
+    return f"{inserted} inserted, {updated} updated, {deleted} deleted, {metrics.counters['details_unchanged']} unchanged"
+
+def stage_release(conn, snapshot, options, metrics):
+    output = options['release_output']
+    candidates = optimize(DB_PATH, output, metrics=metrics)
+    page_size = next(size for size, stats in candidates.items() if stats.get('chosen'))
+    before, after = os.path.getsize(DB_PATH), candidates[page_size]['size']
+    return f"{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB ({page_size} B pages) at {output}"
+
+STAGE_FUNCTIONS = {
+    'normalize': stage_normalize,
+    'calibrate': stage_calibrate,
+    'migrate': stage_migrate,
+    'conjugate': stage_conjugate,
+    'deinflect': stage_deinflect,
+    'relations': stage_relations,
+    'search': stage_search,
+    'detail': stage_detail,
+    'release': stage_release,
+}
+
+def run_pipeline(stages, options, compress_backup=False, keep_backups=DEFAULT_KEEP, max_backup_age=None, metrics=None):
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    if 'relations' in stages:
+        # Fail before any stage commits rather than at the last one
+        try:
+            require_numeric()
+        except RuntimeError as e:
+            print(f"{e} (or leave out the relations stage)")
+            return
+
+    metrics = metrics if metrics is not None else Metrics('pipeline')
+    with metrics.phase('backup'):
+        backup_and_prune(backups, compress=compress_backup, keep=keep_backups, max_age_days=max_backup_age)
+
+    conn = connect(DB_PATH, PIPELINE_PRAGMAS)
+    cursor = conn.cursor()
+    report = []
+    try:
+        start = time.perf_counter()
+        with metrics.phase('load words'):
+            snapshot = WordsSnapshot(cursor)
+        metrics.count('words_loaded', len(snapshot))
+        report.append(('load words', time.perf_counter() - start, f"{len(snapshot)} rows"))
+
+        for name in stages:
+            print(f"== {name} ==")
+            start = time.perf_counter()
+            if name in UNTRANSACTED_STAGES:
+                with metrics.phase(name):
+                    summary = STAGE_FUNCTIONS[name](conn, snapshot, options, metrics)
+                report.append((name, time.perf_counter() - start, summary))
+                continue
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                with metrics.phase(name):
+                    summary = STAGE_FUNCTIONS[name](conn, snapshot, options, metrics)
+                    with metrics.phase('commit'):
+                        cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                print(f"Stage '{name}' failed; its changes were rolled back.")
+                raise
+            report.append((name, time.perf_counter() - start, summary))
+    finally:
+        conn.close()
+        print("\nPipeline summary:")
+        for name, seconds, summary in report:
+            print(f" - {name:<12} {seconds:8.2f}s  {summary}")
+        print(f" - {'total':<12} {sum(r[1] for r in report):8.2f}s")
+
+def parse_stages(text):
+    stages = [s.strip() for s in text.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGE_FUNCTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    # Always run in pipeline order, whatever order they were given in
+    return [s for s in STAGES if s in stages]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the content build stages over one database connection')
+    parser.add_argument('--stages', type=parse_stages, default=DEFAULT_STAGES, metavar='LIST',
+                        help=f"Comma-separated stages to run (default: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument('--normalize-to', choices=['sc', 'ja'], default='sc',
+                        help="POS normalization target for the normalize stage (default: sc)")
+    parser.add_argument('--workers', type=int, default=1, help='calibrate: analyse with N worker processes')
+    parser.add_argument('--pos-index', metavar='PATH', help='calibrate: use the precompiled JMdict POS index')
+    parser.add_argument('--full', action='store_true', help='calibrate: re-analyse every word')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='conjugate: rows per insert batch')
+    parser.add_argument('--incremental', action='store_true', help='conjugate: write only rows that differ')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='relations: neighbours per word')
+    parser.add_argument('--release-output', default=RELEASE_PATH, metavar='PATH', help='release: optimized database path')
+    add_backup_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.batch_size < 1 or args.top_k < 1:
+        parser.error('--workers, --batch-size and --top-k must be positive')
+    if os.path.abspath(args.release_output) == os.path.abspath(DB_PATH):
+        parser.error('--release-output must not be the source database')
+
+    options = {
+        'normalize_to': args.normalize_to,
+        'workers': args.workers,
+        'pos_index': args.pos_index,
+        'full': args.full,
+        'batch_size': args.batch_size,
+        'incremental': args.incremental,
+        'top_k': args.top_k,
+        'release_output': args.release_output,
+    }
+    metrics = metrics_from_args('pipeline', args)
+    run_pipeline(args.stages, options, compress_backup=args.compress_backup,
+                 keep_backups=args.keep_backups, max_backup_age=args.max_backup_age, metrics=metrics)
+    emit(metrics, args)
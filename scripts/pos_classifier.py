@@ -0,0 +1,142 @@
+from functools import lru_cache
+
+# Shared part_of_speech keyword classification for the scripts.
+#
+# Each keyword set is compiled once into an Aho-Corasick automaton, so a POS
+# string is classified in a single left-to-right pass no matter how many
+# keywords there are, and results are cached per distinct POS string (there
+# are only a few hundred in the dictionary). The same matchers are exposed to
+# SQLite as pos_category() / pos_has() so filtering stays inside one query.
+
+# Substrings that mark an entry as grammar in the analysis report
+GRAMMAR_TYPES = [
+    '成句',
+    '連語',
+    '接',
+    '助詞', '副助', '接助', '終助',
+    '助動詞', '補動',
+    '接頭', '接尾', '造',
+    '形動トタル'
+]
+
+# Report categories; the first one with a matching keyword wins
+GRAMMAR_CATEGORIES = {
+    'Prefix/Suffix': ['接頭', '接尾', '造'],
+    'Conjunction': ['接', '接助', '順接'],
+    'Particle': ['助詞', '副助', '終助'],
+    'Compound/Phrase': ['連語', '成句'],
+    'Auxiliary Verb': ['助動詞', '補動'],
+    'Adjectival Verb': ['形動トタル'],
+}
+OTHER_CATEGORY = 'Other'
+
+# Entries moved from words into grammars by migrate_grammar (based on calibration)
+MIGRATION_KEYWORDS = [
+    '接続詞', '助動詞', '助詞', '連語', '成句', '文法',
+    '接頭', '接尾', '接辞', '造'
+]
+
+DEFAULT_CACHE_SIZE = 65536
+
+class KeywordMatcher:
+    """
+    Aho-Corasick matcher over ordered keyword groups. match_mask() returns a
+    bitmask with bit i set when any keyword of group i occurs in the text.
+    """
+
+    def __init__(self, groups, cache_size=DEFAULT_CACHE_SIZE):
+        self.labels = list(groups)
+        # Node 0 is the root; goto[n] maps a character to the next node
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [0]
+        for bit, label in enumerate(self.labels):
+            for keyword in groups[label]:
+                self._add(keyword, 1 << bit)
+        self._link()
+        self.match_mask = lru_cache(maxsize=cache_size)(self._match_mask)
+
+    def _add(self, keyword, mask):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(0)
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node] |= mask
+
+    def _link(self):
+        # Breadth-first, so a node's failure target is final before its children use it
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] |= self._out[self._fail[child]]
+                queue.append(child)
+
+    def _match_mask(self, text):
+        if not text:
+            return 0
+        goto, fail, out = self._goto, self._fail, self._out
+        node = mask = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            mask |= out[node]
+        return mask
+
+    def contains_any(self, text):
+        return self.match_mask(text) != 0
+
+    def first_label(self, text, default=None):
+        """Label of the first group (in definition order) that matches text."""
+        mask = self.match_mask(text)
+        if not mask:
+            return default
+        return self.labels[(mask & -mask).bit_length() - 1]
+
+def keyword_set(keywords, cache_size=DEFAULT_CACHE_SIZE):
+    """Matcher for a single flat keyword list."""
+    return KeywordMatcher({'match': list(keywords)}, cache_size=cache_size)
+
+grammar_matcher = keyword_set(GRAMMAR_TYPES)
+category_matcher = KeywordMatcher(GRAMMAR_CATEGORIES)
+migration_matcher = keyword_set(MIGRATION_KEYWORDS)
+
+# Named sets available to pos_has() in SQL
+KEYWORD_SETS = {
+    'grammar': grammar_matcher,
+    'migrate_grammar': migration_matcher,
+}
+
+def is_grammar(part_of_speech):
+    return grammar_matcher.contains_any(part_of_speech)
+
+def pos_category(part_of_speech):
+    """Report category of a grammar POS string ('Other' if none fits), or None for ordinary words."""
+    if not is_grammar(part_of_speech):
+        return None
+    return category_matcher.first_label(part_of_speech, OTHER_CATEGORY)
+
+def register_pos_functions(conn, extra_sets=None):
+    """
+    Register pos_category(pos) and pos_has(pos, set_name) on a connection.
+    extra_sets maps additional set names to matchers (see keyword_set()).
+    """
+    sets = dict(KEYWORD_SETS)
+    if extra_sets:
+        sets.update(extra_sets)
+
+    def pos_has(part_of_speech, set_name):
+        return 1 if sets[set_name].contains_any(part_of_speech) else 0
+
+    conn.create_function('pos_category', 1, pos_category, deterministic=True)
+    conn.create_function('pos_has', 2, pos_has, deterministic=True)
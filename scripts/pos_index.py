@@ -0,0 +1,228 @@
+import sqlite3
+import os
+import sys
+import mmap
+import time
+import array
+import struct
+import argparse
+
+# Compact JMdict POS index for calibrate_pos.
+#
+# Maps a surface form (kanji or kana spelling) to the POS tags of the senses
+# jam.lookup() would return for it, keeping only the tags calibrate_pos acts on.
+# Each sense is stored as a bitmask of POS_CODES, in lookup order. Senses
+# without any of them stay in place, because calibrate_pos stops at the first
+# sense once a 〜 has already decided the type. Only the zero masks after a
+# surface's last tagged sense are dropped, since the result never depends on
+# them; surfaces left with no senses are not stored.
+#
+# File layout (native byte order):
+#   header       MAGIC, version, entry count
+#   key_offsets  uint32[count + 1] into the key blob
+#   sense_offsets uint32[count + 1] into the sense array
+#   keys         utf-8 surface forms, sorted bytewise
+#   senses       uint16 bitmasks
+#
+# The file is mmap'd and binary searched, so opening it costs nothing and
+# lookups never build Python objects for the whole dictionary.
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'jmdict_pos.idx')
+
+MAGIC = b'BJPI'
+# 2: tags are matched literally, as in live Jamdict lookups (version 1 mapped
+# expanded entity text to codes)
+# 3: senses without a POS_CODES tag are kept in order
+VERSION = 3
+HEADER = struct.Struct('=4sII')
+
+# POS codes calibrate_pos reacts to, one bit each. Tags are compared as the
+# literal strings jamdict returns, exactly like calibrate_pos's live lookup,
+# so --pos-index proposes the same changes as a live run.
+POS_CODES = ('exp', 'int', 'prt', 'aux', 'aux-v', 'aux-adj', 'conj', 'pref', 'suf')
+POS_BITS = {code: 1 << i for i, code in enumerate(POS_CODES)}
+
+# jam.lookup() only reads the first few entries in calibrate_pos
+MAX_ENTRIES = 2
+
+def pos_mask(tags):
+    mask = 0
+    for tag in tags:
+        mask |= POS_BITS.get(str(tag), 0)
+    return mask
+
+_MASK_CODES = {}
+
+def mask_codes(mask):
+    """Return the frozenset of POS codes in a sense bitmask."""
+    codes = _MASK_CODES.get(mask)
+    if codes is None:
+        codes = frozenset(code for code, bit in POS_BITS.items() if mask & bit)
+        _MASK_CODES[mask] = codes
+    return codes
+
+def iter_jmdict_senses(jmdict_conn):
+    """
+    Yield (surface, [sense mask, ...]) for every surface form in a jamdict
+    database, mirroring an exact (non-wildcard) jam.lookup(): entries matched by
+    kanji, kana or gloss text in Entry order, first MAX_ENTRIES entries,
+    senses and tags in insertion order.
+    """
+    cursor = jmdict_conn.cursor()
+
+    print("Reading senses...")
+    sense_masks = {}  # idseq -> [mask, ...]
+    cursor.execute("""
+        SELECT s.idseq, s.ID, p.text
+        FROM Sense s LEFT JOIN pos p ON p.sid = s.ID
+        ORDER BY s.idseq, s.ID, p.rowid
+    """)
+    last_sid = None
+    for idseq, sid, text in cursor:
+        masks = sense_masks.setdefault(idseq, [])
+        if sid != last_sid:
+            masks.append(0)
+            last_sid = sid
+        if text is not None:
+            masks[-1] |= POS_BITS.get(text, 0)
+
+    print("Reading surface forms...")
+    entry_order = {}
+    cursor.execute("SELECT rowid, idseq FROM Entry")
+    for rowid, idseq in cursor:
+        entry_order[idseq] = rowid
+
+    surfaces = {}  # surface -> set of idseq
+    cursor.execute("""
+        SELECT text, idseq FROM Kanji
+        UNION SELECT text, idseq FROM Kana
+        UNION SELECT g.text, s.idseq FROM Sense s JOIN SenseGloss g ON g.sid = s.ID
+    """)
+    for text, idseq in cursor:
+        if text:
+            surfaces.setdefault(text, set()).add(idseq)
+
+    for surface, idseqs in surfaces.items():
+        ordered = sorted(idseqs, key=lambda i: entry_order.get(i, 0))[:MAX_ENTRIES]
+        masks = [m for idseq in ordered for m in sense_masks.get(idseq, ())]
+        while masks and not masks[-1]:
+            masks.pop()
+        if masks:
+            yield surface, masks
+
+def build_index(jmdict_db, out_path):
+    """Build the index file from a jamdict SQLite database. Returns the entry count."""
+    conn = sqlite3.connect(f"file:{jmdict_db}?mode=ro", uri=True)
+    try:
+        items = sorted((surface.encode('utf-8'), masks) for surface, masks in iter_jmdict_senses(conn))
+    finally:
+        conn.close()
+
+    key_offsets = array.array('I', [0])
+    sense_offsets = array.array('I', [0])
+    keys = bytearray()
+    senses = array.array('H')
+    for key, masks in items:
+        keys += key
+        senses.extend(masks)
+        key_offsets.append(len(keys))
+        sense_offsets.append(len(senses))
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(items)))
+        key_offsets.tofile(f)
+        sense_offsets.tofile(f)
+        f.write(keys)
+        senses.tofile(f)
+    os.replace(tmp_path, out_path)
+    return len(items)
+
+class PosIndex:
+    """Read-only view of an index file built by build_index()."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Not a POS index (or wrong version): {path}")
+
+        view = memoryview(self._mm)
+        pos = HEADER.size
+        width = (count + 1) * 4
+        self._key_offsets = view[pos:pos + width].cast('I')
+        pos += width
+        self._sense_offsets = view[pos:pos + width].cast('I')
+        pos += width
+        self._keys_start = pos
+        pos += self._key_offsets[count]
+        self._senses = view[pos:pos + self._sense_offsets[count] * 2].cast('H')
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, key):
+        offsets = self._key_offsets
+        start = self._keys_start
+        mm = self._mm
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = mm[start + offsets[mid]:start + offsets[mid + 1]]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def lookup(self, surface):
+        """Return the sense bitmasks for a surface form (empty tuple if unknown)."""
+        i = self._find(surface.encode('utf-8'))
+        if i < 0:
+            return ()
+        return tuple(self._senses[self._sense_offsets[i]:self._sense_offsets[i + 1]])
+
+    def senses(self, surface):
+        """Return the POS codes of each sense as a list of frozensets."""
+        return [mask_codes(mask) for mask in self.lookup(surface)]
+
+    def close(self):
+        self._key_offsets.release()
+        self._sense_offsets.release()
+        self._senses.release()
+        self._mm.close()
+
+def default_jmdict_db():
+    from jamdict import Jamdict
+    return Jamdict().db_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the compact JMdict POS index used by calibrate_pos --pos-index')
+    parser.add_argument('--jmdict-db', help='Path to the jamdict SQLite database (default: the one Jamdict() uses)')
+    parser.add_argument('--out', default=DEFAULT_INDEX_PATH, help='Index file to write')
+    parser.add_argument('--lookup', nargs='+', metavar='WORD', help='Print index entries for WORD(s) instead of building')
+    args = parser.parse_args()
+
+    if args.lookup:
+        index = PosIndex(args.out)
+        for word in args.lookup:
+            print(f"{word}: {[sorted(codes) for codes in index.senses(word)]}")
+        index.close()
+        sys.exit(0)
+
+    jmdict_db = args.jmdict_db or default_jmdict_db()
+    if not jmdict_db or not os.path.exists(jmdict_db):
+        print(f"jamdict database not found at {jmdict_db}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    count = build_index(jmdict_db, args.out)
+    size = os.path.getsize(args.out)
+    print(f"Indexed {count} surface forms into {args.out} ({size / 1024:.0f} KiB) in {time.perf_counter() - start:.1f}s.")
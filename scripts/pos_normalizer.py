@@ -0,0 +1,84 @@
+import sqlite3
+import os
+import argparse
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+# Character normalization of words.part_of_speech in either direction.
+#
+# Each direction is a precompiled str.translate table, exposed to SQLite as
+# norm(), so a whole normalization is one UPDATE statement with no per-row
+# round trips through Python.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+# Japanese -> Simplified Chinese (normalize_pos_sc.py)
+JA_TO_SC = {
+    '動': '动',
+    '連': '连',
+    '詞': '词',
+    '補': '补',
+    '終': '终'
+}
+
+# Simplified Chinese -> Japanese (normalize_pos.py)
+SC_TO_JA = {
+    '动': '動',
+}
+
+TABLES = {
+    'sc': str.maketrans(JA_TO_SC),
+    'ja': str.maketrans(SC_TO_JA),
+}
+
+def normalize(pos, direction):
+    return pos.translate(TABLES[direction]) if pos else pos
+
+def register_norm(conn, direction):
+    """Register norm(text) on conn, translating towards direction ('sc' or 'ja')."""
+    table = TABLES[direction]
+
+    def norm(pos):
+        return pos.translate(table) if pos else pos
+
+    conn.create_function('norm', 1, norm, deterministic=True)
+
+def count_pending(cursor, direction):
+    register_norm(cursor.connection, direction)
+    cursor.execute("SELECT COUNT(*) FROM words WHERE part_of_speech != norm(part_of_speech)")
+    return cursor.fetchone()[0]
+
+def normalize_words(cursor, direction):
+    """Normalize every part_of_speech in one UPDATE without committing. Returns the changed-row count."""
+    register_norm(cursor.connection, direction)
+    cursor.execute("UPDATE words SET part_of_speech = norm(part_of_speech) WHERE part_of_speech != norm(part_of_speech)")
+    return cursor.rowcount
+
+def run(direction, db_path=DB_PATH, dry_run=False, metrics=None):
+    metrics = metrics if metrics is not None else Metrics(f'normalize_pos_{direction}')
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        if dry_run:
+            with metrics.phase('count'):
+                count = count_pending(cursor, direction)
+            print(f"[Dry Run] {count} entries would be normalized.")
+            return 0
+        with metrics.phase('normalize'):
+            count = normalize_words(cursor, direction)
+        with metrics.phase('commit'):
+            conn.commit()
+        metrics.count('rows_changed', count)
+        print(f"Normalized {count} entries.")
+        return count
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Normalize part_of_speech characters')
+    parser.add_argument('--to', choices=sorted(TABLES), required=True, help="Target script: 'sc' (Simplified Chinese) or 'ja' (Japanese)")
+    parser.add_argument('--dry-run', action='store_true', help='Count affected rows without modifying DB')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics = metrics_from_args(f'normalize_pos_{args.to}', args)
+    run(args.to, dry_run=args.dry_run, metrics=metrics)
+    emit(metrics, args)
@@ -0,0 +1,243 @@
+import sqlite3
+import os
+import time
+import random
+import argparse
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+# Full-text search index for the vocabulary book and word search.
+#
+# The app filters with `word LIKE '%q%' OR furigana LIKE ... OR meaning_cn
+# LIKE ...` over words joined with word_meanings, a full scan per keystroke.
+# words_fts is an FTS5 table with the trigram tokenizer (substring matching
+# that works for CJK without word segmentation), one row per word with
+# rowid = words.id and all meanings concatenated. Triggers on words and
+# word_meanings keep it in step with edits made by the other scripts.
+#
+# Trigram phrases only exist for queries of 3+ characters. Shorter queries
+# scan: the FTS table with LIKE when meanings are searched, which still
+# avoids the join, and the narrower words table otherwise.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+FTS_TABLE = 'words_fts'
+
+# Searchable columns, in FTS column order
+COLUMNS = ('word', 'furigana', 'romaji', 'meanings')
+
+# The columns WordReadQueries.searchWords looks at
+WORD_COLUMNS = ('word', 'furigana', 'romaji')
+
+# Between meanings, so a phrase never matches across two of them
+MEANING_SEPARATOR = '\n'
+
+MIN_INDEXED_LENGTH = 3
+
+DEFAULT_SAMPLES = 200
+
+# Concatenated meanings of one word, in definition order
+MEANINGS_SQL = f'''
+    (SELECT group_concat(meaning_cn, char({ord(MEANING_SEPARATOR)})) FROM (
+        SELECT meaning_cn FROM word_meanings WHERE word_id = {{word_id}} ORDER BY definition_order, id
+    ))
+'''
+
+def meanings_of(word_id):
+    return MEANINGS_SQL.format(word_id=word_id)
+
+TRIGGERS = {
+    'words_fts_ai': f'''
+        CREATE TRIGGER words_fts_ai AFTER INSERT ON words BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, word, furigana, romaji, meanings)
+            VALUES (new.id, new.word, new.furigana, new.romaji, {meanings_of('new.id')});
+        END
+    ''',
+    'words_fts_ad': f'''
+        CREATE TRIGGER words_fts_ad AFTER DELETE ON words BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    ''',
+    'words_fts_au': f'''
+        CREATE TRIGGER words_fts_au AFTER UPDATE OF id, word, furigana, romaji ON words BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE} (rowid, word, furigana, romaji, meanings)
+            VALUES (new.id, new.word, new.furigana, new.romaji, {meanings_of('new.id')});
+        END
+    ''',
+    'word_meanings_fts_ai': f'''
+        CREATE TRIGGER word_meanings_fts_ai AFTER INSERT ON word_meanings BEGIN
+            UPDATE {FTS_TABLE} SET meanings = {meanings_of('new.word_id')} WHERE rowid = new.word_id;
+        END
+    ''',
+    'word_meanings_fts_ad': f'''
+        CREATE TRIGGER word_meanings_fts_ad AFTER DELETE ON word_meanings BEGIN
+            UPDATE {FTS_TABLE} SET meanings = {meanings_of('old.word_id')} WHERE rowid = old.word_id;
+        END
+    ''',
+    'word_meanings_fts_au': f'''
+        CREATE TRIGGER word_meanings_fts_au AFTER UPDATE OF word_id, meaning_cn, definition_order ON word_meanings BEGIN
+            UPDATE {FTS_TABLE} SET meanings = {meanings_of('old.word_id')} WHERE rowid = old.word_id;
+            UPDATE {FTS_TABLE} SET meanings = {meanings_of('new.word_id')} WHERE rowid = new.word_id;
+        END
+    ''',
+}
+
+def drop_search_index(cursor):
+    for name in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+def build_search_index(cursor, metrics=None):
+    """(Re)build the FTS table and its sync triggers without committing. Returns the row count."""
+    metrics = metrics if metrics is not None else Metrics('search_index')
+    with metrics.phase('create'):
+        drop_search_index(cursor)
+        cursor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(COLUMNS)}, tokenize='trigram')")
+    with metrics.phase('populate'):
+        # One grouped pass over word_meanings instead of a subquery per word
+        cursor.execute(f'''
+            INSERT INTO {FTS_TABLE} (rowid, word, furigana, romaji, meanings)
+            SELECT w.id, w.word, w.furigana, w.romaji, m.meanings
+            FROM words w
+            LEFT JOIN (
+                SELECT word_id, group_concat(meaning_cn, char({ord(MEANING_SEPARATOR)})) AS meanings
+                FROM (SELECT word_id, meaning_cn FROM word_meanings ORDER BY word_id, definition_order, id)
+                GROUP BY word_id
+            ) m ON m.word_id = w.id
+        ''')
+        count = cursor.rowcount
+    with metrics.phase('optimize'):
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    with metrics.phase('triggers'):
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    metrics.count('words_indexed', count)
+    return count
+
+def search_ids(conn, query, columns=COLUMNS):
+    """
+    Ids of the words whose columns contain query as a substring
+    (case-insensitively), in id order. Unlike the app's LIKE patterns, % and
+    _ in the query are matched literally.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if len(query) >= MIN_INDEXED_LENGTH:
+        phrase = '"' + query.replace('"', '""') + '"'
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY rowid"
+        params = ('{' + ' '.join(columns) + '} : ' + phrase,)
+    elif 'meanings' not in columns:
+        return like_ids(conn, query, columns)
+    else:
+        # The unary + keeps the LIKE out of FTS5, whose trigram index cannot
+        # answer patterns this short
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        where = ' OR '.join(f"+{column} LIKE ?1 ESCAPE '\\'" for column in columns)
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {where} ORDER BY rowid"
+        params = (f'%{escaped}%',)
+    return [row[0] for row in conn.execute(sql, params)]
+
+def like_ids(conn, query, columns=COLUMNS):
+    """The same search done the app's way, with LIKE over words and word_meanings."""
+    query = query.strip()
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    clauses = [f"w.{column} LIKE ?1 ESCAPE '\\'" for column in columns if column != 'meanings']
+    if 'meanings' in columns:
+        clauses.append("EXISTS (SELECT 1 FROM word_meanings wm WHERE wm.word_id = w.id AND wm.meaning_cn LIKE ?1 ESCAPE '\\')")
+    sql = f"SELECT w.id FROM words w WHERE {' OR '.join(clauses)} ORDER BY w.id"
+    return [row[0] for row in conn.execute(sql, (f'%{escaped}%',))]
+
+def sample_queries(conn, count, seed=0):
+    """Substrings (1-4 characters) of random words, readings, romaji and meanings."""
+    rng = random.Random(seed)
+    texts = [row[0] for row in conn.execute('''
+        SELECT word FROM words UNION ALL SELECT furigana FROM words
+        UNION ALL SELECT romaji FROM words UNION ALL SELECT meaning_cn FROM word_meanings
+    ''') if row[0] and row[0].strip()]
+    queries = []
+    while texts and len(queries) < count:
+        text = rng.choice(texts).strip()
+        length = min(rng.randint(1, 4), len(text))
+        start = rng.randint(0, len(text) - length)
+        query = text[start:start + length].strip()
+        if query and MEANING_SEPARATOR not in query:
+            queries.append(query)
+    return queries
+
+def verify(conn, queries, columns=COLUMNS):
+    """
+    Compare FTS results against LIKE for every query. Returns
+    (mismatches, fts seconds, like seconds), where mismatches lists
+    (query, ids only in FTS, ids only in LIKE).
+    """
+    mismatches = []
+    fts_seconds = like_seconds = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        fts = search_ids(conn, query, columns)
+        fts_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        like = like_ids(conn, query, columns)
+        like_seconds += time.perf_counter() - start
+        if fts != like:
+            mismatches.append((query, sorted(set(fts) - set(like)), sorted(set(like) - set(fts))))
+    return mismatches, fts_seconds, like_seconds
+
+def index_exists(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).fetchone() is not None
+
+def run_verify(conn, samples, seed, metrics):
+    queries = sample_queries(conn, samples, seed)
+    for label, columns in (('all columns', COLUMNS), ('word columns', WORD_COLUMNS)):
+        with metrics.phase(f'verify {label}'):
+            mismatches, fts_seconds, like_seconds = verify(conn, queries, columns)
+        metrics.count('queries_checked', len(queries))
+        metrics.count('mismatches', len(mismatches))
+        speedup = like_seconds / fts_seconds if fts_seconds else 0.0
+        print(f"{label}: {len(queries) - len(mismatches)}/{len(queries)} queries match LIKE; "
+              f"FTS {fts_seconds * 1000:.1f} ms vs LIKE {like_seconds * 1000:.1f} ms ({speedup:.1f}x)")
+        for query, only_fts, only_like in mismatches[:10]:
+            print(f"  {query!r}: only FTS {only_fts[:5]}, only LIKE {only_like[:5]}")
+    return metrics.counters['mismatches']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build, query or verify the FTS5 word search index')
+    parser.add_argument('--verify', action='store_true', help='Check FTS results against LIKE on sampled queries')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='Queries sampled by --verify')
+    parser.add_argument('--seed', type=int, default=0, help='Sampling seed for --verify')
+    parser.add_argument('--query', metavar='TEXT', help='Search the index and print the matching words')
+    parser.add_argument('--drop', action='store_true', help='Remove the index and its triggers')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.samples < 1:
+        parser.error('--samples must be positive')
+
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+    else:
+        metrics = metrics_from_args('search_index', args)
+        conn = sqlite3.connect(DB_PATH)
+        if args.drop:
+            drop_search_index(conn.cursor())
+            conn.commit()
+            print(f"Dropped {FTS_TABLE} and its triggers.")
+        elif (args.verify or args.query) and not index_exists(conn):
+            print(f"No {FTS_TABLE} yet; build it first with scripts/search_index.py")
+        elif args.query:
+            ids = search_ids(conn, args.query)
+            print(f"{args.query}: {len(ids)} match(es)")
+            for wid in ids[:20]:
+                word, furigana = conn.execute("SELECT word, furigana FROM words WHERE id = ?", (wid,)).fetchone()
+                print(f" - [{wid}] {word} ({furigana})")
+        elif args.verify:
+            if run_verify(conn, args.samples, args.seed, metrics):
+                print("FTS and LIKE disagree on some queries (see above).")
+        else:
+            count = build_search_index(conn.cursor(), metrics)
+            with metrics.phase('commit'):
+                conn.commit()
+            print(f"Indexed {count} words into {FTS_TABLE}.")
+        conn.close()
+        emit(metrics, args)
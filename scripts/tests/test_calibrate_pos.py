@@ -0,0 +1,28 @@
+import os
+import sys
+import sqlite3
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calibrate_pos
+
+class ApplyPlanBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE words (id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT NOT NULL, part_of_speech TEXT)")
+        self.conn.executemany("INSERT INTO words (id, word, part_of_speech) VALUES (?, ?, ?)",
+                              [(i, f'w{i}', '名') for i in range(1, 3001)])
+        # The lowest limit SQLite builds ship with
+        self.conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    def test_batch_larger_than_parameter_limit(self):
+        batch = [(i, f'w{i}', '名', '名・助詞', '1/jamdict') for i in range(1, 3001)]
+        batch[0] = (1, 'w1', '動1', '名・助詞', '1/jamdict')  # stale: the row no longer holds old_pos
+        applied, stale = calibrate_pos.apply_plan_batch(self.conn.cursor(), 'run', batch)
+        self.assertEqual((applied, stale), (2999, 1))
+        changed = self.conn.execute("SELECT count(*) FROM words WHERE part_of_speech = '名・助詞'").fetchone()[0]
+        self.assertEqual(changed, 2999)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import sqlite3
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_conjugations as gc
+from metrics import Metrics
+
+SCHEMA = '''
+    CREATE TABLE words (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        word           TEXT NOT NULL,
+        furigana       TEXT,
+        romaji         TEXT,
+        jlpt_level     TEXT,
+        part_of_speech TEXT,
+        pitch_accent   TEXT
+    );
+    CREATE TABLE conjugation_types (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        code        TEXT UNIQUE,
+        name_ja     TEXT,
+        name_cn     TEXT,
+        sort_order  INTEGER,
+        description TEXT
+    );
+    CREATE TABLE word_conjugations (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        word_id         INTEGER NOT NULL,
+        type_id         INTEGER NOT NULL,
+        conjugated_word TEXT NOT NULL,
+        furigana        TEXT,
+        accent_pattern  TEXT,
+        UNIQUE(word_id, type_id)
+    );
+'''
+
+class IncrementalTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript(SCHEMA)
+        self.conn.executemany("INSERT INTO words (id, word, furigana, part_of_speech) VALUES (?, ?, ?, ?)", [
+            (1, '書く', 'かく', '动1'),
+            (2, '食べる', 'たべる', '動2'),
+        ])
+        self.run_incremental()
+
+    def run_incremental(self):
+        words = self.conn.execute("SELECT id, word, part_of_speech, furigana FROM words ORDER BY id").fetchall()
+        metrics = Metrics('test')
+        result = gc.generate_incremental(self.conn, [words], metrics)
+        self.conn.commit()
+        return result, metrics.counters
+
+    def forms_of(self, word_id):
+        return self.conn.execute("SELECT count(*) FROM word_conjugations WHERE word_id = ?", (word_id,)).fetchone()[0]
+
+    def test_rerun_changes_nothing(self):
+        (inserted, updated, deleted), _ = self.run_incremental()
+        self.assertEqual((inserted, updated, deleted), (0, 0, 0))
+        self.assertEqual(self.forms_of(1), len(gc.FORM_CODES))
+        self.assertEqual(self.forms_of(2), len(gc.FORM_CODES))
+
+    def test_pos_change_to_noun_deletes_forms(self):
+        self.conn.execute("UPDATE words SET part_of_speech = '名' WHERE id = 1")
+        (inserted, updated, deleted), _ = self.run_incremental()
+        self.assertEqual((inserted, updated, deleted), (0, 0, len(gc.FORM_CODES)))
+        self.assertEqual(self.forms_of(1), 0)
+        self.assertEqual(self.forms_of(2), len(gc.FORM_CODES))
+
+    def test_unclassified_candidate_keeps_forms(self):
+        self.conn.execute("UPDATE words SET part_of_speech = '动' WHERE id = 1")
+        (_, _, deleted), counters = self.run_incremental()
+        self.assertEqual(deleted, 0)
+        self.assertEqual(counters['conjugations_kept'], len(gc.FORM_CODES))
+        self.assertEqual(self.forms_of(1), len(gc.FORM_CODES))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calibrate_pos
+import pos_index
+
+# The jamdict tables iter_jmdict_senses reads
+SCHEMA = '''
+    CREATE TABLE Entry (idseq INTEGER NOT NULL UNIQUE);
+    CREATE TABLE Sense (ID INTEGER PRIMARY KEY, idseq INTEGER);
+    CREATE TABLE pos (sid INTEGER, text TEXT);
+    CREATE TABLE Kanji (ID INTEGER PRIMARY KEY, idseq INTEGER, text TEXT);
+    CREATE TABLE Kana (ID INTEGER PRIMARY KEY, idseq INTEGER, text TEXT, nokanji BOOLEAN);
+    CREATE TABLE SenseGloss (sid INTEGER, lang TEXT, gend TEXT, text TEXT);
+'''
+
+# surface -> POS tags of each sense, as a live jam.lookup() would return them
+SENSES = {
+    '〜かた': [['n'], ['prt']],
+    'ところ': [['n'], ['suf'], ['n']],
+    'ほん': [['n'], ['n']],
+}
+
+class PosIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        jmdict_db = os.path.join(cls.tmp.name, 'jamdict.db')
+        conn = sqlite3.connect(jmdict_db)
+        conn.executescript(SCHEMA)
+        sid = 0
+        for idseq, (surface, senses) in enumerate(SENSES.items(), 1):
+            conn.execute("INSERT INTO Entry (idseq) VALUES (?)", (idseq,))
+            conn.execute("INSERT INTO Kana (idseq, text) VALUES (?, ?)", (idseq, surface))
+            for tags in senses:
+                sid += 1
+                conn.execute("INSERT INTO Sense (ID, idseq) VALUES (?, ?)", (sid, idseq))
+                conn.executemany("INSERT INTO pos (sid, text) VALUES (?, ?)", [(sid, tag) for tag in tags])
+        conn.commit()
+        conn.close()
+
+        cls.index_path = os.path.join(cls.tmp.name, 'jmdict_pos.idx')
+        pos_index.build_index(jmdict_db, cls.index_path)
+        cls.index = pos_index.PosIndex(cls.index_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.index.close()
+        cls.tmp.cleanup()
+
+    def live_senses(self, word):
+        return [set(tags) for tags in SENSES.get(word, [])]
+
+    def test_untagged_senses_keep_their_place(self):
+        self.assertEqual(self.index.senses('〜かた'), [frozenset(), frozenset({'prt'})])
+        self.assertEqual(self.index.senses('ところ'), [frozenset(), frozenset({'suf'})])
+        self.assertEqual(self.index.senses('ほん'), [])
+
+    def test_proposals_match_live_lookup(self):
+        for word in SENSES:
+            live = calibrate_pos.analyze_row([], self.live_senses, 1, word, '名')
+            indexed = calibrate_pos.analyze_row([], self.index.senses, 1, word, '名')
+            self.assertEqual(indexed, live, word)
+
+if __name__ == '__main__':
+    unittest.main()
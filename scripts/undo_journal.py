@@ -0,0 +1,84 @@
+import os
+import time
+
+# Row-level undo journal for the scripts that edit breeze_jp.sqlite in place.
+#
+# Every changed cell is recorded as (table, row id, column, old value, new
+# value) under a run id, in the same transaction as the edit itself. Rolling a
+# run back replays only those cells in reverse, so its cost follows the size of
+# the change rather than the size of the database.
+
+def new_run_id():
+    # The random suffix keeps two runs started in the same second apart
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+
+def ensure_journal_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS undo_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            column_name TEXT NOT NULL,
+            old_value,
+            new_value,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_undo_journal_run ON undo_journal (run_id, id)")
+
+def record_changes(cursor, run_id, table, column, changes):
+    """
+    Journal (row_id, old_value, new_value) changes to table.column.
+    Call inside the transaction that applies them.
+    """
+    ensure_journal_table(cursor)
+    now = int(time.time())
+    cursor.executemany(
+        "INSERT INTO undo_journal (run_id, table_name, row_id, column_name, old_value, new_value, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((run_id, table, row_id, column, old, new, now) for row_id, old, new in changes),
+    )
+
+def latest_run_id(cursor):
+    ensure_journal_table(cursor)
+    cursor.execute("SELECT run_id FROM undo_journal ORDER BY id DESC LIMIT 1")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def rollback_run(conn, run_id, on_restored=None):
+    """
+    Restore the cells changed by run_id in reverse order and drop its journal.
+    A cell that no longer holds the run's new value was edited since, so it is
+    left alone and counted as a conflict. on_restored(cursor, [(table, row_id,
+    column), ...]) runs in the same transaction, for callers that keep state
+    derived from the restored cells. Returns (restored, conflicts).
+    """
+    cursor = conn.cursor()
+    ensure_journal_table(cursor)
+    cursor.execute(
+        "SELECT table_name, row_id, column_name, old_value, new_value FROM undo_journal WHERE run_id = ? ORDER BY id DESC",
+        (run_id,),
+    )
+    entries = cursor.fetchall()
+
+    restored = []
+    conflicts = 0
+    for table, row_id, column, old, new in entries:
+        table_sql, column_sql = quote_identifier(table), quote_identifier(column)
+        cursor.execute(
+            f"UPDATE {table_sql} SET {column_sql} = ? WHERE id = ? AND {column_sql} IS ?",
+            (old, row_id, new),
+        )
+        if cursor.rowcount:
+            restored.append((table, row_id, column))
+        else:
+            conflicts += 1
+
+    if on_restored:
+        on_restored(cursor, restored)
+    cursor.execute("DELETE FROM undo_journal WHERE run_id = ?", (run_id,))
+    conn.commit()
+    return len(restored), conflicts
@@ -0,0 +1,369 @@
+import sqlite3
+import os
+import sys
+import json
+import zlib
+import time
+import random
+import hashlib
+import argparse
+import collections
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+# Precomputed word detail payloads.
+#
+# WordReadQueries.getWordDetail assembles a card from six queries: the word,
+# its meanings, audio, example sentences, the audio of those examples and the
+# conjugations joined with their type names. word_details holds that whole
+# result as one row per word_id, so the app can open a card with a single
+# primary-key read.
+#
+# Payload keys are the column names the Dart models' fromMap constructors
+# read, grouped like WordDetail:
+#   {"word": {...}, "meanings": [...], "audios": [...],
+#    "examples": [{"sentence": {...}, "audio": {...} | null}, ...],
+#    "conjugations": [{...word_conjugations, name_ja, name_cn, sort_order}, ...]}
+#
+# The payload is stored zlib-compressed (dart:io's zlib.decode reads it): the
+# JSON repeats every column name per row and compresses about 3.5x.
+#
+# source_hash is the SHA-1 of one word's source rows (plus PAYLOAD_VERSION).
+# Rebuilds read each table in one ordered pass, hash every word's rows and
+# only build, compress and write the payloads of words whose hash changed;
+# the checker re-runs the app's per-word queries and compares.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+DETAIL_TABLE = 'word_details'
+
+# Words the checker also rebuilds with the app's per-word queries
+DEFAULT_SAMPLES = 500
+
+COMPRESSION_LEVEL = 9
+
+# Part of every source hash: bump when the payload layout changes, so the
+# next rebuild rewrites every row
+PAYLOAD_VERSION = 1
+
+CREATE_DETAILS_SQL = f'''
+    CREATE TABLE IF NOT EXISTS {DETAIL_TABLE} (
+        word_id     INTEGER PRIMARY KEY REFERENCES words(id) ON DELETE CASCADE,
+        payload     BLOB NOT NULL,
+        source_hash TEXT NOT NULL
+    )
+'''
+
+# The app leaves ties (and audio/example order) to SQLite; both the builder
+# and the checker break them by id so the payload is deterministic.
+BULK_QUERIES = {
+    'words': "SELECT * FROM words ORDER BY id",
+    'meanings': "SELECT * FROM word_meanings ORDER BY word_id, definition_order, id",
+    'audios': "SELECT * FROM word_audio ORDER BY word_id, id",
+    'examples': "SELECT * FROM example_sentences ORDER BY word_id, id",
+    'example_audio': "SELECT * FROM example_audio ORDER BY example_id, id",
+    'conjugations': '''
+        SELECT wc.*, ct.name_ja, ct.name_cn, ct.sort_order
+        FROM word_conjugations wc
+        JOIN conjugation_types ct ON wc.type_id = ct.id
+        ORDER BY wc.word_id, ct.sort_order, wc.id
+    ''',
+}
+
+# What getWordDetail runs for one word, with the same tie-breaks
+WORD_QUERIES = {
+    'word': "SELECT * FROM words WHERE id = ?",
+    'meanings': "SELECT * FROM word_meanings WHERE word_id = ? ORDER BY definition_order, id",
+    'audios': "SELECT * FROM word_audio WHERE word_id = ? ORDER BY id",
+    'examples': "SELECT * FROM example_sentences WHERE word_id = ? ORDER BY id",
+    'example_audio': "SELECT * FROM example_audio WHERE example_id IN ({placeholders}) ORDER BY example_id, id",
+    'conjugations': '''
+        SELECT wc.*, ct.name_ja, ct.name_cn, ct.sort_order
+        FROM word_conjugations wc
+        JOIN conjugation_types ct ON wc.type_id = ct.id
+        WHERE wc.word_id = ?
+        ORDER BY ct.sort_order, wc.id
+    ''',
+}
+
+def rows_as_dicts(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def make_payload(word, meanings, audios, examples, example_audio, conjugations):
+    """
+    The detail dict of one word. example_audio maps example id -> audio row;
+    like the app's audioByExampleId, the last row per example wins.
+    """
+    return {
+        'word': word,
+        'meanings': meanings,
+        'audios': audios,
+        'examples': [{'sentence': sentence, 'audio': example_audio.get(sentence['id'])} for sentence in examples],
+        'conjugations': conjugations,
+    }
+
+def encode(payload):
+    """The compressed JSON blob of a payload."""
+    text = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(text, COMPRESSION_LEVEL)
+
+def decode(blob):
+    """The payload dict of a stored blob."""
+    return json.loads(zlib.decompress(blob))
+
+class SourceRows:
+    """
+    Every source row of the payloads, read with one ordered query per table
+    and kept as plain tuples grouped by word, so hashing a word does not
+    build any dicts.
+    """
+
+    def __init__(self, cursor):
+        self.columns = {}
+        tables = {}
+        for name, sql in BULK_QUERIES.items():
+            cursor.execute(sql)
+            self.columns[name] = [d[0] for d in cursor.description]
+            tables[name] = cursor.fetchall()
+        self.words = tables['words']
+        self.by_word = {}
+        for name in ('meanings', 'audios', 'examples', 'conjugations'):
+            key = self.columns[name].index('word_id')
+            groups = self.by_word[name] = collections.defaultdict(list)
+            for row in tables[name]:
+                groups[row[key]].append(row)
+        key = self.columns['example_audio'].index('example_id')
+        # Rows are in id order, so the last audio of an example wins
+        self.example_audio = {row[key]: row for row in tables['example_audio']}
+
+    def __len__(self):
+        return len(self.words)
+
+    def rows(self, word):
+        """(word, meanings, audios, examples, audio per example, conjugations) rows of one word row."""
+        wid = word[0]
+        examples = self.by_word['examples'].get(wid, [])
+        return (
+            word,
+            self.by_word['meanings'].get(wid, []),
+            self.by_word['audios'].get(wid, []),
+            examples,
+            [self.example_audio.get(example[0]) for example in examples],
+            self.by_word['conjugations'].get(wid, []),
+        )
+
+    def payload(self, rows):
+        """The detail dict of rows() output, as make_payload builds it from the app's queries."""
+        word, meanings, audios, examples, example_audio, conjugations = rows
+        columns = self.columns
+
+        def as_dicts(name, group):
+            return [dict(zip(columns[name], row)) for row in group]
+
+        examples = as_dicts('examples', examples)
+        return make_payload(
+            dict(zip(columns['words'], word)),
+            as_dicts('meanings', meanings),
+            as_dicts('audios', audios),
+            examples,
+            {e['id']: dict(zip(columns['example_audio'], audio)) for e, audio in zip(examples, example_audio) if audio},
+            as_dicts('conjugations', conjugations),
+        )
+
+def source_hash(rows):
+    """SHA-1 of one word's source rows; every value is a str, int, float, bytes or None, so repr() is stable."""
+    return hashlib.sha1(repr((PAYLOAD_VERSION, rows)).encode('utf-8')).hexdigest()
+
+def read_sources(cursor, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('word_detail')
+    with metrics.phase('read'):
+        sources = SourceRows(cursor)
+    metrics.count('detail_words', len(sources))
+    return sources
+
+def build_details(cursor, full=False, metrics=None):
+    """
+    Bring word_details in line with the source tables without committing.
+    Only words whose source hash changed are encoded and written (every word
+    when full). Returns (inserted, updated, deleted).
+    """
+    metrics = metrics if metrics is not None else Metrics('word_detail')
+    cursor.execute(CREATE_DETAILS_SQL)
+    if full:
+        cursor.execute(f"DELETE FROM {DETAIL_TABLE}")
+    stored = dict(cursor.execute(f"SELECT word_id, source_hash FROM {DETAIL_TABLE}"))
+    sources = read_sources(cursor, metrics)
+
+    changed = []
+    with metrics.phase('hash'):
+        for word in sources.words:
+            rows = sources.rows(word)
+            new_hash = source_hash(rows)
+            previous = stored.pop(word[0], None)
+            if previous != new_hash:
+                changed.append((word[0], rows, new_hash, previous is None))
+    # Whatever is left belongs to words that no longer exist
+    deletes = [(wid,) for wid in stored]
+
+    inserts, updates = [], []
+    with metrics.phase('encode'):
+        for wid, rows, new_hash, is_new in changed:
+            blob = encode(sources.payload(rows))
+            if is_new:
+                inserts.append((wid, blob, new_hash))
+            else:
+                updates.append((blob, new_hash, wid))
+
+    with metrics.phase('write'):
+        cursor.executemany(f"DELETE FROM {DETAIL_TABLE} WHERE word_id = ?", deletes)
+        cursor.executemany(f"UPDATE {DETAIL_TABLE} SET payload = ?, source_hash = ? WHERE word_id = ?", updates)
+        cursor.executemany(f"INSERT INTO {DETAIL_TABLE} (word_id, payload, source_hash) VALUES (?, ?, ?)", inserts)
+    metrics.count('details_inserted', len(inserts))
+    metrics.count('details_updated', len(updates))
+    metrics.count('details_deleted', len(deletes))
+    metrics.count('details_unchanged', len(sources) - len(changed))
+    return len(inserts), len(updates), len(deletes)
+
+def query_detail(cursor, wid):
+    """One word's payload dict built the app's way, or None if the word is gone."""
+    words = rows_as_dicts(cursor, WORD_QUERIES['word'], (wid,))
+    if not words:
+        return None
+    examples = rows_as_dicts(cursor, WORD_QUERIES['examples'], (wid,))
+    example_audio = {}
+    if examples:
+        sql = WORD_QUERIES['example_audio'].format(placeholders=', '.join('?' * len(examples)))
+        example_audio = {row['example_id']: row for row in rows_as_dicts(cursor, sql, [e['id'] for e in examples])}
+    return make_payload(
+        words[0],
+        rows_as_dicts(cursor, WORD_QUERIES['meanings'], (wid,)),
+        rows_as_dicts(cursor, WORD_QUERIES['audios'], (wid,)),
+        examples,
+        example_audio,
+        rows_as_dicts(cursor, WORD_QUERIES['conjugations'], (wid,)),
+    )
+
+def read_detail(cursor, wid):
+    """One word's payload dict from word_details, or None."""
+    row = cursor.execute(f"SELECT payload FROM {DETAIL_TABLE} WHERE word_id = ?", (wid,)).fetchone()
+    return decode(row[0]) if row else None
+
+def check_details(cursor, samples=DEFAULT_SAMPLES, seed=0, metrics=None):
+    """
+    Compare word_details with the normalized tables. Every row's hash is
+    checked against the source rows and its payload against one rebuilt from
+    them; a sample of words is also rebuilt with getWordDetail's own per-word
+    queries, which checks the builder itself. Returns (problems, query
+    seconds, read seconds): problems maps missing/stale/corrupt/orphaned/
+    mismatched to word ids, and the timings cover the sampled words.
+    """
+    metrics = metrics if metrics is not None else Metrics('word_detail')
+    problems = {kind: [] for kind in ('missing', 'stale', 'corrupt', 'orphaned', 'mismatched')}
+    stored = {wid: (blob, stored_hash) for wid, blob, stored_hash
+              in cursor.execute(f"SELECT word_id, payload, source_hash FROM {DETAIL_TABLE}")}
+    sources = read_sources(cursor, metrics)
+    ids = []
+    with metrics.phase('check rows'):
+        for word in sources.words:
+            wid = word[0]
+            ids.append(wid)
+            rows = sources.rows(word)
+            blob, stored_hash = stored.pop(wid, (None, None))
+            if blob is None:
+                problems['missing'].append(wid)
+                continue
+            if stored_hash != source_hash(rows):
+                problems['stale'].append(wid)
+                continue
+            try:
+                intact = decode(blob) == sources.payload(rows)
+            except (zlib.error, TypeError, ValueError):
+                intact = False
+            if not intact:
+                problems['corrupt'].append(wid)
+        problems['orphaned'] = sorted(stored)
+
+    # Rows already known to be wrong would only show up again
+    known = set(problems['missing']) | set(problems['stale']) | set(problems['corrupt'])
+    candidates = [wid for wid in ids if wid not in known]
+    sample = sorted(random.Random(seed).sample(candidates, min(samples, len(candidates))))
+    query_seconds = read_seconds = 0.0
+    with metrics.phase('check queries'):
+        for wid in sample:
+            start = time.perf_counter()
+            expected = query_detail(cursor, wid)
+            query_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            detail = read_detail(cursor, wid)
+            read_seconds += time.perf_counter() - start
+            if detail != expected:
+                problems['mismatched'].append(wid)
+    metrics.count('words_checked', len(ids))
+    metrics.count('words_sampled', len(sample))
+    for kind, wids in problems.items():
+        metrics.count(f'details_{kind}', len(wids))
+    return problems, query_seconds, read_seconds
+
+def table_exists(cursor):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (DETAIL_TABLE,)).fetchone() is not None
+
+def run_check(cursor, samples, seed, metrics):
+    problems, query_seconds, read_seconds = check_details(cursor, samples, seed, metrics)
+    sampled = metrics.counters['words_sampled']
+    for kind, wids in problems.items():
+        print(f"{kind}: {len(wids)}" + (f" (e.g. {wids[:10]})" if wids else ""))
+    if sampled:
+        print(f"{sampled} sampled words: getWordDetail queries {query_seconds * 1000 / sampled:.3f} ms/word, "
+              f"{DETAIL_TABLE} read {read_seconds * 1000 / sampled:.3f} ms/word")
+    return sum(len(wids) for wids in problems.values())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute one word detail payload per word into word_details')
+    parser.add_argument('--full', action='store_true', help='Rewrite every row instead of only the changed ones')
+    parser.add_argument('--check', action='store_true', help='Compare word_details with the normalized tables; exit 1 on differences')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="Words --check rebuilds with the app's queries")
+    parser.add_argument('--seed', type=int, default=0, help='Sampling seed for --check')
+    parser.add_argument('--show', type=int, metavar='WORD_ID', help='Print the stored payload of one word')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.samples < 0:
+        parser.error('--samples must not be negative')
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        sys.exit(1)
+
+    metrics = metrics_from_args('word_detail', args)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    status = 0
+    try:
+        if (args.check or args.show is not None) and not table_exists(cursor):
+            print(f"No {DETAIL_TABLE} yet; build it first with scripts/word_detail.py")
+            status = 1
+        elif args.show is not None:
+            detail = read_detail(cursor, args.show)
+            if detail is None:
+                print(f"No payload for word {args.show}")
+                status = 1
+            else:
+                print(json.dumps(detail, ensure_ascii=False, indent=2))
+        elif args.check:
+            if run_check(cursor, args.samples, args.seed, metrics):
+                # Rebuilds trust the stored hashes, so only --full rewrites corrupt rows
+                print(f"{DETAIL_TABLE} disagrees with the normalized tables (see above); rebuild with "
+                      f"scripts/word_detail.py{' --full' if metrics.counters['details_corrupt'] else ''}")
+                status = 1
+            else:
+                print(f"{DETAIL_TABLE} matches the normalized tables.")
+        else:
+            inserted, updated, deleted = build_details(cursor, full=args.full, metrics=metrics)
+            with metrics.phase('commit'):
+                conn.commit()
+            print(f"{inserted} inserted, {updated} updated, {deleted} deleted, "
+                  f"{metrics.counters['details_unchanged']} unchanged in {DETAIL_TABLE}.")
+    finally:
+        conn.close()
+    emit(metrics, args)
+    sys.exit(status)
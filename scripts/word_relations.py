@@ -0,0 +1,268 @@
+import sqlite3
+import os
+import re
+import math
+import argparse
+import collections
+from metrics import Metrics, add_metrics_arguments, metrics_from_args, emit
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+# Precompute semantic neighbours into word_relations for the app's
+# getRelatedWords (semantic branch learning).
+#
+# Every word becomes a sparse TF-IDF vector of character n-grams over its
+# Chinese meanings, its spelling and its reading. Each field is L2-normalized
+# and weighted, so a dot product is a weighted sum of per-field cosine
+# similarities. Neighbours come from sparse-dense matrix products one block
+# of rows at a time (memory is block_size x words, not words x words); only
+# the pairs above min_score are ranked to pick the top k per row.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'database', 'breeze_jp.sqlite')
+
+RELATION_TYPE = 'semantic'
+
+DEFAULT_TOP_K = 10
+DEFAULT_MIN_SCORE = 0.15
+DEFAULT_BLOCK_SIZE = 256
+
+# Character n-gram sizes per field. Single kanji and hanzi carry meaning;
+# single kana do not, so readings only match on bigrams.
+NGRAM_SIZES = {
+    'meaning': (1, 2),
+    'word': (1, 2),
+    'furigana': (2,),
+}
+
+# Drop n-grams found in more than this share of a field's documents: they
+# say almost nothing about meaning but make every pair look a little similar
+# and the similarity blocks dense
+MAX_DF = 0.5
+
+# Field weights; they sum to 1 so scores stay in [0, 1]
+FIELD_WEIGHTS = {
+    'meaning': 0.7,
+    'word': 0.2,
+    'furigana': 0.1,
+}
+
+# Separators between the senses of a meaning_cn string; n-grams never span them
+MEANING_SPLIT = re.compile(r'[\s;；,，、/／。.()（）\[\]【】「」]+')
+
+# Same columns and indexes as the app's schema (see .kiro/steering/database.md)
+CREATE_RELATIONS_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS word_relations (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        word_id         INTEGER NOT NULL,
+        related_word_id INTEGER NOT NULL,
+        score           REAL NOT NULL,
+        relation_type   TEXT DEFAULT 'semantic',
+        FOREIGN KEY(word_id) REFERENCES words(id),
+        FOREIGN KEY(related_word_id) REFERENCES words(id)
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_word_relations_word_id ON word_relations (word_id, score DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_word_relations_related_word_id ON word_relations (related_word_id)",
+]
+
+INSERT_RELATION_SQL = '''
+    INSERT INTO word_relations (word_id, related_word_id, score, relation_type)
+    VALUES (?, ?, ?, ?)
+'''
+
+def require_numeric():
+    if np is None or sparse is None:
+        raise RuntimeError("word_relations needs NumPy and SciPy: pip install numpy scipy")
+
+def char_ngrams(pieces, sizes):
+    """Counter of character n-grams within each piece of text."""
+    grams = collections.Counter()
+    for piece in pieces:
+        for n in sizes:
+            for i in range(len(piece) - n + 1):
+                grams[piece[i:i + n]] += 1
+    return grams
+
+def read_documents(cursor):
+    """
+    Return (word ids, {field: [n-gram Counter per word]}) for every word, in
+    id order, with all meanings of a word concatenated.
+    """
+    cursor.execute("SELECT id, word, furigana FROM words ORDER BY id")
+    words = cursor.fetchall()
+
+    meanings = collections.defaultdict(list)
+    cursor.execute("SELECT word_id, meaning_cn FROM word_meanings ORDER BY word_id, definition_order, id")
+    for word_id, meaning in cursor:
+        if meaning:
+            meanings[word_id].extend(p for p in MEANING_SPLIT.split(meaning) if p)
+
+    ids = [wid for wid, _, _ in words]
+    fields = {
+        'meaning': [char_ngrams(meanings.get(wid, ()), NGRAM_SIZES['meaning']) for wid in ids],
+        'word': [char_ngrams([word or ''], NGRAM_SIZES['word']) for _, word, _ in words],
+        'furigana': [char_ngrams([furigana or ''], NGRAM_SIZES['furigana']) for _, _, furigana in words],
+    }
+    return ids, fields
+
+def tfidf_matrix(documents, weight):
+    """
+    CSR matrix of sublinear TF-IDF rows, L2-normalized and scaled by
+    sqrt(weight), so row dot products are weight * cosine similarity.
+    Empty documents stay all-zero rows.
+    """
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    counts = []
+    for grams in documents:
+        for gram, count in grams.items():
+            indices.append(vocabulary.setdefault(gram, len(vocabulary)))
+            counts.append(count)
+        indptr.append(len(indices))
+
+    indices = np.asarray(indices, dtype=np.int32)
+    values = 1.0 + np.log(np.asarray(counts, dtype=np.float32))
+    df = np.bincount(indices, minlength=len(vocabulary))
+    idf = np.log((1.0 + len(documents)) / (1.0 + df)) + 1.0
+    idf[df > MAX_DF * len(documents)] = 0.0
+    values *= idf[indices].astype(np.float32)
+
+    matrix = sparse.csr_matrix((values, indices, np.asarray(indptr, dtype=np.int64)),
+                               shape=(len(documents), len(vocabulary)), dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    scale = sparse.diags((math.sqrt(weight) / norms).astype(np.float32))
+    matrix = (scale @ matrix).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+def build_vectors(fields, weights=FIELD_WEIGHTS):
+    """Stack the weighted per-field matrices into one CSR matrix, one row per word."""
+    return sparse.hstack([tfidf_matrix(fields[name], weight) for name, weight in weights.items()], format='csr')
+
+def iter_neighbours(vectors, top_k=DEFAULT_TOP_K, min_score=DEFAULT_MIN_SCORE, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yield (row, neighbour rows, scores) blocks: for every row, its top_k most
+    similar other rows with score >= min_score, best first (ties by row).
+    """
+    count = vectors.shape[0]
+    k = min(top_k, count - 1)
+    if k <= 0:
+        return
+    by_column = vectors.tocsc()
+    for lo in range(0, count, block_size):
+        hi = min(lo + block_size, count)
+        block = vectors[lo:hi]
+        # Only the features this block uses can score, so the dense side stays
+        # len(columns) x block_size however large the vocabulary is. The result
+        # is words x block: column j holds the scores of row lo + j.
+        columns = np.unique(block.indices)
+        scores = by_column[:, columns] @ block[:, columns].T.toarray()
+        rows = np.arange(hi - lo)
+        scores[rows + lo, rows] = -1.0  # never relate a word to itself
+
+        # Only pairs above min_score are candidates, usually a small fraction,
+        # so ranking them is cheaper than partitioning every full row
+        target, source = np.nonzero(scores >= min_score)
+        values = scores[target, source]
+        order = np.lexsort((target, -values, source))
+        source, target, values = source[order], target[order], values[order]
+
+        # Keep the first k of each row: best first, ties by row number
+        rank = np.arange(len(source)) - np.searchsorted(source, source)
+        keep = rank < k
+        yield source[keep] + lo, target[keep], values[keep]
+
+def compute_relations(cursor, top_k=DEFAULT_TOP_K, min_score=DEFAULT_MIN_SCORE, block_size=DEFAULT_BLOCK_SIZE, metrics=None):
+    """Return (word_id, related_word_id, score, relation_type) rows for every word."""
+    require_numeric()
+    metrics = metrics if metrics is not None else Metrics('word_relations')
+    with metrics.phase('read'):
+        ids, fields = read_documents(cursor)
+    metrics.count('words', len(ids))
+
+    with metrics.phase('vectorize'):
+        vectors = build_vectors(fields)
+    metrics.count('features', vectors.shape[1])
+
+    word_ids = np.asarray(ids, dtype=np.int64)
+    relations = []
+    with metrics.phase('neighbours'):
+        for source, target, scores in iter_neighbours(vectors, top_k, min_score, block_size):
+            relations.extend(zip(
+                word_ids[source].tolist(),
+                word_ids[target].tolist(),
+                np.round(scores, 4).tolist(),
+                [RELATION_TYPE] * len(scores),
+            ))
+    metrics.count('relations', len(relations))
+    return relations
+
+def replace_relations(cursor, relations, metrics=None):
+    """
+    Replace the generated relations without committing. Rows of other
+    relation types (hand-curated synonym/antonym pairs) are kept.
+    """
+    metrics = metrics if metrics is not None else Metrics('word_relations')
+    with metrics.phase('write'):
+        for statement in CREATE_RELATIONS_SQL:
+            cursor.execute(statement)
+        cursor.execute("DELETE FROM word_relations WHERE relation_type = ?", (RELATION_TYPE,))
+        metrics.count('relations_deleted', cursor.rowcount)
+        cursor.executemany(INSERT_RELATION_SQL, relations)
+    return len(relations)
+
+def build_relations(cursor, top_k=DEFAULT_TOP_K, min_score=DEFAULT_MIN_SCORE, block_size=DEFAULT_BLOCK_SIZE, metrics=None):
+    """Compute and store the relations without committing. Returns the row count."""
+    relations = compute_relations(cursor, top_k, min_score, block_size, metrics)
+    return replace_relations(cursor, relations, metrics)
+
+def main(top_k=DEFAULT_TOP_K, min_score=DEFAULT_MIN_SCORE, block_size=DEFAULT_BLOCK_SIZE, dry_run=False, metrics=None):
+    metrics = metrics if metrics is not None else Metrics('word_relations')
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    try:
+        relations = compute_relations(cursor, top_k, min_score, block_size, metrics)
+        if dry_run:
+            words = dict(cursor.execute("SELECT id, word FROM words"))
+            print(f"DRY RUN. {len(relations)} relations computed. Sample:")
+            for wid, related, score, _ in relations[:20]:
+                print(f" - {words.get(wid)} -> {words.get(related)} ({score:.3f})")
+            return
+        written = replace_relations(cursor, relations, metrics)
+        with metrics.phase('commit'):
+            conn.commit()
+        print(f"Wrote {written} {RELATION_TYPE} relations for {metrics.counters['words']} words.")
+    except (RuntimeError, sqlite3.Error) as e:
+        conn.rollback()
+        print(f"Error: {e}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute semantic neighbours into word_relations')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help=f'Neighbours per word (default: {DEFAULT_TOP_K})')
+    parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE, help=f'Minimum similarity kept (default: {DEFAULT_MIN_SCORE})')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help='Rows per similarity block; bounds memory')
+    parser.add_argument('--dry-run', action='store_true', help='Compute and show a sample without writing')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.top_k < 1 or args.block_size < 1:
+        parser.error('--top-k and --block-size must be positive')
+    if not 0 <= args.min_score <= 1:
+        parser.error('--min-score must be between 0 and 1')
+
+    metrics = metrics_from_args('word_relations', args)
+    main(top_k=args.top_k, min_score=args.min_score, block_size=args.block_size, dry_run=args.dry_run, metrics=metrics)
+    emit(metrics, args)